@@ -0,0 +1,660 @@
+import os
+import queue
+import re
+import threading
+import tkinter as tk
+from tkinter import messagebox, filedialog, simpledialog
+from tkinter import ttk
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+
+from backups import MANIFEST_FILE
+from db import DatabaseManager, FIELDS, FIELD_TYPES, OperationCancelled, parse_record
+from storages import is_columnar_file
+
+
+# Период сброса отложенных изменений на диск в приложении, секунды
+FLUSH_INTERVAL = 2.0
+
+# Число строк, подгружаемых в таблицу приложения за один раз
+PAGE_SIZE = 200
+
+
+class TaskRunner:
+    # Выполнение операций DatabaseManager вне потока Tk. Все операции проходят через очередь
+    # единственного рабочего потока, поэтому записи сериализованы и TinyDB никогда не используется
+    # из двух потоков одновременно. События (начало, прогресс, результат, ошибка) складываются
+    # в очередь и забираются в потоке Tk через after(), где и вызываются обработчики
+    def __init__(self, master, on_state=None, poll_interval=50):
+        self.master = master
+        self.on_state = on_state
+        self.poll_interval = poll_interval
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._events = queue.Queue()
+        self._tasks = []
+        self._polling = False
+
+    @property
+    def busy(self):
+        return bool(self._tasks)
+
+    def submit(self, title, func, *args, on_done=None, on_error=None, with_progress=False, **kwargs):
+        # with_progress=True передает в func аргумент progress(строк, байт), через который
+        # операция сообщает о ходе работы и прерывается при отмене
+        task = {'title': title, 'cancel': threading.Event(), 'progress': None,
+                'on_done': on_done, 'on_error': on_error}
+        if with_progress:
+            kwargs['progress'] = self._progress_callback(task)
+        self._tasks.append(task)
+        self._executor.submit(self._run, task, func, args, kwargs)
+        self._notify()
+        if not self._polling:
+            self._polling = True
+            self.master.after(self.poll_interval, self._poll)
+        return task
+
+    def _progress_callback(self, task):
+        def progress(rows, bytes_written):
+            if task['cancel'].is_set():
+                raise OperationCancelled()
+            self._events.put(('progress', task, (rows, bytes_written)))
+        return progress
+
+    def _run(self, task, func, args, kwargs):
+        # Выполняется в рабочем потоке
+        if task['cancel'].is_set():
+            self._events.put(('cancelled', task, None))
+            return
+        try:
+            result = func(*args, **kwargs)
+        except OperationCancelled:
+            self._events.put(('cancelled', task, None))
+        except Exception as e:
+            self._events.put(('error', task, e))
+        else:
+            if isinstance(result, Future):
+                # Операция продолжается вне рабочего потока (например, сжатие резервной копии):
+                # задача завершится, когда будет готов результат, а следующие операции не ждут
+                result.add_done_callback(lambda future: self._finished(task, future))
+                return
+            self._events.put(('done', task, result))
+
+    def _finished(self, task, future):
+        error = future.exception()
+        if error is not None:
+            self._events.put(('error', task, error))
+        else:
+            self._events.put(('done', task, future.result()))
+
+    def cancel(self):
+        # Задачи в очереди пропускаются, текущая прерывается при следующем сообщении о прогрессе
+        for task in self._tasks:
+            task['cancel'].set()
+
+    def _poll(self):
+        while True:
+            try:
+                kind, task, value = self._events.get_nowait()
+            except queue.Empty:
+                break
+            if kind == 'progress':
+                task['progress'] = value
+            else:
+                self._tasks.remove(task)
+                if kind == 'done' and task['on_done']:
+                    task['on_done'](value)
+                elif kind == 'error':
+                    if task['on_error']:
+                        task['on_error'](value)
+                    else:
+                        messagebox.showerror(task['title'] or "Ошибка", f"Ошибка: {value}")
+            self._notify()
+
+        if self._tasks:
+            self.master.after(self.poll_interval, self._poll)
+        else:
+            self._polling = False
+
+    def _notify(self):
+        if self.on_state:
+            # Служебные задачи без заголовка (например, периодическое сохранение) не отображаются
+            visible = [task for task in self._tasks if task['title']]
+            if not visible:
+                self.on_state(None)
+            else:
+                task = visible[0]
+                text = task['title']
+                if task['progress']:
+                    rows, bytes_written = task['progress']
+                    text += f": строк {rows}, байт {bytes_written}"
+                self.on_state(text)
+
+    def shutdown(self):
+        self.cancel()
+        self._executor.shutdown(wait=True)
+
+
+class App:
+    def __init__(self, master):
+        self.master = master
+        self.master.title("Управление базой данных")
+
+        self.db_manager = None
+        # Все обращения к DatabaseManager выполняются в рабочем потоке, окно при этом не блокируется
+        self.runner = TaskRunner(self.master, on_state=self.update_status)
+        self.master.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.create_select_window()
+
+    def open_manager(self, file_path, create=False, on_done=None):
+        # Приложение открывает базу лениво: разбираются только показанные документы, а индексы строятся
+        # при первом поиске; изменения держатся в памяти и периодически сбрасываются на диск
+        def open_database():
+            if is_columnar_file(file_path):
+                manager = DatabaseManager(file_path, storage_mode='columnar')
+            else:
+                manager = DatabaseManager(file_path, storage_mode='lazy', flush_interval=FLUSH_INTERVAL)
+            if create:
+                manager.create_new_database()
+            return manager
+
+        def opened(manager):
+            self.db_manager = manager
+            self.master.after(int(FLUSH_INTERVAL * 1000), self.periodic_flush)
+            if on_done:
+                on_done()
+
+        self.runner.submit("Открытие базы данных", open_database, on_done=opened)
+
+    def periodic_flush(self):
+        if self.db_manager:
+            if not self.runner.busy:
+                self.runner.submit(None, self.db_manager.flush)
+            self.master.after(int(FLUSH_INTERVAL * 1000), self.periodic_flush)
+
+    def update_status(self, text):
+        if not hasattr(self, 'status_label'):
+            return
+        if text is None:
+            self.status_label.config(text="")
+            self.progress_bar.stop()
+            self.cancel_button.config(state=tk.DISABLED)
+        else:
+            self.status_label.config(text=text)
+            self.progress_bar.start(10)
+            self.cancel_button.config(state=tk.NORMAL)
+
+    def cancel_task(self):
+        self.runner.cancel()
+
+    def on_close(self):
+        # Дожидаемся текущей операции и закрываем базу, чтобы отложенные изменения попали на диск
+        self.runner.shutdown()
+        if self.db_manager:
+            self.db_manager.close_database()
+        self.master.destroy()
+
+
+    def create_select_window(self):
+        self.open_database_button = tk.Button(self.master, text="Открыть базу данных", command=self.open_database)
+        self.open_database_button.pack()
+
+        self.create_database_button = tk.Button(self.master, text="Создать новую базу данных", command=self.create_database)
+        self.create_database_button.pack()
+
+    def open_database(self):
+        file_path = filedialog.askopenfilename(
+            title="Выберите файл базы данных", filetypes=[("JSON files", "*.json"), ("Columnar files", "*.tdbc")]
+        )
+        if file_path:
+            self.destroy_select_window()
+            self.create_interaction_window()
+            self.open_manager(file_path, on_done=self.show_records)
+
+    def create_database(self):
+        directory_path = filedialog.askdirectory(title="Выберите директорию для новой базы данных")
+        if directory_path:
+            file_path = filedialog.asksaveasfilename(
+                initialdir=directory_path, defaultextension=".json", filetypes=[("JSON files", "*.json")]
+            )
+            if file_path:
+                self.destroy_select_window()
+                self.create_interaction_window()
+                self.open_manager(file_path, create=True)
+
+    def destroy_select_window(self):
+        self.open_database_button.destroy()
+        self.create_database_button.destroy()
+
+    def create_interaction_window(self):
+        fields = FIELDS
+        tk.Label(self.master, text="Order ID:").grid(row=1, column=1, sticky=tk.E)
+        self.order_id_entry = tk.Entry(self.master)
+        self.order_id_entry.grid(row=1, column=2, pady=5)
+
+        tk.Label(self.master, text="Customer ID:").grid(row=2, column=1, sticky=tk.E)
+        self.customer_id_entry = tk.Entry(self.master)
+        self.customer_id_entry.grid(row=2, column=2, pady=5)
+
+        tk.Label(self.master, text="Amount:").grid(row=3, column=1, sticky=tk.E)
+        self.amount_entry = tk.Entry(self.master)
+        self.amount_entry.grid(row=3, column=2, pady=5)
+
+        tk.Label(self.master, text="Date:").grid(row=4, column=1, sticky=tk.E)
+        self.date_entry = tk.Entry(self.master)
+        self.date_entry.grid(row=4, column=2, pady=5)
+
+        tk.Label(self.master, text="Status:").grid(row=5, column=1, sticky=tk.E)
+        self.status_entry = tk.Entry(self.master)
+        self.status_entry.grid(row=5, column=2, pady=5)
+
+        tk.Label(self.master, text="Delivery Address:").grid(row=6, column=1, sticky=tk.E)
+        self.delivery_address_entry = tk.Entry(self.master)
+        self.delivery_address_entry.grid(row=6, column=2, pady=5)
+
+        # Кнопка для добавления записи
+        self.add_record_button = tk.Button(self.master, text="Добавить запись", command=self.add_record)
+        self.add_record_button.grid(row=7, column=1, columnspan=2, pady=10)
+
+        tk.Label(self.master, text="Поле:").grid(row=1, column=3, sticky=tk.E)
+        self.delete_field_combo = ttk.Combobox(self.master, values=fields)
+        self.delete_field_combo.grid(row=1, column=4, pady=5)
+
+        tk.Label(self.master, text="Значение:").grid(row=2, column=3, sticky=tk.E)
+        self.delete_value_entry = tk.Entry(self.master)
+        self.delete_value_entry.grid(row=2, column=4, pady=5)
+
+        # Кнопка для удаления записи
+        self.delete_record_button = tk.Button(self.master, text="Удалить записи", command=self.delete_record)
+        self.delete_record_button.grid(row=3, column=3, columnspan=2, pady=10)
+
+        tk.Label(self.master, text="Поле:").grid(row=12, column=1, sticky=tk.E)
+        self.search_field_combo = ttk.Combobox(self.master, values=fields)
+        self.search_field_combo.grid(row=12, column=2, pady=5)
+
+        tk.Label(self.master, text="Значение:").grid(row=13, column=1, sticky=tk.E)
+        self.search_value_entry = ttk.Entry(self.master)
+        self.search_value_entry.grid(row=13, column=2, pady=5)
+
+        # Кнопка для поиска записи
+        self.search_record_button = tk.Button(self.master, text="Поиск записей", command=self.search_record)
+        self.search_record_button.grid(row=13, column=3, pady=0)
+
+        tk.Label(self.master, text="Поле для поиска:").grid(row=1, column=5, sticky=tk.E)
+        self.edit_field_combo = ttk.Combobox(self.master, values=fields)
+        self.edit_field_combo.grid(row=1, column=6, pady=5)
+
+        tk.Label(self.master, text="Значение для поиска:").grid(row=2, column=5, sticky=tk.E)
+        self.old_value_entry = ttk.Entry(self.master)
+        self.old_value_entry.grid(row=2, column=6, pady=5)
+
+        # Поля для ввода новых значений
+        tk.Label(self.master, text="Новые значения:").grid(row=3, column=5, columnspan=2, pady=5)
+
+        tk.Label(self.master, text="Order ID:").grid(row=4, column=5, sticky=tk.E)
+        self.new_order_id_entry = ttk.Entry(self.master)
+        self.new_order_id_entry.grid(row=4, column=6, pady=5)
+
+        tk.Label(self.master, text="Customer ID:").grid(row=5, column=5, sticky=tk.E)
+        self.new_customer_id_entry = ttk.Entry(self.master)
+        self.new_customer_id_entry.grid(row=5, column=6, pady=5)
+
+        tk.Label(self.master, text="Amount:").grid(row=6, column=5, sticky=tk.E)
+        self.new_amount_entry = ttk.Entry(self.master)
+        self.new_amount_entry.grid(row=6, column=6, pady=5)
+
+        tk.Label(self.master, text="Date:").grid(row=7, column=5, sticky=tk.E)
+        self.new_date_entry = ttk.Entry(self.master)
+        self.new_date_entry.grid(row=7, column=6, pady=5)
+
+        tk.Label(self.master, text="Status:").grid(row=8, column=5, sticky=tk.E)
+        self.new_status_entry = ttk.Entry(self.master)
+        self.new_status_entry.grid(row=8, column=6, pady=5)
+
+        tk.Label(self.master, text="Delivery Address:").grid(row=9, column=5, sticky=tk.E)
+        self.new_delivery_address_entry = ttk.Entry(self.master)
+        self.new_delivery_address_entry.grid(row=9, column=6, pady=5)
+
+        # Кнопка для редактирования записи
+        self.edit_record_button = tk.Button(self.master, text="Редактировать записи", command=self.edit_record)
+        self.edit_record_button.grid(row=10, column=5, columnspan=2, pady=10)
+
+        self.create_backup_button = tk.Button(self.master, text="Создать резервную копию", command=self.create_backup)
+        self.create_backup_button.grid(row=15, column=1, columnspan=2, pady=10)
+
+        # Кнопка для восстановления из резервной копии
+        self.restore_backup_button = tk.Button(self.master, text="Восстановить из копии", command=self.restore_backup)
+        self.restore_backup_button.grid(row=16, column=1, columnspan=2, pady=10)
+
+        self.export_csv_button = tk.Button(self.master, text="Экспорт в CSV", command=self.export_to_csv)
+        self.export_csv_button.grid(row=15, column=3, columnspan=2, pady=10)\
+        
+        self.tree_frame = tk.Frame(self.master)
+        self.tree_frame.grid(row=14, column=1, columnspan=8)
+
+        self.show_all_records_button = tk.Button(self.master, text="Показать все записи", command=self.show_all_records)
+        self.show_all_records_button.grid(row=13, column=5, columnspan=2, pady=10)
+
+        self.clear_database_button = tk.Button(self.master, text="Очистить базу данных", command=self.clear_database)
+        self.clear_database_button.grid(row=15, column=5, columnspan=2, pady=10)
+
+
+        self.tree_scroll_y = tk.Scrollbar(self.tree_frame, orient=tk.VERTICAL)
+        self.tree_scroll_x = tk.Scrollbar(self.tree_frame, orient=tk.HORIZONTAL)
+
+        self.tree_scroll_y.pack(side=tk.RIGHT, fill=tk.Y)
+        self.tree_scroll_x.pack(side=tk.BOTTOM, fill=tk.X)
+
+        self.view = {'field_name': None, 'value': None, 'sort_by': None, 'descending': False}
+        self.view_generation = 0
+        self.loaded_rows = 0
+        self.total_rows = 0
+        self.page_pending = False
+        self.create_tree()
+
+        # Ход выполнения фоновой операции и ее отмена
+        self.status_label = tk.Label(self.master, text="")
+        self.status_label.grid(row=17, column=1, columnspan=4, sticky=tk.W)
+        self.progress_bar = ttk.Progressbar(self.master, mode='indeterminate', length=200)
+        self.progress_bar.grid(row=17, column=5, columnspan=2, pady=5)
+        self.cancel_button = tk.Button(self.master, text="Отмена", command=self.cancel_task, state=tk.DISABLED)
+        self.cancel_button.grid(row=17, column=7, pady=5)
+
+        
+
+    def add_record(self):
+        try:
+            record = parse_record(
+                self.order_id_entry.get(),
+                self.customer_id_entry.get(),
+                self.amount_entry.get(),
+                self.date_entry.get(),
+                self.status_entry.get(),
+                self.delivery_address_entry.get()
+            )
+
+            # Добавьте здесь другие проверки для остальных полей при необходимости
+
+            if self.db_manager:
+                self.runner.submit(
+                    "Добавление записи", self.db_manager.add_record, **record,
+                    on_done=lambda _: messagebox.showinfo("Добавление записи", "Запись успешно добавлена.")
+                )
+            else:
+                messagebox.showwarning("Добавление записи", "База данных не открыта.")
+
+        except ValueError as e:
+            messagebox.showerror("Ошибка ввода", str(e))
+
+
+    def delete_record(self):
+        field = self.delete_field_combo.get()
+        value = self.delete_value_entry.get()
+
+        if self.db_manager:
+            self.runner.submit(
+                "Удаление записей", self.db_manager.delete_record_by_field, field, value,
+                on_done=lambda _: messagebox.showinfo("Удаление записей", "Записи успешно удалены.")
+            )
+        else:
+            messagebox.showwarning("Удаление записей", "Записи не найдены.")
+
+    def search_record(self):
+        field = self.search_field_combo.get()
+        value = self.search_value_entry.get()
+
+        if self.db_manager:
+            if field not in FIELD_TYPES:
+                messagebox.showerror("Поиск записей", "Указано некорректное имя поля.")
+                return
+            try:
+                FIELD_TYPES[field](value)
+            except ValueError:
+                messagebox.showerror("Ошибка ввода", "Некорректный формат значения для поиска.")
+                return
+
+            def searched(found):
+                if not found:
+                    messagebox.showinfo("Результаты поиска", "Записей с указанным значением не найдено.")
+
+            self.show_records(field, value, on_done=searched)
+        else:
+            messagebox.showwarning("Поиск записей", "База данных не открыта.")
+
+    def create_tree(self):
+        # Таблица с фиксированным набором колонок создается один раз; строки подгружаются страницами
+        self.tree = ttk.Treeview(
+            self.tree_frame, columns=FIELDS, show='headings',
+            yscrollcommand=self.on_tree_scroll, xscrollcommand=self.tree_scroll_x.set
+        )
+
+        self.tree_scroll_y.config(command=self.tree.yview)
+        self.tree_scroll_x.config(command=self.tree.xview)
+        for col in FIELDS:
+            self.tree.heading(col, text=col, command=lambda c=col: self.sort_by_column(c))
+            self.tree.column(col, width=100)
+
+        self.tree.pack(fill='both', expand=True)
+
+    def show_records(self, field_name=None, value=None, on_done=None):
+        # Показ всех записей или записей с заданным значением поля;
+        # on_done получает число записей в выборке после загрузки первой страницы
+        self.view = {'field_name': field_name, 'value': value, 'sort_by': None, 'descending': False}
+        self.reload_records(on_done)
+
+    def reload_records(self, on_done=None):
+        # Страницы, запрошенные для предыдущей выборки, отбрасываются по номеру поколения
+        self.view_generation += 1
+        self.tree.delete(*self.tree.get_children())
+        self.loaded_rows = 0
+        self.total_rows = 0
+        self.page_pending = False
+        for col in FIELDS:
+            arrow = ''
+            if col == self.view['sort_by']:
+                arrow = ' ▼' if self.view['descending'] else ' ▲'
+            self.tree.heading(col, text=col + arrow)
+        self.tree.yview_moveto(0)
+        self.load_next_page(on_done)
+
+    def load_next_page(self, on_done=None):
+        generation = self.view_generation
+        self.page_pending = True
+
+        def loaded(page):
+            if generation != self.view_generation:
+                return
+            rows, self.total_rows = page
+            for row in rows:
+                self.tree.insert("", "end", values=['' if row.get(col) is None else row.get(col) for col in FIELDS])
+            self.loaded_rows += len(rows)
+            self.page_pending = False
+            if on_done:
+                on_done(self.total_rows)
+
+        self.runner.submit(
+            "Загрузка записей", self.db_manager.get_page, self.loaded_rows, PAGE_SIZE, **self.view,
+            on_done=loaded
+        )
+
+    def on_tree_scroll(self, first, last):
+        self.tree_scroll_y.set(first, last)
+        # Следующая страница подгружается, когда прокрутка подходит к концу загруженных строк
+        if float(last) >= 0.95 and self.loaded_rows < self.total_rows and not self.page_pending:
+            self.load_next_page()
+
+    def sort_by_column(self, col):
+        # Сортировка выполняется в DatabaseManager, повторный щелчок меняет направление
+        if not self.db_manager:
+            return
+        if self.view['sort_by'] == col:
+            self.view['descending'] = not self.view['descending']
+        else:
+            self.view['sort_by'] = col
+            self.view['descending'] = False
+        self.reload_records()
+
+    def show_all_records(self):
+        if self.db_manager:
+            self.show_records()
+        else:
+            messagebox.showwarning("Показать все записи", "База данных не открыта.")
+
+        
+    def edit_record(self):
+        field_name = self.edit_field_combo.get()
+        old_value = self.old_value_entry.get()
+
+        new_order_id = self.new_order_id_entry.get().strip()
+        new_customer_id = self.new_customer_id_entry.get().strip()
+        new_amount = self.new_amount_entry.get().strip()
+        new_date = self.new_date_entry.get().strip()
+        new_status = self.new_status_entry.get().strip()
+        new_delivery_address = self.new_delivery_address_entry.get().strip()
+
+        # Проверка и преобразование типов
+        try:
+            new_order_id = int(new_order_id) if new_order_id else ''
+            new_customer_id = int(new_customer_id) if new_customer_id else ''
+            new_amount = float(new_amount) if new_amount else ''
+        except ValueError:
+            messagebox.showerror("Ошибка", "Некорректный формат ввода.")
+            return False
+
+        # Обработка формата даты
+        if new_date:
+            if re.match(r'\d{4}-\d{2}-\d{2}', new_date):
+                try:
+                    new_date = datetime.strptime(new_date, '%Y-%m-%d').strftime('%Y-%m-%d')
+                except ValueError:
+                    messagebox.showerror("Ошибка", "Некорректный формат даты. Используйте YYYY-MM-DD.")
+                    return False
+            else:
+                messagebox.showerror("Ошибка", "Некорректный формат даты. Используйте YYYY-MM-DD.")
+                return False
+
+        new_values = {
+            'order_id': new_order_id,
+            'customer_id': new_customer_id,
+            'amount': new_amount,
+            'date': new_date,
+            'status': new_status,
+            'delivery_address': new_delivery_address
+        }
+
+        if self.db_manager:
+            def edited(success):
+                if success:
+                    messagebox.showinfo("Редактирование записей", "Записи успешно отредактированы.")
+                else:
+                    messagebox.showerror("Редактирование записей", "Ошибка при редактировании записей.")
+
+            self.runner.submit(
+                "Редактирование записей", self.db_manager.edit_record, field_name, old_value, new_values,
+                on_done=edited
+            )
+        else:
+            messagebox.showwarning("Редактирование записей", "База данных не открыта.")
+
+    def create_backup(self):
+        if self.db_manager:
+            incremental = messagebox.askyesnocancel(
+                "Резервная копия",
+                "Создать сжатую инкрементальную копию в каталоге копий?\n"
+                "«Нет» - полная копия в отдельный JSON-файл."
+            )
+            if incremental is None:
+                return
+            if incremental:
+                backup_dir = filedialog.askdirectory(title="Выберите каталог резервных копий", initialdir=os.getcwd())
+                if backup_dir:
+                    def created(entry):
+                        if entry:
+                            messagebox.showinfo("Резервная копия", "Резервная копия успешно создана.")
+                        else:
+                            messagebox.showerror("Резервная копия", "Ошибка при создании резервной копии.")
+
+                    # В рабочем потоке снимается только копия данных, сжатие идет в отдельном потоке
+                    # и не задерживает следующие операции с базой
+                    self.runner.submit("Создание резервной копии", self.db_manager.create_incremental_backup,
+                                       backup_dir, background=True, on_done=created)
+                return
+
+            file_path = filedialog.asksaveasfilename(
+                defaultextension=".json", filetypes=[("JSON files", "*.json")], initialdir=os.getcwd()
+            )
+            if file_path:
+                def created(success):
+                    if success:
+                        messagebox.showinfo("Резервная копия", "Резервная копия успешно создана.")
+                    else:
+                        messagebox.showerror("Резервная копия", "Ошибка при создании резервной копии.")
+
+                self.runner.submit("Создание резервной копии", self.db_manager.create_backup, file_path,
+                                   on_done=created)
+        else:
+            messagebox.showwarning("Резервная копия", "База данных не открыта.")
+
+    def restore_backup(self):
+        if self.db_manager:
+            # Выбор JSON-файла копии или manifest.json каталога инкрементальных копий
+            file_path = filedialog.askopenfilename(
+                filetypes=[("JSON files", "*.json")], initialdir=os.getcwd()
+            )
+            if file_path:
+                def restored(success):
+                    if success:
+                        messagebox.showinfo("Восстановление из копии", "База данных успешно восстановлена из копии.")
+                        self.show_records()
+                    else:
+                        messagebox.showerror("Восстановление из копии", "Ошибка при восстановлении из копии.")
+
+                if os.path.basename(file_path) == MANIFEST_FILE:
+                    until = simpledialog.askstring(
+                        "Восстановление из копии",
+                        "Восстановить состояние на момент (YYYY-MM-DD HH:MM:SS).\n"
+                        "Оставьте пустым для последней копии.",
+                        parent=self.master
+                    )
+                    if until is None:
+                        return
+                    self.runner.submit("Восстановление из копии", self.db_manager.restore_incremental_backup,
+                                       os.path.dirname(file_path), until, on_done=restored)
+                else:
+                    self.runner.submit("Восстановление из копии", self.db_manager.restore_from_backup, file_path,
+                                       on_done=restored)
+        else:
+            messagebox.showwarning("Восстановление из копии", "База данных не открыта.")
+    
+    def export_to_csv(self):
+        if self.db_manager:
+            file_path = filedialog.asksaveasfilename(
+                defaultextension=".csv", filetypes=[("CSV files", "*.csv")], initialdir=os.getcwd()
+            )
+            if file_path:
+                def exported(success):
+                    if success:
+                        messagebox.showinfo("Экспорт в CSV", "Данные успешно экспортированы в CSV.")
+                    else:
+                        messagebox.showerror("Экспорт в CSV", "Ошибка при экспорте данных в CSV.")
+
+                self.runner.submit("Экспорт в CSV", self.db_manager.export_to_csv, file_path,
+                                   on_done=exported, with_progress=True)
+        else:
+            messagebox.showwarning("Экспорт в CSV", "База данных не открыта.")
+
+    def clear_database(self):
+        if self.db_manager:
+            self.runner.submit("Очистка базы данных", self.db_manager.clear_all_records,
+                               on_done=lambda _: self.show_records())
+        else:
+            messagebox.showwarning("Очистить базу данных", "База данных не открыта.")
+
+
+def run_app():
+    root = tk.Tk()
+    app = App(root)
+    root.mainloop()
+
+
+if __name__ == "__main__":
+    run_app()
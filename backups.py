@@ -0,0 +1,194 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+
+from storages import atomic_write_json
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+MANIFEST_FILE = 'manifest.json'
+STATE_FILE = 'state.json.gz'
+
+# После стольких инкрементальных копий подряд создается новая полная копия
+MAX_DELTAS = 24
+
+
+# Блокировки каталогов копий: одна на каталог в процессе, чтобы две копии, создаваемые
+# одновременно (например, в фоновых потоках), не перезаписывали manifest.json и state.json.gz друг друга
+_directory_locks = {}
+_directory_locks_guard = threading.Lock()
+
+
+def _directory_lock(directory):
+    key = os.path.normcase(os.path.realpath(directory))
+    with _directory_locks_guard:
+        lock = _directory_locks.get(key)
+        if lock is None:
+            lock = _directory_locks[key] = threading.Lock()
+        return lock
+
+
+def _compress(data, codec):
+    if codec == 'zstd':
+        return zstandard.ZstdCompressor(level=10).compress(data)
+    return gzip.compress(data, compresslevel=6)
+
+
+def _decompress(data, codec):
+    if codec == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("Для чтения копии требуется модуль zstandard.")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+def _fingerprint(doc):
+    return hashlib.blake2b(json.dumps(doc, sort_keys=True).encode('utf-8'), digest_size=8).hexdigest()
+
+
+def parse_point_in_time(value):
+    # Момент времени для восстановления: datetime или строка 'YYYY-MM-DD[ HH:MM[:SS]]'
+    if value is None or isinstance(value, datetime):
+        return value
+    value = value.strip()
+    if not value:
+        return None
+    moment = datetime.fromisoformat(value)
+    if len(value) == 10:
+        # Дата без времени означает конец дня
+        moment = moment.replace(hour=23, minute=59, second=59, microsecond=999999)
+    return moment
+
+
+class BackupChain:
+    # Каталог резервных копий: полная сжатая копия (base) и цепочка инкрементальных копий (delta)
+    # с изменениями относительно предыдущей копии. В manifest.json для каждого файла хранятся время
+    # создания и контрольная сумма SHA-256, а в state.json.gz - отпечатки документов на момент
+    # последней копии, по которым вычисляется следующая инкрементальная копия
+    def __init__(self, directory, codec=None):
+        self.directory = directory
+        self.codec = codec or ('zstd' if zstandard is not None else 'gzip')
+        os.makedirs(directory, exist_ok=True)
+        self._lock = _directory_lock(directory)
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.directory, MANIFEST_FILE)
+
+    def entries(self):
+        if not os.path.exists(self.manifest_path):
+            return []
+        with open(self.manifest_path, 'r', encoding='utf-8') as f:
+            return json.load(f)['entries']
+
+    def _read_state(self):
+        path = os.path.join(self.directory, STATE_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'rb') as f:
+            return json.loads(gzip.decompress(f.read()))
+
+    def _write_state(self, state):
+        path = os.path.join(self.directory, STATE_FILE)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(gzip.compress(json.dumps(state, separators=(',', ':')).encode('utf-8')))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def _write_entry(self, kind, payload, created, docs):
+        extension = 'zst' if self.codec == 'zstd' else 'gz'
+        name = f"{kind}-{created.strftime('%Y%m%dT%H%M%S%f')}.json.{extension}"
+        data = _compress(json.dumps(payload, separators=(',', ':')).encode('utf-8'), self.codec)
+        with open(os.path.join(self.directory, name), 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        return {
+            'file': name,
+            'type': kind,
+            'created': created.isoformat(),
+            'codec': self.codec,
+            'sha256': hashlib.sha256(data).hexdigest(),
+            'size': len(data),
+            'docs': docs
+        }
+
+    def create(self, tables, full=False):
+        # tables - снимок данных {таблица: {doc_id: документ}}, который больше не изменяется.
+        # Возвращает запись манифеста о созданном файле
+        with self._lock:
+            entries = self.entries()
+            state = self._read_state()
+            fingerprints = {name: {doc_id: _fingerprint(doc) for doc_id, doc in table.items()}
+                            for name, table in tables.items()}
+            deltas_since_base = 0
+            for entry in reversed(entries):
+                if entry['type'] == 'base':
+                    break
+                deltas_since_base += 1
+            created = datetime.now()
+            if entries:
+                # Время копий в цепочке строго возрастает
+                created = max(created, datetime.fromisoformat(entries[-1]['created']) + timedelta(microseconds=1))
+
+            if full or state is None or not entries or deltas_since_base >= MAX_DELTAS:
+                docs = sum(len(table) for table in tables.values())
+                entry = self._write_entry('base', {'tables': tables}, created, docs)
+            else:
+                changes = {}
+                docs = 0
+                for name, table in tables.items():
+                    previous = state.get(name, {})
+                    put = {doc_id: doc for doc_id, doc in table.items()
+                           if previous.get(doc_id) != fingerprints[name][doc_id]}
+                    deleted = [doc_id for doc_id in previous if doc_id not in table]
+                    if put or deleted:
+                        changes[name] = {'put': put, 'del': deleted}
+                        docs += len(put) + len(deleted)
+                dropped = [name for name in state if name not in tables]
+                entry = self._write_entry('delta', {'tables': changes, 'dropped': dropped}, created, docs)
+
+            # Манифест записывается раньше отпечатков: при сбое между ними следующая
+            # инкрементальная копия лишь повторит часть изменений, но ничего не пропустит
+            entries.append(entry)
+            atomic_write_json(self.manifest_path, {'entries': entries}, indent=2)
+            self._write_state(fingerprints)
+            return entry
+
+    def restore(self, until=None):
+        # Состояние данных на момент until (по умолчанию - последняя копия): последняя полная копия
+        # не позже until и все инкрементальные копии после нее. Контрольные суммы проверяются
+        until = parse_point_in_time(until)
+        entries = [entry for entry in self.entries()
+                   if until is None or datetime.fromisoformat(entry['created']) <= until]
+        base_positions = [i for i, entry in enumerate(entries) if entry['type'] == 'base']
+        if not base_positions:
+            raise ValueError("В каталоге нет полной резервной копии на указанный момент.")
+
+        tables = None
+        for entry in entries[base_positions[-1]:]:
+            with open(os.path.join(self.directory, entry['file']), 'rb') as f:
+                data = f.read()
+            if hashlib.sha256(data).hexdigest() != entry['sha256']:
+                raise ValueError(f"Контрольная сумма файла {entry['file']} не совпадает.")
+            payload = json.loads(_decompress(data, entry['codec']))
+            if entry['type'] == 'base':
+                tables = payload['tables']
+                continue
+            for name in payload['dropped']:
+                tables.pop(name, None)
+            for name, change in payload['tables'].items():
+                table = tables.setdefault(name, {})
+                for doc_id in change['del']:
+                    table.pop(doc_id, None)
+                table.update(change['put'])
+        return tables
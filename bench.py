@@ -0,0 +1,305 @@
+import argparse
+import contextlib
+import io
+import json
+import math
+import multiprocessing
+import os
+import platform
+import queue
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from db import DatabaseManager, STORAGE_MODES
+from storages import convert_to_columnar
+
+
+# Распределения синтетических заказов: большая часть заказов доставлена, часть в пути,
+# даты за два года с ростом к концу периода и пиком в ноябре-декабре
+STATUS_WEIGHTS = {'delivered': 60, 'shipped': 18, 'pending': 15, 'cancelled': 5, 'returned': 2}
+STREETS = ['Main St', 'Elm St', 'Pine St', 'Oak Ave', 'Maple Rd', 'Cedar Ln', 'Lake View', 'Park Blvd']
+PERIOD_DAYS = 730
+PERIOD_END = date(2024, 12, 31)
+
+OPERATIONS = ['open', 'add_record', 'search_by_field', 'edit_record', 'delete_record_by_field',
+              'get_all_records', 'export_to_csv', 'export_to_xlsx', 'create_backup']
+# Операции над отдельными записями повторяются samples раз, остальные - bulk_samples раз
+POINT_OPERATIONS = ['add_record', 'search_by_field', 'edit_record', 'delete_record_by_field']
+# Интервал, с которым ожидание результата замера проверяет, жив ли дочерний процесс (секунды)
+POLL_INTERVAL = 1.0
+
+
+def generate_orders(rows, seed=0):
+    # Генератор документов заказов с doc_id от 1 до rows
+    rnd = random.Random(seed)
+    statuses = list(STATUS_WEIGHTS)
+    weights = list(STATUS_WEIGHTS.values())
+    customers = max(10, rows // 8)
+    for order_id in range(1, rows + 1):
+        # Треугольное распределение дает больше заказов ближе к концу периода
+        day = PERIOD_END - timedelta(days=int(rnd.triangular(0, PERIOD_DAYS, 0)))
+        if day.month < 11 and rnd.random() < 0.15:
+            day = day.replace(month=rnd.choice((11, 12)), day=min(day.day, 28))
+        # Половину заказов делает небольшая доля постоянных клиентов
+        if rnd.random() < 0.5:
+            customer_id = min(customers, int(rnd.paretovariate(1.2)))
+        else:
+            customer_id = rnd.randint(1, customers)
+        yield order_id, {
+            'order_id': order_id,
+            'customer_id': customer_id,
+            'amount': round(rnd.lognormvariate(4.5, 0.8), 2),
+            'date': day.isoformat(),
+            'status': rnd.choices(statuses, weights)[0],
+            'delivery_address': f"{rnd.randint(1, 999)} {rnd.choice(STREETS)}"
+        }
+
+
+def write_dataset(path, rows, seed=0):
+    # Файл в формате TinyDB записывается потоково, без построения таблицы в памяти
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('{"_default": {')
+        for order_id, doc in generate_orders(rows, seed):
+            if order_id > 1:
+                f.write(', ')
+            f.write(f'"{order_id}": ')
+            f.write(json.dumps(doc))
+        f.write('}}')
+
+
+def percentile(values, fraction):
+    # Перцентиль по ближайшему рангу
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # На macOS ru_maxrss в байтах, на Linux - в килобайтах
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def files_size(path):
+    # Размер файла базы вместе со служебными файлами рядом с ним (журнал, индекс смещений)
+    directory = os.path.dirname(os.path.abspath(path))
+    name = os.path.basename(path)
+    return sum(os.path.getsize(os.path.join(directory, entry)) for entry in os.listdir(directory)
+               if entry == name or entry.startswith(name + '.'))
+
+
+def _point_arguments(operation, rows, rnd, sample):
+    if operation == 'add_record':
+        return (rows + sample + 1, rnd.randint(1, max(10, rows // 8)), 100.0, PERIOD_END.isoformat(),
+                'pending', '1 Main St')
+    if operation == 'search_by_field':
+        field = rnd.choice(['order_id', 'customer_id', 'status', 'date'])
+        value = {
+            'order_id': rnd.randint(1, rows),
+            'customer_id': rnd.randint(1, max(10, rows // 8)),
+            'status': rnd.choice(list(STATUS_WEIGHTS)),
+            'date': (PERIOD_END - timedelta(days=rnd.randint(0, PERIOD_DAYS))).isoformat()
+        }[field]
+        return field, value
+    if operation == 'edit_record':
+        return 'order_id', rnd.randint(1, rows), {'status': rnd.choice(list(STATUS_WEIGHTS))}
+    # Удаляются разные заказы, чтобы каждая выборка действительно изменяла файл
+    return 'order_id', sample + 1
+
+
+def run_operation(path, operation, rows, samples, storage_mode, seed):
+    # Замер одной операции на отдельной копии набора данных; выполняется в дочернем процессе,
+    # поэтому пиковый объем памяти относится только к этой операции
+    rnd = random.Random(seed)
+    workdir = os.path.dirname(path)
+    timings = []
+    processed = 0
+    with contextlib.redirect_stdout(io.StringIO()) as output:
+        start = time.perf_counter()
+        manager = DatabaseManager(path, storage_mode=storage_mode)
+        open_time = time.perf_counter() - start
+        if operation == 'open':
+            timings.append(open_time)
+            samples = 0
+        for sample in range(samples):
+            if operation in POINT_OPERATIONS:
+                arguments = _point_arguments(operation, rows, rnd, sample)
+                method = getattr(manager, operation)
+            elif operation == 'get_all_records':
+                arguments, method = (), manager.get_all_records
+            elif operation == 'create_backup':
+                arguments, method = (os.path.join(workdir, 'backup.json'),), manager.create_backup
+            else:
+                extension = 'csv' if operation == 'export_to_csv' else 'xlsx'
+                arguments, method = (os.path.join(workdir, f'export.{extension}'),), getattr(manager, operation)
+            start = time.perf_counter()
+            result = method(*arguments)
+            timings.append(time.perf_counter() - start)
+            if operation == 'search_by_field' or operation == 'get_all_records':
+                processed += len(result or [])
+            elif operation in ('export_to_csv', 'export_to_xlsx') and result is False:
+                raise RuntimeError(output.getvalue().strip().splitlines()[-1])
+        manager.flush()
+        size = files_size(path)
+        manager.close_database()
+
+    total = sum(timings)
+    result = {
+        'rows': rows,
+        'operation': operation,
+        'storage_mode': storage_mode,
+        'samples': len(timings),
+        'total_s': round(total, 6),
+        'mean_ms': round(total / len(timings) * 1000, 3),
+        'p50_ms': round(percentile(timings, 0.50) * 1000, 3),
+        'p99_ms': round(percentile(timings, 0.99) * 1000, 3),
+        'throughput_ops_s': round(len(timings) / total, 3) if total else None,
+        'peak_rss_mb': peak_rss_mb(),
+        'file_size_bytes': size
+    }
+    if operation in ('get_all_records', 'export_to_csv', 'export_to_xlsx', 'open'):
+        result['rows_per_s'] = round(rows * len(timings) / total, 1) if total else None
+    if processed:
+        result['rows_returned'] = processed
+    return result
+
+
+def _child(results, *args):
+    try:
+        results.put(('ok', run_operation(*args)))
+    except Exception as e:
+        results.put(('error', f"{type(e).__name__}: {e}"))
+
+
+def _wait_result(results, process):
+    # Результат дочернего процесса; если процесс завершился, не передав его (нехватка памяти,
+    # аварийное завершение интерпретатора), возвращается ошибка с кодом завершения
+    while True:
+        try:
+            return results.get(timeout=POLL_INTERVAL)
+        except queue.Empty:
+            if not process.is_alive():
+                break
+    # Результат мог быть отправлен непосредственно перед завершением процесса
+    try:
+        return results.get(timeout=POLL_INTERVAL)
+    except queue.Empty:
+        return 'error', f"Процесс замера завершился без результата, код {process.exitcode}"
+
+
+def measure(dataset, operation, rows, samples, storage_mode, seed):
+    # Копия набора данных для операции и запуск замера в отдельном процессе
+    workdir = tempfile.mkdtemp(prefix='bench_', dir=os.path.dirname(dataset))
+    try:
+        if storage_mode == 'columnar':
+            path = os.path.join(workdir, 'database.tdbc')
+            convert_to_columnar(dataset, path)
+        else:
+            path = os.path.join(workdir, 'database.json')
+            shutil.copyfile(dataset, path)
+        context = multiprocessing.get_context('spawn')
+        results = context.Queue()
+        process = context.Process(target=_child, args=(results, path, operation, rows, samples, storage_mode, seed))
+        process.start()
+        status, result = _wait_result(results, process)
+        process.join()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    if status == 'error':
+        return {'rows': rows, 'operation': operation, 'storage_mode': storage_mode, 'error': result}
+    return result
+
+
+def compare(results, baseline, threshold):
+    # Регрессии: операции, у которых p50 или p99 выросли больше чем на threshold относительно базового прогона
+    reference = {(item['rows'], item['operation'], item['storage_mode']): item
+                 for item in baseline['results'] if 'error' not in item}
+    regressions = []
+    for item in results:
+        base = reference.get((item['rows'], item['operation'], item['storage_mode']))
+        if base is None or 'error' in item:
+            continue
+        for metric in ('p50_ms', 'p99_ms'):
+            if base[metric] and item[metric] > base[metric] * (1 + threshold):
+                regressions.append({
+                    'rows': item['rows'], 'operation': item['operation'], 'storage_mode': item['storage_mode'],
+                    'metric': metric, 'baseline': base[metric], 'current': item[metric],
+                    'change': round(item[metric] / base[metric] - 1, 3)
+                })
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарк операций DatabaseManager на синтетических заказах")
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000],
+                        help="размеры наборов данных (по умолчанию 10000 100000; до 10000000)")
+    parser.add_argument('--operations', nargs='+', choices=OPERATIONS, default=OPERATIONS)
+    parser.add_argument('--storage-mode', nargs='+', choices=list(STORAGE_MODES), default=['json'])
+    parser.add_argument('--samples', type=int, default=50, help="повторов операций над отдельными записями")
+    parser.add_argument('--bulk-samples', type=int, default=3, help="повторов операций над всей таблицей")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workdir', help="каталог для наборов данных (по умолчанию временный)")
+    parser.add_argument('--output', help="файл результатов JSON (по умолчанию stdout)")
+    parser.add_argument('--baseline', help="результаты прошлого прогона для поиска регрессий")
+    parser.add_argument('--threshold', type=float, default=0.2, help="допустимый рост p50/p99 (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix='bench_')
+    os.makedirs(workdir, exist_ok=True)
+    results = []
+    try:
+        for rows in args.rows:
+            dataset = os.path.join(workdir, f'orders_{rows}.json')
+            if not os.path.exists(dataset):
+                print(f"Генерация набора данных: {rows} записей", file=sys.stderr)
+                write_dataset(dataset, rows, args.seed)
+            for storage_mode in args.storage_mode:
+                for operation in args.operations:
+                    samples = args.samples if operation in POINT_OPERATIONS else args.bulk_samples
+                    print(f"{rows} записей, {storage_mode}: {operation}", file=sys.stderr)
+                    results.append(measure(dataset, operation, rows, samples, storage_mode, args.seed))
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        'meta': {
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'seed': args.seed,
+            'samples': args.samples,
+            'bulk_samples': args.bulk_samples
+        },
+        'results': results
+    }
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            report['regressions'] = compare(results, json.load(f), args.threshold)
+        exit_code = 1 if report['regressions'] else 0
+    if any('error' in item for item in results):
+        exit_code = 1
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,321 @@
+import argparse
+import contextlib
+import json
+import os
+import shlex
+import sys
+from datetime import datetime
+
+from db import DatabaseManager, FIELDS, FIELD_TYPES, IMPORT_READERS, STORAGE_MODES
+from storages import is_columnar_file
+
+
+# Форматы экспорта, которые поддерживает DatabaseManager.export_stream
+EXPORT_FORMATS = ['csv', 'xlsx']
+
+
+class CommandError(Exception):
+    # Ошибка в аргументах команды; в сессии выполнение продолжается со следующей строки
+    pass
+
+
+class CommandParser(argparse.ArgumentParser):
+    # В сессии неверная строка не должна завершать процесс: ошибка разбора становится исключением
+    def error(self, message):
+        raise CommandError(message)
+
+
+def typed_value(field, value):
+    # Значение, приведенное к типу поля; для даты дополнительно проверяется формат YYYY-MM-DD
+    try:
+        value = FIELD_TYPES[field](value)
+        if field == 'date':
+            value = datetime.strptime(value, '%Y-%m-%d').strftime('%Y-%m-%d')
+    except (TypeError, ValueError):
+        raise ValueError(f"некорректное значение поля {field}: {value}") from None
+    return value
+
+
+def _field_value(text):
+    # Аргумент вида поле=значение с приведением значения к типу поля
+    field, separator, value = text.partition('=')
+    if not separator or field not in FIELD_TYPES:
+        raise argparse.ArgumentTypeError(f"ожидается поле=значение, поле одно из: {', '.join(FIELDS)}")
+    try:
+        return field, typed_value(field, value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def add_commands(parser):
+    commands = parser.add_subparsers(dest='command', metavar='command', parser_class=type(parser))
+    commands.required = True
+
+    command = commands.add_parser('search', help="записи с заданным значением поля")
+    command.add_argument('field', choices=FIELDS)
+    command.add_argument('value')
+
+    command = commands.add_parser('range', help="записи со значением поля в диапазоне, по возрастанию поля")
+    command.add_argument('field', choices=FIELDS)
+    command.add_argument('--from', dest='low')
+    command.add_argument('--to', dest='high')
+    command.add_argument('--exclude-from', action='store_true', help="не включать нижнюю границу")
+    command.add_argument('--exclude-to', action='store_true', help="не включать верхнюю границу")
+    command.add_argument('--descending', action='store_true')
+    command.add_argument('--offset', type=int, default=0)
+    command.add_argument('--limit', type=int)
+
+    command = commands.add_parser('list', help="страница записей по doc_id или по полю сортировки")
+    command.add_argument('--offset', type=int, default=0)
+    command.add_argument('--limit', type=int, default=100)
+    command.add_argument('--sort-by', choices=FIELDS)
+    command.add_argument('--descending', action='store_true')
+    command.add_argument('--where', type=_field_value, metavar='FIELD=VALUE', help="только записи с этим значением")
+
+    command = commands.add_parser('add', help="добавление одной записи")
+    for field in FIELDS:
+        command.add_argument(field)
+
+    command = commands.add_parser('import', help="загрузка записей из CSV, XLSX или JSON Lines")
+    command.add_argument('file')
+    command.add_argument('--format', choices=list(IMPORT_READERS), help="по умолчанию по расширению файла")
+    command.add_argument('--batch-size', type=int, default=10000)
+    command.add_argument('--workers', type=int, help="процессов проверки строк; 0 - в текущем процессе")
+    command.add_argument('--reject-file', help="по умолчанию <файл>.rejects.csv")
+
+    command = commands.add_parser('export', help="потоковая выгрузка в CSV или XLSX")
+    command.add_argument('file')
+    command.add_argument('--format', choices=EXPORT_FORMATS, help="по умолчанию по расширению файла")
+    command.add_argument('--where', type=_field_value, metavar='FIELD=VALUE', help="только записи с этим значением")
+    command.add_argument('--columns', nargs='+', choices=FIELDS)
+
+    command = commands.add_parser('update', help="изменение всех записей, подходящих под условия")
+    command.add_argument('--where', type=_field_value, action='append', required=True, metavar='FIELD=VALUE',
+                         help="условие; несколько условий объединяются через И")
+    command.add_argument('--set', type=_field_value, action='append', required=True, metavar='FIELD=VALUE')
+
+    command = commands.add_parser('delete', help="удаление записей с заданным значением поля")
+    command.add_argument('field', choices=FIELDS)
+    command.add_argument('value')
+
+    command = commands.add_parser('clear', help="удаление всех записей")
+    command.add_argument('--yes', action='store_true', required=True, help="подтверждение очистки")
+
+    command = commands.add_parser('backup', help="резервная копия в файл или инкрементальная копия в каталог")
+    command.add_argument('target')
+    command.add_argument('--incremental', action='store_true', help="сжатая копия в каталоге target")
+    command.add_argument('--full', action='store_true', help="новая полная копия в каталоге")
+
+    command = commands.add_parser('restore', help="восстановление из файла копии или каталога копий")
+    command.add_argument('source', help="файл копии, каталог инкрементальных копий или его manifest.json")
+    command.add_argument('--until', help="момент времени YYYY-MM-DD[ HH:MM[:SS]] для каталога копий")
+
+    command = commands.add_parser('aggregate', help="агрегат суммы заказов по полю")
+    command.add_argument('by', choices=['customer_id', 'status', 'date'])
+    command.add_argument('--func', default='sum', choices=['sum', 'avg', 'count', 'min', 'max'])
+    command.add_argument('--bucket', default='month', choices=['day', 'month', 'year'])
+
+    command = commands.add_parser('metrics', help="метрики операций (при запуске с --metrics)")
+    command.add_argument('--format', default='prometheus', choices=['prometheus', 'json'])
+    return commands
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="Работа с базой заказов из командной строки, без графического интерфейса"
+    )
+    parser.add_argument('database', help="файл базы данных (JSON или колоночный *.tdbc)")
+    parser.add_argument('--storage-mode', choices=list(STORAGE_MODES),
+                        help="режим хранения; по умолчанию columnar для *.tdbc и lazy для JSON")
+    parser.add_argument('--create', action='store_true', help="создать базу, если файла нет")
+    parser.add_argument('--quiet', action='store_true', help="не выводить сообщения базы данных в stderr")
+    parser.add_argument('--metrics', action='store_true', help="собирать метрики операций")
+    commands = add_commands(parser)
+    session = commands.add_parser(
+        'session', help="команды из stdin (или файла) по одной в строке при однократном открытии базы"
+    )
+    session.add_argument('--file', help="файл с командами вместо stdin")
+    session.add_argument('--stop-on-error', action='store_true', help="прервать сессию на первой ошибке")
+    return parser
+
+
+def _command_parser():
+    parser = CommandParser(prog='', add_help=False)
+    add_commands(parser)
+    return parser
+
+
+def _emit(value, output):
+    output.write(json.dumps(value, ensure_ascii=False) + '\n')
+
+
+def _emit_documents(documents, output):
+    # Документы - по одному объекту JSON в строке вместе с doc_id
+    for doc in documents:
+        record = dict(doc)
+        record['doc_id'] = doc.doc_id
+        _emit(record, output)
+
+
+def _format_from(path, formats):
+    extension = os.path.splitext(path)[1].lower().lstrip('.')
+    return extension if extension in formats else None
+
+
+def execute(manager, args, output):
+    # Выполнение одной команды; результат - объекты JSON в output. Возвращает код завершения
+    if args.command == 'search':
+        documents = manager.search_by_field(args.field, args.value)
+        if documents is None:
+            return 1
+        _emit_documents(documents, output)
+    elif args.command == 'range':
+        documents = manager.search_range(args.field, args.low, args.high, not args.exclude_from,
+                                         not args.exclude_to, args.descending, args.offset, args.limit)
+        if documents is None:
+            return 1
+        _emit_documents(documents, output)
+    elif args.command == 'list':
+        field_name, value = args.where or (None, None)
+        documents, total = manager.get_page(args.offset, args.limit, args.sort_by, args.descending, field_name, value)
+        _emit_documents(documents, output)
+        print(f"Показано записей: {len(documents)} из {total}.")
+    elif args.command == 'add':
+        results = manager.add_records([[getattr(args, field) for field in FIELDS]])
+        if results is None:
+            return 1
+        _emit(results[0], output)
+        return 0 if results[0]['accepted'] else 1
+    elif args.command == 'import':
+        summary = manager.import_from(args.file, args.format, args.batch_size, args.workers, args.reject_file)
+        if summary is None:
+            return 1
+        _emit(summary, output)
+    elif args.command == 'export':
+        file_format = args.format or _format_from(args.file, EXPORT_FORMATS) or 'csv'
+        field_name, value = args.where or (None, None)
+        summary = manager.export_stream(args.file, file_format, field_name, value, args.columns)
+        if summary is None:
+            return 1
+        _emit(summary, output)
+    elif args.command == 'update':
+        updated = manager.update_where(dict(args.where), dict(args.set))
+        _emit({'updated': updated}, output)
+    elif args.command == 'delete':
+        deleted = manager.delete_record_by_field(args.field, args.value)
+        if deleted is None:
+            return 1
+        _emit({'deleted': deleted}, output)
+    elif args.command == 'clear':
+        manager.clear_all_records()
+        _emit({'cleared': True}, output)
+    elif args.command == 'backup':
+        if args.incremental or args.full:
+            entry = manager.create_incremental_backup(args.target, full=args.full)
+            if entry is None:
+                return 1
+            _emit(entry, output)
+        else:
+            if not manager.create_backup(args.target):
+                return 1
+            _emit({'backup': args.target}, output)
+    elif args.command == 'restore':
+        source = args.source
+        if os.path.basename(source) == 'manifest.json':
+            source = os.path.dirname(source) or '.'
+        if os.path.isdir(source):
+            restored = manager.restore_incremental_backup(source, args.until)
+        else:
+            restored = manager.restore_from_backup(source)
+        if not restored:
+            return 1
+        _emit({'restored': args.source}, output)
+    elif args.command == 'aggregate':
+        for row in manager.aggregate(args.by, args.func, args.bucket):
+            _emit(row, output)
+    elif args.command == 'metrics':
+        report = manager.metrics_report(args.format)
+        if report is None:
+            print("Сбор метрик не включен: запустите с параметром --metrics.", file=sys.stderr)
+            return 1
+        output.write(report if report.endswith('\n') else report + '\n')
+    return 0
+
+
+def run_session(manager, lines, output, stop_on_error=False):
+    # Команды по одной в строке (синтаксис как в командной строке, без файла базы); пустые строки
+    # и строки с # пропускаются. Ошибка в строке не прерывает сессию, если не задан stop_on_error
+    parser = _command_parser()
+    status = 0
+    for line_number, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        try:
+            args = parser.parse_args(shlex.split(line))
+            code = execute(manager, args, output)
+        except (CommandError, ValueError) as e:
+            print(f"Строка {line_number}: {e}", file=sys.stderr)
+            code = 2
+        except SystemExit as e:
+            # Справка по команде (-h) выводится, и сессия продолжается
+            code = 2 if e.code else 0
+        except Exception as e:
+            print(f"Строка {line_number}: ошибка {type(e).__name__}: {e}", file=sys.stderr)
+            code = 1
+        output.flush()
+        if code:
+            status = 1
+            if stop_on_error:
+                break
+    return status
+
+
+def default_storage_mode(path):
+    # Колоночный режим для файлов *.tdbc (в том числе еще не созданных), ленивый - для JSON
+    columnar = is_columnar_file(path) or (not os.path.exists(path) and path.endswith('.tdbc'))
+    return 'columnar' if columnar else 'lazy'
+
+
+def open_database(args):
+    storage_mode = args.storage_mode or default_storage_mode(args.database)
+    options = {}
+    if storage_mode in ('write_behind', 'lazy'):
+        # Изменения сессии сбрасываются на диск пачками и при закрытии, а не после каждой команды
+        options['flush_interval'] = float('inf')
+    manager = DatabaseManager(args.database, storage_mode=storage_mode, metrics=args.metrics or None, **options)
+    if manager.db is None and args.create:
+        manager.create_new_database()
+    return manager
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    output = sys.stdout
+    # Сообщения DatabaseManager идут в stderr, чтобы stdout содержал только результаты
+    messages = open(os.devnull, 'w') if args.quiet else sys.stderr
+    try:
+        with contextlib.redirect_stdout(messages):
+            manager = open_database(args)
+            if manager.db is None:
+                return 1
+            try:
+                if args.command == 'session':
+                    if args.file:
+                        with open(args.file, 'r', encoding='utf-8') as f:
+                            return run_session(manager, f, output, args.stop_on_error)
+                    return run_session(manager, sys.stdin, output, args.stop_on_error)
+                try:
+                    return execute(manager, args, output)
+                except ValueError as e:
+                    print(f"Ошибка: {e}", file=sys.stderr)
+                    return 1
+            finally:
+                manager.close_database()
+    finally:
+        if args.quiet:
+            messages.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
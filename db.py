@@ -1,91 +1,988 @@
 from tinydb import TinyDB, Query
+from tinydb.queries import QueryInstance
 import os
 import sys
-import tkinter as tk
-from tkinter import messagebox, filedialog
-from tkinter import ttk
 import re
-from datetime import datetime
+from datetime import datetime, date as date_type
 import shutil
-import pandas as pd
+import csv
+import io
+import json
+from bisect import bisect_left, bisect_right, insort
+from collections import deque, OrderedDict
+from collections.abc import Mapping
+from itertools import islice
+from concurrent.futures import Future, ProcessPoolExecutor
+import threading
+import functools
+from contextlib import contextmanager
+
+from backups import BackupChain
+from metrics import Metrics, instrumented
+from records import compact_record, plain, result_document
+from storages import (CachedJSONStorage, WriteBehindStorage, LazyJSONStorage, LogStorage, ColumnarStorage,
+                      SharedJSONStorage, FileLock, log_paths, offset_index_path, read_database_file,
+                      atomic_write_json, write_columnar, is_columnar_file)
+
+
+FIELDS = ['order_id', 'customer_id', 'amount', 'date', 'status', 'delivery_address']
+
+# Типы полей, к которым приводятся значения при поиске, удалении и редактировании
+FIELD_TYPES = {
+    'order_id': int,
+    'customer_id': int,
+    'amount': float,
+    'date': str,
+    'status': str,
+    'delivery_address': str
+}
+
+# Поля, по которым по умолчанию строится хеш-индекс
+INDEXED_FIELDS = ['order_id', 'customer_id', 'status', 'date']
+
+# Размер порции строк при потоковом экспорте
+EXPORT_CHUNK_SIZE = 10000
+
+# Размер пачки, записываемой одной операцией при импорте, и порции строк, проверяемой одним процессом
+IMPORT_BATCH_SIZE = 10000
+VALIDATION_CHUNK_SIZE = 5000
+
+# Поля, по которым строится упорядоченный индекс для диапазонных запросов и сортировки
+SORTED_FIELDS = ['date', 'amount']
+
+# Функции агрегирования суммы заказа и интервалы группировки по дате
+AGGREGATES = {'sum': 'sum', 'avg': 'mean', 'mean': 'mean', 'count': 'count', 'min': 'min', 'max': 'max'}
+DATE_BUCKETS = {'day': 'D', 'month': 'M', 'year': 'Y'}
+
+# Режимы хранения: 'json' - файл стандартного формата TinyDB, каждое изменение перезаписывает файл,
+# разобранные данные хранятся в памяти до изменения файла;
+# 'write_behind' - кэш в памяти с отложенной атомарной записью на диск;
+# 'wal' - снимок и журнал изменений, каждое изменение дописывается в журнал;
+# 'columnar' - двоичный колоночный файл, отображаемый в память (требуется numpy);
+# 'lazy' - JSON-файл, отображаемый в память, документы разбираются при обращении, запись отложенная;
+# 'shared' - файл, с которым одновременно работают несколько процессов: запись под межпроцессной
+# блокировкой, чтение из снимка без блокировок
+STORAGE_MODES = {
+    'json': CachedJSONStorage,
+    'write_behind': WriteBehindStorage,
+    'wal': LogStorage,
+    'columnar': ColumnarStorage,
+    'lazy': LazyJSONStorage,
+    'shared': SharedJSONStorage
+}
+
+# Режимы, в которых индексы строятся при первом обращении, а не при открытии базы
+LAZY_MODES = ('columnar', 'lazy')
+
+# Режимы, в которых документы таблицы держатся в памяти хранилища компактными записями
+MEMORY_MODES = ('write_behind', 'wal', 'lazy', 'shared')
+
+# Ограничения кэша результатов поиска: число запросов и примерный объем в байтах
+CACHE_SIZE = 256
+CACHE_BYTES = 16 * 1024 * 1024
+
+
+def parse_record(order_id, customer_id, amount, date, status, delivery_address):
+    # Проверка и преобразование типов по тем же правилам, что и при вводе в окне приложения
+    order_id, customer_id, amount, date, status, delivery_address = [
+        '' if value is None else str(value).strip()
+        for value in (order_id, customer_id, amount, date, status, delivery_address)
+    ]
+
+    if order_id.isdigit():
+        order_id = int(order_id)
+    else:
+        raise ValueError("Некорректный формат Order ID.")
+
+    if customer_id.isdigit():
+        customer_id = int(customer_id)
+    else:
+        raise ValueError("Некорректный формат Customer ID.")
+
+    if amount.replace('.', '', 1).isdigit():  # Проверка на float
+        amount = float(amount)
+    else:
+        raise ValueError("Некорректный формат Amount.")
+
+    # Проверка формата даты
+    if date:
+        if re.match(r'\d{4}-\d{2}-\d{2}', date):
+            try:
+                date = datetime.strptime(date, '%Y-%m-%d').strftime('%Y-%m-%d')
+            except ValueError:
+                raise ValueError("Некорректный формат даты. Используйте YYYY-MM-DD.")
+        else:
+            raise ValueError("Некорректный формат даты. Используйте YYYY-MM-DD.")
+
+    return {
+        'order_id': order_id,
+        'customer_id': customer_id,
+        'amount': amount,
+        'date': date,
+        'status': status,
+        'delivery_address': delivery_address
+    }
+
+
+class OperationCancelled(Exception):
+    # Исключение, которым обработчик прогресса прерывает длительную операцию
+    pass
+
+
+def record_values(record):
+    # Значения записи в порядке FIELDS из словаря или последовательности
+    if isinstance(record, Mapping):
+        return [record.get(field) for field in FIELDS]
+    try:
+        values = list(record)
+    except TypeError:
+        raise ValueError("Запись должна быть словарем или списком значений.") from None
+    if len(values) != len(FIELDS):
+        raise ValueError("Некорректное количество полей.")
+    return values
+
+
+def row_order_id(values):
+    # order_id строки для результата add_records: из документа, из списка значений или None,
+    # если строка не является ни тем, ни другим (например, число вместо записи)
+    if isinstance(values, Mapping):
+        return values.get('order_id')
+    if isinstance(values, (list, tuple)) and values:
+        return values[0]
+    return None
+
+
+def validate_rows(rows):
+    # Проверка пар (номер строки, запись). Для каждой строки возвращается (номер, документ, None)
+    # или (номер, исходные значения, текст ошибки). Функция выполняется и в процессах пула
+    for row_number, record in rows:
+        try:
+            values = record_values(record)
+        except (TypeError, ValueError) as e:
+            yield row_number, record, str(e)
+            continue
+        try:
+            yield row_number, parse_record(*values), None
+        except ValueError as e:
+            yield row_number, values, str(e)
+
+
+def _validate_chunk(chunk):
+    return list(validate_rows(chunk))
+
+
+def _chunked(items, size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def validate_in_pool(rows, workers=None, chunk_size=VALIDATION_CHUNK_SIZE):
+    # Параллельная проверка строк порциями в пуле процессов с сохранением исходного порядка.
+    # Одновременно в работе не больше двух порций на процесс, поэтому файл не читается целиком
+    if workers == 0:
+        yield from validate_rows(rows)
+        return
+
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        max_pending = workers * 2
+        pending = deque()
+        for chunk in _chunked(rows, chunk_size):
+            pending.append(executor.submit(_validate_chunk, chunk))
+            if len(pending) >= max_pending:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def detect_file_format(path):
+    extension = os.path.splitext(path)[1].lower()
+    return {'.csv': 'csv', '.xlsx': 'xlsx', '.jsonl': 'jsonl', '.ndjson': 'jsonl'}.get(extension)
+
+
+def _read_csv_rows(path):
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        for row_number, row in enumerate(csv.DictReader(f), start=1):
+            yield row_number, row
+
+
+def _xlsx_cell(value):
+    # Excel хранит даты как datetime, а целые числа иногда как float
+    if isinstance(value, (datetime, date_type)):
+        return value.strftime('%Y-%m-%d')
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def _read_xlsx_rows(path):
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [str(cell).strip() if cell is not None else '' for cell in next(rows, ())]
+        for row_number, row in enumerate(rows, start=1):
+            yield row_number, {column: _xlsx_cell(value) for column, value in zip(header, row)}
+    finally:
+        workbook.close()
+
+
+def _read_jsonl_rows(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        row_number = 0
+        for line in f:
+            if not line.strip():
+                continue
+            row_number += 1
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = line.rstrip('\n')
+            # Не-объекты (и строки с ошибкой разбора) будут отклонены при проверке
+            yield row_number, record if isinstance(record, dict) else [record]
+
+
+IMPORT_READERS = {
+    'csv': _read_csv_rows,
+    'xlsx': _read_xlsx_rows,
+    'jsonl': _read_jsonl_rows
+}
+
+
+def write_export(chunks, file_path, file_format, columns, progress=None):
+    # Запись порций строк в файл CSV или XLSX; progress(строк, байт) вызывается после каждой порции
+    rows = 0
+    bytes_written = 0
+
+    if file_format == 'csv':
+        with open(file_path, 'wb') as raw:
+            text = io.TextIOWrapper(raw, encoding='utf-8', newline='')
+            writer = csv.writer(text)
+            writer.writerow(columns)
+            for chunk in chunks:
+                writer.writerows(chunk)
+                text.flush()
+                rows += len(chunk)
+                bytes_written = raw.tell()
+                if progress:
+                    progress(rows, bytes_written)
+            text.flush()
+            bytes_written = raw.tell()
+            text.detach()
+    elif file_format == 'xlsx':
+        from openpyxl import Workbook
+
+        # В режиме write_only строки сразу уходят во временный файл, а не хранятся в книге
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet()
+        sheet.append(columns)
+        try:
+            for chunk in chunks:
+                for row in chunk:
+                    sheet.append(row)
+                rows += len(chunk)
+                if progress:
+                    progress(rows, bytes_written)
+        except BaseException:
+            # Отмена или ошибка: временный файл листа удаляется сразу, а не при выходе из процесса
+            sheet.close()
+            sheet._writer.cleanup()
+            raise
+        workbook.save(file_path)
+        bytes_written = os.path.getsize(file_path)
+        if progress:
+            progress(rows, bytes_written)
+    else:
+        raise ValueError(f"Неподдерживаемый формат экспорта: {file_format}")
+
+    return {'rows': rows, 'bytes': bytes_written}
+
+
+class RejectWriter:
+    # Файл отклоненных строк создается только при первой отклоненной строке
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+        self._writer = None
+
+    def write(self, row_number, values, error):
+        if self._writer is None:
+            self._file = open(self.path, 'w', encoding='utf-8', newline='')
+            self._writer = csv.writer(self._file)
+            self._writer.writerow(['row', 'error'] + FIELDS)
+        if isinstance(values, Mapping):
+            values = [values.get(field) for field in FIELDS]
+        elif not isinstance(values, (list, tuple)):
+            values = [values]
+        self._writer.writerow([row_number, error] + list(values))
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+
+class HashIndex:
+    # Индекс в памяти: для каждого поля хранит отображение значение -> множество doc_id,
+    # а для каждого документа - проиндексированные значения, чтобы удалять его без чтения файла
+    def __init__(self, fields):
+        self.fields = list(fields)
+        self._values = {field: {} for field in self.fields}
+        self._docs = {}
+
+    def covers(self, field_name):
+        return field_name in self._values
+
+    def clear(self):
+        for values in self._values.values():
+            values.clear()
+        self._docs.clear()
+
+    def build(self, table):
+        self.clear()
+        for doc_id, doc in table.items():
+            self.add(int(doc_id), doc)
+
+    def add(self, doc_id, doc):
+        keys = {}
+        for field in self.fields:
+            value = doc.get(field)
+            self._values[field].setdefault(value, set()).add(doc_id)
+            keys[field] = value
+        self._docs[doc_id] = keys
+
+    def remove(self, doc_id):
+        keys = self._docs.pop(doc_id, None)
+        if keys is None:
+            return
+        for field, value in keys.items():
+            doc_ids = self._values[field].get(value)
+            if doc_ids is not None:
+                doc_ids.discard(doc_id)
+                if not doc_ids:
+                    del self._values[field][value]
+
+    def update(self, doc_id, fields):
+        keys = dict(self._docs.get(doc_id, {}))
+        keys.update((field, value) for field, value in fields.items() if field in self._values)
+        self.remove(doc_id)
+        self.add(doc_id, keys)
+
+    def lookup(self, field_name, value):
+        return self._values[field_name].get(value, set())
+
+
+def sortable_value(field_name, value):
+    # Значение можно сравнивать с другими значениями поля: числа для amount и id, непустые строки для остальных
+    if isinstance(value, bool):
+        return False
+    if FIELD_TYPES[field_name] is str:
+        return isinstance(value, str) and value != ''
+    return isinstance(value, (int, float))
+
+
+class SortedIndex:
+    # Упорядоченный индекс одного поля: отсортированный список пар (значение, doc_id).
+    # Пустые и нечисловые (для amount) значения не индексируются
+    def __init__(self, field):
+        self.field = field
+        self._keys = []
+        self._values = {}
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, doc_id):
+        return doc_id in self._values
+
+    def clear(self):
+        self._keys = []
+        self._values.clear()
+
+    def build(self, table):
+        self.clear()
+        for doc_id, doc in table.items():
+            value = doc.get(self.field)
+            if sortable_value(self.field, value):
+                self._values[int(doc_id)] = value
+        self._keys = sorted((value, doc_id) for doc_id, value in self._values.items())
+
+    def add(self, doc_id, doc):
+        value = doc.get(self.field)
+        if sortable_value(self.field, value):
+            self._values[doc_id] = value
+            insort(self._keys, (value, doc_id))
+
+    def remove(self, doc_id):
+        if doc_id not in self._values:
+            return
+        key = (self._values.pop(doc_id), doc_id)
+        position = bisect_left(self._keys, key)
+        if position < len(self._keys) and self._keys[position] == key:
+            del self._keys[position]
+
+    def update(self, doc_id, fields):
+        if self.field in fields:
+            self.remove(doc_id)
+            self.add(doc_id, fields)
+
+    def range(self, low=None, high=None, include_low=True, include_high=True,
+              descending=False, offset=0, limit=None):
+        # doc_id документов со значением в заданных границах за O(log n + k)
+        if low is None:
+            start = 0
+        elif include_low:
+            start = bisect_left(self._keys, (low,))
+        else:
+            start = bisect_right(self._keys, (low, float('inf')))
+        if high is None:
+            stop = len(self._keys)
+        elif include_high:
+            stop = bisect_right(self._keys, (high, float('inf')))
+        else:
+            stop = bisect_left(self._keys, (high,))
+        if stop <= start:
+            return []
+
+        if descending:
+            stop -= offset
+            start = max(start, stop - limit) if limit is not None else start
+            keys = reversed(self._keys[start:stop]) if stop > start else []
+        else:
+            start += offset
+            stop = min(stop, start + limit) if limit is not None else stop
+            keys = self._keys[start:stop] if stop > start else []
+        return [doc_id for _, doc_id in keys]
+
+
+class ResultCache:
+    # LRU-кэш результатов поиска по ключу (поле, значение). Запись вытесняет из кэша только те
+    # ключи, в выборки которых входил или попадает измененный документ
+    def __init__(self, max_entries=CACHE_SIZE, max_bytes=CACHE_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def _size(documents):
+        # Примерный объем выборки в памяти: словари документов и их значения
+        return sys.getsizeof(documents) + sum(
+            sys.getsizeof(doc) + sum(sys.getsizeof(value) for value in doc.values()) for doc in documents
+        )
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key, documents):
+        self._discard(key)
+        size = self._size(documents)
+        if size > self.max_bytes:
+            return
+        self._entries[key] = (documents, size)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self._bytes -= evicted_size
+            self.evictions += 1
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[1]
+        return entry is not None
+
+    def invalidate(self, documents):
+        # Сброс ключей по значениям всех полей документов (старых и новых версий)
+        if not self._entries:
+            return
+        for doc in documents:
+            for field in FIELDS:
+                if self._discard((field, doc.get(field))):
+                    self.invalidations += 1
+
+    def clear(self):
+        self._entries.clear()
+        self._bytes = 0
+
+    def stats(self):
+        requests = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'bytes': self._bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / requests if requests else 0.0,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations
+        }
+
+
+def exclusive(method):
+    # Метод DatabaseManager, изменяющий данные: в режиме shared он целиком, вместе с проверками
+    # уникальности, выполняется под блокировкой записи на актуальной версии файла
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._writing():
+            return method(self, *args, **kwargs)
+    return wrapper
 
 
 class DatabaseManager:
-    def __init__(self, file_path):
+    def __init__(self, file_path, use_index=True, storage_mode='json', cache_size=CACHE_SIZE,
+                 cache_bytes=CACHE_BYTES, metrics=None, **storage_options):
+        if storage_mode not in STORAGE_MODES:
+            raise ValueError(f"Неизвестный режим хранения: {storage_mode}")
         self.file_path = file_path
+        self.storage_mode = storage_mode
+        self.storage_options = storage_options
+        self.index = HashIndex(INDEXED_FIELDS) if use_index else None
+        self.sorted_indexes = {field: SortedIndex(field) for field in SORTED_FIELDS} if use_index else {}
+        self.indexes = ([self.index] if self.index is not None else []) + list(self.sorted_indexes.values())
+        self._indexes_ready = False
+        # Кэш результатов search_by_field; cache_size=0 отключает его
+        self.cache = ResultCache(cache_size, cache_bytes) if cache_size else None
+        self._file_lock = FileLock(file_path + '.lock') if storage_mode == 'shared' else None
+        # Метрики операций: True или экземпляр Metrics включает их, None - отключает
+        self.metrics = Metrics() if metrics is True else metrics or None
+        self._storage_generation = None
+        # Номер версии данных увеличивается при каждом изменении и сбрасывает производные кэши
+        self._version = 0
+        self._frame = None
+        self._frame_version = None
+        self._page_order = None
         if os.path.exists(self.file_path):
-            self.db = TinyDB(self.file_path)
+            self._open()
         else:
             print("База данных по указанному пути не существует.")
             self.db = None
 
+    def _open(self):
+        options = dict(self.storage_options)
+        if self._file_lock is not None:
+            options['lock'] = self._file_lock
+        self.db = TinyDB(self.file_path, storage=STORAGE_MODES[self.storage_mode], **options)
+        self._storage_generation = getattr(self.db.storage, 'generation', None)
+        if self.cache is not None:
+            self.cache.clear()
+        self._rebuild_index()
+        self._changed()
+
+    def _changed(self):
+        self._version += 1
+        self._frame = None
+        self._page_order = None
+
+    @instrumented
+    def flush(self):
+        # Сброс несохраненных изменений на диск для режимов с отложенной записью
+        if self.db is not None and hasattr(self.db.storage, 'flush'):
+            self.db.storage.flush()
+
+    @instrumented
+    def checkpoint(self):
+        # Приведение файла базы к самодостаточному снимку: журнал сворачивается, кэш сбрасывается
+        if self.db is not None and hasattr(self.db.storage, 'compact'):
+            self.db.storage.compact()
+        else:
+            self.flush()
+
+    def enable_metrics(self, slow_threshold=None, slow_log_file=None):
+        # Включение сбора метрик; slow_threshold - порог в секундах для журнала медленных операций
+        if self.metrics is None:
+            self.metrics = Metrics()
+        if slow_threshold is not None:
+            self.metrics.slow_threshold = slow_threshold
+        if slow_log_file is not None:
+            self.metrics.slow_log_file = slow_log_file
+        return self.metrics
+
+    def disable_metrics(self):
+        self.metrics = None
+
+    def metrics_report(self, format='prometheus'):
+        # Снимок метрик в текстовом формате Prometheus или в JSON вместе со статистикой кэша
+        if self.metrics is None:
+            return None
+        if format == 'json':
+            return self.metrics.to_json(self.cache_stats(), indent=2)
+        return self.metrics.to_prometheus(self.cache_stats())
+
+    def _scanned(self, rows, full_scan=False):
+        # Учет прочитанных операцией строк: rows - число или коллекция, длина которой
+        # вычисляется только при включенных метриках
+        if self.metrics is not None:
+            self.metrics.scanned(rows if isinstance(rows, int) else len(rows), full_scan)
+
+    def _scan(self, condition, first=False):
+        # Поиск полным просмотром через TinyDB (first=True - только проверка наличия). С метриками строки
+        # считаются в том же проходе оберткой условия с тем же ключом кэша запросов TinyDB: len(self.db)
+        # заново прочитал бы и разобрал файл в режиме json, а при попадании в кэш строки не читаются вовсе
+        if self.metrics is None:
+            return self.db.contains(condition) if first else self.db.search(condition)
+        rows = 0
+
+        def counted(doc):
+            nonlocal rows
+            rows += 1
+            return condition(doc)
+
+        query = QueryInstance(counted, condition._hash)
+        result = self.db.contains(query) if first else self.db.search(query)
+        self._scanned(rows, full_scan=True)
+        return result
+
+    def _mark(self, doc_ids=(), appended=0, truncate=False):
+        # Сообщает хранилищу с журналом, какие документы затронет следующая запись
+        if hasattr(self.db.storage, 'mark'):
+            self.db.storage.mark(self.db.default_table_name, doc_ids, appended, truncate)
+
+    def _apply(self, changes):
+        # Режим wal: TinyDB при каждом изменении дважды копирует всю таблицу, поэтому документы меняются
+        # прямо в таблице хранилища, а в журнал дописываются только они. Кэш запросов TinyDB сбрасывается
+        table = self.db.table(self.db.default_table_name)
+        self.db.storage.apply(table.name, changes)
+        table.clear_cache()
+
+    def _rebuild_index(self):
+        # В ленивых режимах чтение всей таблицы откладывается до первого запроса, которому нужен индекс
+        self._indexes_ready = False
+        if self.storage_mode not in LAZY_MODES:
+            self._ensure_indexes()
+
+    def _refresh(self):
+        # Режимы json и shared: переход на версию файла, записанную другим процессом. Снимок не меняется
+        # в течение операции, а индексы, кэши и счетчик doc_id строятся заново для новой версии
+        if not hasattr(self.db.storage, 'refresh'):
+            return
+        self.db.storage.refresh()
+        if self.db.storage.generation != self._storage_generation:
+            self._storage_generation = self.db.storage.generation
+            # TinyDB запоминает следующий doc_id таблицы и результаты запросов; после чужих изменений
+            # doc_id вычисляется заново, а кэш запросов сбрасывается
+            table = self.db.table(self.db.default_table_name)
+            table._next_id = None
+            table.clear_cache()
+            self._changed()
+            if self.cache is not None:
+                self.cache.clear()
+            self._indexes_ready = False
+
+    @contextmanager
+    def _writing(self):
+        if self._file_lock is None or self.db is None:
+            yield
+            return
+        with self._file_lock.exclusive():
+            self._refresh()
+            yield
+
+    def _ensure_indexes(self):
+        self._refresh()
+        if not self._indexes_ready:
+            if self.indexes:
+                table = self._read_table()
+                if self.storage_mode in LAZY_MODES:
+                    # Документы разбираются один раз на все индексы, а не при каждом проходе
+                    table = dict(table.items())
+                for index in self.indexes:
+                    index.build(table)
+                self._scanned(table, full_scan=True)
+            self._indexes_ready = True
+
+    def _read_table(self):
+        # Документы таблицы в виде, в котором их хранит хранилище: {str(doc_id): документ}
+        tables = self.db.storage.read() or {}
+        return tables.get(self.db.default_table_name, {})
+
+    def _get_documents(self, doc_ids):
+        # Чтение документов по doc_id в заданном порядке за одно обращение к хранилищу
+        table = self._read_table()
+        documents = []
+        for doc_id in doc_ids:
+            doc = table.get(str(doc_id))
+            if doc is not None:
+                documents.append(result_document(doc, doc_id))
+        return documents
+
+    def _find_documents(self, field_name, value):
+        self._ensure_indexes()
+        typed_value = FIELD_TYPES[field_name](value)
+        if self.index is not None and self.index.covers(field_name):
+            documents = self._get_documents(sorted(self.index.lookup(field_name, typed_value)))
+            self._scanned(documents)
+            return documents
+        Record = Query()
+        return self._scan(Record[field_name] == typed_value)
+
+    def _cached_documents(self, doc_ids):
+        # Текущие версии документов, которые нужно вытеснить из кэша перед изменением
+        if self.cache is None or not len(self.cache):
+            return []
+        return self._get_documents(doc_ids)
+
+    def _insert_documents(self, documents):
+        self._ensure_indexes()
+        if hasattr(self.db.storage, 'apply'):
+            table = self.db.table(self.db.default_table_name)
+            doc_ids = [table._get_next_id() for _ in documents]
+            self._apply([(str(doc_id), compact_record(dict(doc))) for doc_id, doc in zip(doc_ids, documents)])
+        else:
+            self._mark(appended=len(documents))
+            doc_ids = self.db.insert_multiple(documents)
+            if self.storage_mode in MEMORY_MODES:
+                # TinyDB сохраняет новые документы словарями; в памяти хранилища они заменяются записями
+                table = self._read_table()
+                if isinstance(table, dict):
+                    for doc_id in doc_ids:
+                        table[str(doc_id)] = compact_record(table[str(doc_id)])
+        self._changed()
+        if self.cache is not None:
+            self.cache.invalidate(documents)
+        for index in self.indexes:
+            for doc_id, doc in zip(doc_ids, documents):
+                index.add(doc_id, doc)
+        return doc_ids
+
+    def _update_documents(self, fields, doc_ids):
+        doc_ids = list(doc_ids)
+        self._ensure_indexes()
+        old_documents = self._cached_documents(doc_ids)
+        if hasattr(self.db.storage, 'apply'):
+            table = self._read_table()
+            updated_ids = [doc_id for doc_id in doc_ids if str(doc_id) in table]
+            for doc_id in updated_ids:
+                table[str(doc_id)].update(fields)
+            self._apply([(str(doc_id), table[str(doc_id)]) for doc_id in updated_ids])
+        else:
+            self._mark(doc_ids)
+            updated_ids = self.db.update(fields, doc_ids=doc_ids)
+        self._changed()
+        if old_documents:
+            # Документ покидает выборки по старым значениям и попадает в выборки по новым
+            self.cache.invalidate(old_documents)
+            self.cache.invalidate([fields])
+        for index in self.indexes:
+            for doc_id in updated_ids:
+                index.update(doc_id, fields)
+        return updated_ids
+
+    def _remove_documents(self, doc_ids):
+        doc_ids = list(doc_ids)
+        self._ensure_indexes()
+        old_documents = self._cached_documents(doc_ids)
+        if hasattr(self.db.storage, 'apply'):
+            table = self._read_table()
+            removed_ids = [doc_id for doc_id in doc_ids if str(doc_id) in table]
+            self._apply([(str(doc_id), None) for doc_id in removed_ids])
+        else:
+            self._mark(doc_ids)
+            removed_ids = self.db.remove(doc_ids=doc_ids)
+        self._changed()
+        if old_documents:
+            self.cache.invalidate(old_documents)
+        for index in self.indexes:
+            for doc_id in removed_ids:
+                index.remove(doc_id)
+        return removed_ids
+
+    def _truncate(self):
+        self._mark(truncate=True)
+        self.db.truncate()
+        self._changed()
+        if self.cache is not None:
+            self.cache.clear()
+        for index in self.indexes:
+            index.clear()
+        self._indexes_ready = True
+
+    def _order_exists(self, order_id):
+        self._ensure_indexes()
+        if self.index is not None:
+            return bool(self.index.lookup('order_id', order_id))
+        Order = Query()
+        return self._scan(Order.order_id == order_id, first=True)
+
+    @instrumented
     def create_new_database(self):
         if not os.path.exists(self.file_path):
-            self.db = TinyDB(self.file_path)
+            self._open()
             # Создание пустой таблицы с указанием всех полей
-            self.db.insert({
+            self._insert_documents([{
                 'order_id': None,
                 'customer_id': None,
                 'amount': None,
                 'date': None,
                 'status': None,
                 'delivery_address': None
-            })
+            }])
+            self.flush()
             print(f"Создана новая база данных по пути {self.file_path}.")
         else:
             print("База данных с таким именем уже существует в указанной директории.")
 
+    @instrumented
+    @exclusive
     def add_record(self, order_id, customer_id, amount, date, status, delivery_address):
-        if self.db:
-            Order = Query()
-            if not self.db.contains(Order.order_id == order_id):
-                self.db.insert({
+        if self.db is not None:
+            if not self._order_exists(order_id):
+                self._insert_documents([{
                     'order_id': order_id,
                     'customer_id': customer_id,
                     'amount': amount,
                     'date': date,
                     'status': status,
                     'delivery_address': delivery_address
-                })
+                }])
                 print("Запись успешно добавлена.")
             else:
                 print("Запись с такими ключевыми полями уже существует.")
         else:
             print("База данных не открыта.")
 
+    @exclusive
+    def _ingest(self, validated, batch_size, on_result):
+        # Проверка уникальности и запись проверенных строк пачками по batch_size одной операцией.
+        # validated - последовательность (номер строки, документ или исходные значения, ошибка);
+        # on_result(номер строки, значения, принята ли строка, ошибка) вызывается для каждой строки
+        if self.index is None:
+            # Без индекса существующие order_id собираются один раз, а не сканируются на каждую строку
+            Order = Query()
+            existing_ids = {doc.get('order_id') for doc in self._scan(Order.order_id.exists())}
+        else:
+            existing_ids = None
+
+        seen_ids = set()
+        batch = []
+        accepted = 0
+        rejected = 0
+
+        for row_number, values, error in validated:
+            if error is None:
+                order_id = values['order_id']
+                if order_id in seen_ids:
+                    error = "Повторяющийся Order ID в загружаемых данных."
+                elif order_id in existing_ids if existing_ids is not None else self._order_exists(order_id):
+                    error = "Запись с таким Order ID уже существует."
+            if error is not None:
+                rejected += 1
+                on_result(row_number, values, False, error)
+                continue
+
+            seen_ids.add(order_id)
+            batch.append(values)
+            on_result(row_number, values, True, None)
+            if len(batch) >= batch_size:
+                self._insert_documents(batch)
+                accepted += len(batch)
+                batch = []
+
+        if batch:
+            self._insert_documents(batch)
+            accepted += len(batch)
+        return accepted, rejected
+
+    @instrumented
+    def add_records(self, records, batch_size=1000):
+        # Пакетное добавление: каждая пачка записывается в файл одной операцией.
+        # records - итерируемый набор словарей с полями FIELDS или последовательностей значений в том же порядке.
+        # Возвращает список результатов по каждой строке: принята ли она и причина отказа.
+        if self.db is None:
+            print("База данных не открыта.")
+            return None
+
+        results = []
+
+        def collect(row_number, values, accepted, error):
+            results.append({'row': row_number, 'order_id': row_order_id(values), 'accepted': accepted, 'error': error})
+
+        validated = validate_rows(enumerate(records, start=1))
+        accepted, rejected = self._ingest(validated, batch_size, collect)
+        print(f"Добавлено записей: {accepted}, отклонено: {rejected}.")
+        return results
+
+    @instrumented
+    def import_from(self, path, file_format=None, batch_size=IMPORT_BATCH_SIZE, workers=None, reject_file=None):
+        # Потоковая загрузка CSV, XLSX или JSON Lines. Строки читаются порциями, проверяются
+        # в пуле процессов по правилам parse_record, дубликаты order_id отбрасываются, а принятые
+        # строки записываются пачками по batch_size. Отклоненные строки с причиной попадают в
+        # reject_file (по умолчанию <файл>.rejects.csv: у orders.csv и orders.jsonl разные файлы).
+        # workers=0 - проверка в текущем процессе
+        if self.db is None:
+            print("База данных не открыта.")
+            return None
+
+        file_format = file_format or detect_file_format(path)
+        if file_format not in IMPORT_READERS:
+            print(f"Неподдерживаемый формат импорта: {file_format}")
+            return None
+        if reject_file is None:
+            reject_file = path + '.rejects.csv'
+
+        rows = IMPORT_READERS[file_format](path)
+        validated = validate_in_pool(rows, workers)
+        rejects = RejectWriter(reject_file)
+        try:
+            def on_result(row_number, values, accepted, error):
+                if not accepted:
+                    rejects.write(row_number, values, error)
+
+            accepted, rejected = self._ingest(validated, batch_size, on_result)
+        finally:
+            rejects.close()
+
+        print(f"Импортировано записей: {accepted}, отклонено: {rejected}.")
+        if rejected:
+            print(f"Отклоненные строки записаны в файл: {reject_file}")
+        return {'accepted': accepted, 'rejected': rejected, 'reject_file': reject_file if rejected else None}
+
+    @instrumented
+    @exclusive
     def delete_record_by_field(self, field_name, value):
-        if self.db:
-            Record = Query()
-            if field_name in ['order_id', 'customer_id']:  
-                self.db.remove(Record[field_name] == int(value))  
-                print("Записи успешно удалены.")
-            elif field_name in ['date', 'status', 'delivery_address']: 
-                self.db.remove(Record[field_name] == str(value)) 
-                print("Записи успешно удалены.")
-            elif field_name in ['amount']:  
-                self.db.remove(Record[field_name] == float(value)) 
+        if self.db is not None:
+            if field_name in FIELD_TYPES:
+                documents = self._find_documents(field_name, value)
+                removed_ids = self._remove_documents(doc.doc_id for doc in documents)
                 print("Записи успешно удалены.")
+                return len(removed_ids)
             else:
                 print("Указано некорректное имя поля.")
         else:
             print("База данных не открыта.")
     
+    @instrumented
+    @exclusive
     def clear_all_records(self):
-        if self.db:
-            self.db.truncate()
+        if self.db is not None:
+            self._truncate()
             print("База данных очищена.")
         else:
             print("База данных не открыта.")
 
+    @instrumented
     def search_by_field(self, field_name, value):
-        if self.db:
-            Record = Query()
-            if field_name in ['order_id', 'customer_id']:  
-                results = self.db.search(Record[field_name] == int(value))  
-            elif field_name in ['date', 'status', 'delivery_address']: 
-                results = self.db.search(Record[field_name] == str(value))  
-            elif field_name in ['amount']:  
-                results = self.db.search(Record[field_name] == float(value))  
+        if self.db is not None:
+            if field_name in FIELD_TYPES:
+                results = self._search_cached(field_name, value)
             else:
                 print("Указано некорректное имя поля.")
                 return None
@@ -104,24 +1001,86 @@ class DatabaseManager:
 
 
     
+    def _search_cached(self, field_name, value):
+        # Результат поиска из кэша или из базы; вызывающему возвращаются копии документов
+        self._refresh()
+        if self.cache is None:
+            return self._find_documents(field_name, value)
+        key = (field_name, FIELD_TYPES[field_name](value))
+        documents = self.cache.get(key)
+        if documents is None:
+            documents = self._find_documents(field_name, value)
+            self.cache.put(key, documents)
+        return [result_document(doc, doc.doc_id) for doc in documents]
+
+    def cache_stats(self):
+        # Статистика кэша результатов поиска: число запросов в кэше, объем, попадания и промахи
+        if self.cache is None:
+            return None
+        return self.cache.stats()
+
+    def _match_ids(self, criteria, condition=None):
+        # doc_id документов, у которых все поля из criteria равны заданным значениям и выполняется
+        # condition (функция от документа или запрос TinyDB). Проиндексированные поля сужают выборку
+        # пересечением множеств из индекса, остальные условия проверяются за один проход
+        self._ensure_indexes()
+        typed = {field: FIELD_TYPES[field](value) for field, value in criteria.items()}
+        indexed = [field for field in typed if self.index is not None and self.index.covers(field)]
+        if indexed:
+            candidates = sorted((self.index.lookup(field, typed[field]) for field in indexed), key=len)
+            doc_ids = set(candidates[0]).intersection(*candidates[1:])
+            documents = self._get_documents(sorted(doc_ids))
+        else:
+            documents = self.db
+        self._scanned(documents, full_scan=not indexed)
+        rest = [field for field in typed if field not in indexed]
+        return [
+            doc.doc_id for doc in documents
+            if all(doc.get(field) == typed[field] for field in rest) and (condition is None or condition(doc))
+        ]
+
+    @instrumented
+    def update_where(self, criteria, new_values, condition=None):
+        # Изменение всех подходящих записей одной операцией записи. criteria - словарь {поле: значение},
+        # условия объединяются через И; пустые значения в new_values не изменяются.
+        # Возвращает число измененных записей: записи, в которых уже стоят новые значения, не считаются
+        return self._update_matching(criteria, new_values, condition)[1]
+
+    @exclusive
+    def _update_matching(self, criteria, new_values, condition=None):
+        # Пара (число подходящих записей, число измененных); записываются только измененные
+        if self.db is None:
+            print("База данных не открыта.")
+            return 0, 0
+        if any(field not in FIELD_TYPES for field in criteria):
+            print("Указано некорректное имя поля.")
+            return 0, 0
+
+        doc_ids = self._match_ids(criteria, condition)
+        update_values = {key: value for key, value in new_values.items() if value != ''}
+        if not doc_ids or not update_values:
+            return len(doc_ids), 0
+        table = self._read_table()
+        changed_ids = []
+        for doc_id in doc_ids:
+            doc = table[str(doc_id)]
+            if any(key not in doc or doc[key] != value for key, value in update_values.items()):
+                changed_ids.append(doc_id)
+        if changed_ids:
+            self._update_documents(update_values, changed_ids)
+        return len(doc_ids), len(changed_ids)
+
+    @instrumented
     def edit_record(self, field_name, old_value, new_values):
-        if self.db:
-            Record = Query()
-            results = []
-            if field_name in ['order_id', 'customer_id']:  
-                results = self.db.search(Record[field_name] == int(old_value))  
-            elif field_name in ['date', 'status', 'delivery_address']: 
-                results = self.db.search(Record[field_name] == str(old_value))  
-            elif field_name in ['amount']:  
-                results = self.db.search(Record[field_name] == float(old_value))  
-            else:
+        if self.db is not None:
+            if field_name not in FIELD_TYPES:
                 print("Указано некорректное имя поля.")
                 return False
 
-            if results:
-                for result in results:
-                    update_values = {key: value for key, value in new_values.items() if value != ''}
-                    self.db.update(update_values, Record[field_name] == result[field_name])
+            matched, changed = self._update_matching({field_name: old_value}, new_values)
+            if matched:
+                if not changed:
+                    print("Записи уже содержат указанные значения.")
                 return True
             else:
                 print("Записей с указанным значением не найдено.")
@@ -130,8 +1089,10 @@ class DatabaseManager:
             print("База данных не открыта.")
             return False
         
+    @instrumented
     def create_backup(self, backup_file):
         try:
+            self.checkpoint()
             if os.path.exists(backup_file):
                 os.remove(backup_file)
             shutil.copy2(self.file_path, backup_file)
@@ -141,19 +1102,49 @@ class DatabaseManager:
             print(f"Ошибка при создании резервной копии: {e}")
             return False
         
+    @instrumented
     def close_database(self):
-        if self.db:
+        if self.db is not None:
             self.db.close()
             print("База данных закрыта.")
             self.db = None
+            self._changed()
+            for index in self.indexes:
+                index.clear()
+            if self.cache is not None:
+                self.cache.clear()
+
+    @exclusive
+    def _replace_file(self, write):
+        # Замена файла базы: база закрывается, write() записывает новый файл, журнал прежнего снимка
+        # и индекс смещений прежнего файла удаляются, и база открывается снова с перестроением индексов.
+        # Индекс смещений нельзя оставлять: copy2 переносит время изменения копии, и при равном размере
+        # индекс прежнего файла был бы принят для нового
+        self.close_database()
+        write()
+        for path in log_paths(self.file_path) + (offset_index_path(self.file_path),):
+            if os.path.exists(path):
+                os.remove(path)
+        self._open()
+
+    def _write_file(self, tables):
+        # Запись полного состояния в файл базы в формате текущего режима хранения
+        if self.storage_mode == 'columnar':
+            write_columnar(self.file_path, tables)
+        else:
+            atomic_write_json(self.file_path, tables)
 
+    @instrumented
     def restore_from_backup(self, backup_file):
         try:
-            self.close_database()  # Закрытие базы данных перед восстановлением из копии
             if os.path.exists(backup_file):
-                shutil.copy2(backup_file, self.file_path)
+                if (any(os.path.exists(path) for path in log_paths(backup_file))
+                        or is_columnar_file(backup_file) != (self.storage_mode == 'columnar')):
+                    # Копия с журналом или в другом формате: восстанавливаем итоговое состояние одним файлом
+                    self._replace_file(lambda: self._write_file(read_database_file(backup_file) or {}))
+                else:
+                    self._replace_file(lambda: shutil.copy2(backup_file, self.file_path))
                 print(f"База данных восстановлена из резервной копии: {backup_file}")
-                self.db = TinyDB(self.file_path)  # После восстановления открываем базу данных снова
                 return True
             else:
                 print(f"Файл резервной копии не найден: {backup_file}")
@@ -161,15 +1152,127 @@ class DatabaseManager:
         except Exception as e:
             print(f"Ошибка при восстановлении из резервной копии: {e}")
             return False
-        
-    def export_to_csv(self, csv_file):
-        if self.db:
+
+    def _snapshot(self):
+        # Согласованная копия всех таблиц в памяти; дальнейшие изменения базы ее не затрагивают.
+        # В режиме shared копия снимается под блокировкой с актуальной версии файла
+        with self._writing():
+            tables = self.db.storage.read() or {}
+            return {name: {doc_id: plain(doc) for doc_id, doc in table.items()} for name, table in tables.items()}
+
+    @instrumented
+    def create_incremental_backup(self, backup_dir, full=False, background=False):
+        # Сжатая полная или инкрементальная копия в каталоге backup_dir. Данные копируются в памяти,
+        # а сжатие и запись идут уже без обращения к базе; при background=True - в отдельном потоке,
+        # и возвращается Future с записью манифеста. Иначе возвращается сама запись манифеста
+        if self.db is None:
+            print("База данных не открыта.")
+            return None
+
+        def create(snapshot):
             try:
-                data = self.db.all()
-                df = pd.DataFrame(data)
-                df.to_csv(csv_file, index=False)
+                entry = BackupChain(backup_dir).create(snapshot, full)
+            except Exception as e:
+                print(f"Ошибка при создании резервной копии: {e}")
+                return None
+            kind = "Полная" if entry['type'] == 'base' else "Инкрементальная"
+            print(f"{kind} резервная копия создана: {os.path.join(backup_dir, entry['file'])}")
+            return entry
+
+        snapshot = self._snapshot()
+        if background:
+            future = Future()
+            threading.Thread(target=lambda: future.set_result(create(snapshot))).start()
+            return future
+        return create(snapshot)
+
+    @instrumented
+    def restore_incremental_backup(self, backup_dir, until=None):
+        # Восстановление состояния на момент until (по умолчанию - последняя копия) из каталога копий
+        try:
+            tables = BackupChain(backup_dir).restore(until)
+            self._replace_file(lambda: self._write_file(tables))
+            print(f"База данных восстановлена из каталога резервных копий: {backup_dir}")
+            return True
+        except Exception as e:
+            print(f"Ошибка при восстановлении из резервной копии: {e}")
+            return False
+
+    def _iter_documents(self, field_name=None, value=None):
+        # Поочередная выдача документов без построения общего списка; при указании поля -
+        # только документы с равным значением (по индексу, если поле проиндексировано)
+        if field_name is None:
+            self._refresh()
+            rows = 0
+            for doc in self.db:
+                rows += 1
+                yield doc
+            self._scanned(rows, full_scan=True)
+            return
+        self._ensure_indexes()
+        typed_value = FIELD_TYPES[field_name](value)
+        rows = 0
+        if self.index is not None and self.index.covers(field_name):
+            table = self._read_table()
+            for doc_id in sorted(self.index.lookup(field_name, typed_value)):
+                doc = table.get(str(doc_id))
+                if doc is not None:
+                    rows += 1
+                    yield result_document(doc, doc_id)
+            self._scanned(rows)
+        else:
+            for doc in self.db:
+                rows += 1
+                if doc.get(field_name) == typed_value:
+                    yield doc
+            self._scanned(rows, full_scan=True)
+
+    def iter_record_chunks(self, field_name=None, value=None, columns=None, chunk_size=EXPORT_CHUNK_SIZE):
+        # Генератор порций строк (списков значений в порядке columns) фиксированного размера
+        columns = list(columns or FIELDS)
+        chunk = []
+        for doc in self._iter_documents(field_name, value):
+            chunk.append([doc.get(column) for column in columns])
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    @instrumented
+    def export_stream(self, file_path, file_format='csv', field_name=None, value=None, columns=None,
+                      chunk_size=EXPORT_CHUNK_SIZE, progress=None):
+        # Потоковый экспорт в CSV или XLSX порциями по chunk_size строк: в памяти одновременно
+        # находится не больше одной порции. progress(строк, байт) вызывается после каждой порции.
+        # Возвращает словарь с числом строк и байт или None при ошибке
+        if self.db is None:
+            print("База данных не открыта.")
+            return None
+        if field_name is not None and field_name not in FIELD_TYPES:
+            print("Указано некорректное имя поля.")
+            return None
+        columns = list(columns or FIELDS)
+        self.flush()
+        try:
+            chunks = self.iter_record_chunks(field_name, value, columns, chunk_size)
+            return write_export(chunks, file_path, file_format, columns, progress)
+        except OperationCancelled:
+            # Недописанный файл экспорта удаляется
+            if os.path.exists(file_path):
+                os.remove(file_path)
+            raise
+
+    @instrumented
+    def export_to_csv(self, csv_file, **options):
+        if self.db is not None:
+            try:
+                if self.export_stream(csv_file, 'csv', **options) is None:
+                    return False
                 print(f"Данные экспортированы в CSV: {csv_file}")
                 return True
+            except OperationCancelled:
+                print("Экспорт отменен.")
+                raise
             except Exception as e:
                 print(f"Ошибка при экспорте данных в CSV: {e}")
                 return False
@@ -177,14 +1280,17 @@ class DatabaseManager:
             print("База данных не открыта.")
             return False
 
-    def export_to_xlsx(self, xlsx_file):
-        if self.db:
+    @instrumented
+    def export_to_xlsx(self, xlsx_file, **options):
+        if self.db is not None:
             try:
-                data = self.db.all()
-                df = pd.DataFrame(data)
-                df.to_excel(xlsx_file, index=False)
+                if self.export_stream(xlsx_file, 'xlsx', **options) is None:
+                    return False
                 print(f"Данные экспортированы в XLSX: {xlsx_file}")
                 return True
+            except OperationCancelled:
+                print("Экспорт отменен.")
+                raise
             except Exception as e:
                 print(f"Ошибка при экспорте данных в XLSX: {e}")
                 return False
@@ -192,382 +1298,234 @@ class DatabaseManager:
             print("База данных не открыта.")
             return False
         
+    @instrumented
     def get_all_records(self):
-        if self.db:
-            return self.db.all()
+        if self.db is not None:
+            self._refresh()
+            documents = [result_document(doc, int(doc_id)) for doc_id, doc in self._read_table().items()]
+            self._scanned(documents, full_scan=True)
+            return documents
         else:
             print("База данных не открыта.")
             return []
 
-class App:
-    def __init__(self, master):
-        self.master = master
-        self.master.title("Управление базой данных")
-
-        self.db_manager = None
-        self.create_select_window()
-
-
-    def create_select_window(self):
-        self.open_database_button = tk.Button(self.master, text="Открыть базу данных", command=self.open_database)
-        self.open_database_button.pack()
-
-        self.create_database_button = tk.Button(self.master, text="Создать новую базу данных", command=self.create_database)
-        self.create_database_button.pack()
+    @instrumented
+    def search_range(self, field_name, low=None, high=None, include_low=True, include_high=True,
+                     descending=False, offset=0, limit=None):
+        # Записи со значением поля в диапазоне [low, high] (границы можно опустить или исключить),
+        # отсортированные по этому полю. Для date и amount используется упорядоченный индекс
+        if self.db is None:
+            print("База данных не открыта.")
+            return None
+        if field_name not in FIELD_TYPES:
+            print("Указано некорректное имя поля.")
+            return None
 
-    def open_database(self):
-        file_path = filedialog.askopenfilename(title="Выберите файл базы данных", filetypes=[("JSON files", "*.json")])
-        if file_path:
-            self.db_manager = DatabaseManager(file_path)
-            self.destroy_select_window()
-            self.create_interaction_window()
-            all_records = self.db_manager.get_all_records()
-            self.display_search_results(all_records)
+        field_type = FIELD_TYPES[field_name]
+        low = field_type(low) if low is not None else None
+        high = field_type(high) if high is not None else None
 
-    def create_database(self):
-        directory_path = filedialog.askdirectory(title="Выберите директорию для новой базы данных")
-        if directory_path:
-            file_path = filedialog.asksaveasfilename(
-                initialdir=directory_path, defaultextension=".json", filetypes=[("JSON files", "*.json")]
+        self._ensure_indexes()
+        if field_name in self.sorted_indexes:
+            doc_ids = self.sorted_indexes[field_name].range(
+                low, high, include_low, include_high, descending, offset, limit
             )
-            if file_path:
-                self.db_manager = DatabaseManager(file_path)
-                self.db_manager.create_new_database()
-                self.destroy_select_window()
-                self.create_interaction_window()
-
-    def destroy_select_window(self):
-        self.open_database_button.destroy()
-        self.create_database_button.destroy()
-
-    def create_interaction_window(self):
-        fields = ['order_id', 'customer_id', 'amount', 'date', 'status', 'delivery_address']
-        tk.Label(self.master, text="Order ID:").grid(row=1, column=1, sticky=tk.E)
-        self.order_id_entry = tk.Entry(self.master)
-        self.order_id_entry.grid(row=1, column=2, pady=5)
-
-        tk.Label(self.master, text="Customer ID:").grid(row=2, column=1, sticky=tk.E)
-        self.customer_id_entry = tk.Entry(self.master)
-        self.customer_id_entry.grid(row=2, column=2, pady=5)
-
-        tk.Label(self.master, text="Amount:").grid(row=3, column=1, sticky=tk.E)
-        self.amount_entry = tk.Entry(self.master)
-        self.amount_entry.grid(row=3, column=2, pady=5)
-
-        tk.Label(self.master, text="Date:").grid(row=4, column=1, sticky=tk.E)
-        self.date_entry = tk.Entry(self.master)
-        self.date_entry.grid(row=4, column=2, pady=5)
-
-        tk.Label(self.master, text="Status:").grid(row=5, column=1, sticky=tk.E)
-        self.status_entry = tk.Entry(self.master)
-        self.status_entry.grid(row=5, column=2, pady=5)
-
-        tk.Label(self.master, text="Delivery Address:").grid(row=6, column=1, sticky=tk.E)
-        self.delivery_address_entry = tk.Entry(self.master)
-        self.delivery_address_entry.grid(row=6, column=2, pady=5)
-
-        # Кнопка для добавления записи
-        self.add_record_button = tk.Button(self.master, text="Добавить запись", command=self.add_record)
-        self.add_record_button.grid(row=7, column=1, columnspan=2, pady=10)
-
-        tk.Label(self.master, text="Поле:").grid(row=1, column=3, sticky=tk.E)
-        self.delete_field_combo = ttk.Combobox(self.master, values=fields)
-        self.delete_field_combo.grid(row=1, column=4, pady=5)
-
-        tk.Label(self.master, text="Значение:").grid(row=2, column=3, sticky=tk.E)
-        self.delete_value_entry = tk.Entry(self.master)
-        self.delete_value_entry.grid(row=2, column=4, pady=5)
-
-        # Кнопка для удаления записи
-        self.delete_record_button = tk.Button(self.master, text="Удалить записи", command=self.delete_record)
-        self.delete_record_button.grid(row=3, column=3, columnspan=2, pady=10)
-
-        tk.Label(self.master, text="Поле:").grid(row=12, column=1, sticky=tk.E)
-        self.search_field_combo = ttk.Combobox(self.master, values=fields)
-        self.search_field_combo.grid(row=12, column=2, pady=5)
-
-        tk.Label(self.master, text="Значение:").grid(row=13, column=1, sticky=tk.E)
-        self.search_value_entry = ttk.Entry(self.master)
-        self.search_value_entry.grid(row=13, column=2, pady=5)
-
-        # Кнопка для поиска записи
-        self.search_record_button = tk.Button(self.master, text="Поиск записей", command=self.search_record)
-        self.search_record_button.grid(row=13, column=3, pady=0)
-
-        tk.Label(self.master, text="Поле для поиска:").grid(row=1, column=5, sticky=tk.E)
-        self.edit_field_combo = ttk.Combobox(self.master, values=fields)
-        self.edit_field_combo.grid(row=1, column=6, pady=5)
-
-        tk.Label(self.master, text="Значение для поиска:").grid(row=2, column=5, sticky=tk.E)
-        self.old_value_entry = ttk.Entry(self.master)
-        self.old_value_entry.grid(row=2, column=6, pady=5)
-
-        # Поля для ввода новых значений
-        tk.Label(self.master, text="Новые значения:").grid(row=3, column=5, columnspan=2, pady=5)
-
-        tk.Label(self.master, text="Order ID:").grid(row=4, column=5, sticky=tk.E)
-        self.new_order_id_entry = ttk.Entry(self.master)
-        self.new_order_id_entry.grid(row=4, column=6, pady=5)
-
-        tk.Label(self.master, text="Customer ID:").grid(row=5, column=5, sticky=tk.E)
-        self.new_customer_id_entry = ttk.Entry(self.master)
-        self.new_customer_id_entry.grid(row=5, column=6, pady=5)
-
-        tk.Label(self.master, text="Amount:").grid(row=6, column=5, sticky=tk.E)
-        self.new_amount_entry = ttk.Entry(self.master)
-        self.new_amount_entry.grid(row=6, column=6, pady=5)
-
-        tk.Label(self.master, text="Date:").grid(row=7, column=5, sticky=tk.E)
-        self.new_date_entry = ttk.Entry(self.master)
-        self.new_date_entry.grid(row=7, column=6, pady=5)
-
-        tk.Label(self.master, text="Status:").grid(row=8, column=5, sticky=tk.E)
-        self.new_status_entry = ttk.Entry(self.master)
-        self.new_status_entry.grid(row=8, column=6, pady=5)
-
-        tk.Label(self.master, text="Delivery Address:").grid(row=9, column=5, sticky=tk.E)
-        self.new_delivery_address_entry = ttk.Entry(self.master)
-        self.new_delivery_address_entry.grid(row=9, column=6, pady=5)
-
-        # Кнопка для редактирования записи
-        self.edit_record_button = tk.Button(self.master, text="Редактировать записи", command=self.edit_record)
-        self.edit_record_button.grid(row=10, column=5, columnspan=2, pady=10)
-
-        self.create_backup_button = tk.Button(self.master, text="Создать резервную копию", command=self.create_backup)
-        self.create_backup_button.grid(row=15, column=1, columnspan=2, pady=10)
-
-        # Кнопка для восстановления из резервной копии
-        self.restore_backup_button = tk.Button(self.master, text="Восстановить из копии", command=self.restore_backup)
-        self.restore_backup_button.grid(row=16, column=1, columnspan=2, pady=10)
-
-        self.export_csv_button = tk.Button(self.master, text="Экспорт в CSV", command=self.export_to_csv)
-        self.export_csv_button.grid(row=15, column=3, columnspan=2, pady=10)\
-        
-        self.tree_frame = tk.Frame(self.master)
-        self.tree_frame.grid(row=14, column=1, columnspan=8)
-
-        self.show_all_records_button = tk.Button(self.master, text="Показать все записи", command=self.show_all_records)
-        self.show_all_records_button.grid(row=13, column=5, columnspan=2, pady=10)
-
-        self.clear_database_button = tk.Button(self.master, text="Очистить базу данных", command=self.clear_database)
-        self.clear_database_button.grid(row=15, column=5, columnspan=2, pady=10)
-
-
-        self.tree_scroll_y = tk.Scrollbar(self.tree_frame, orient=tk.VERTICAL)
-        self.tree_scroll_x = tk.Scrollbar(self.tree_frame, orient=tk.HORIZONTAL)
-
-        self.tree = None
-        self.tree_scroll_y.pack(side=tk.RIGHT, fill=tk.Y)
-        self.tree_scroll_x.pack(side=tk.BOTTOM, fill=tk.X)
-
-        
-
-    def add_record(self):
-        try:
-            order_id = self.order_id_entry.get().strip()
-            customer_id = self.customer_id_entry.get().strip()
-            amount = self.amount_entry.get().strip()
-            date = self.date_entry.get().strip()
-            status = self.status_entry.get().strip()
-            delivery_address = self.delivery_address_entry.get().strip()
-
-            # Проверка и преобразование типов
-            if order_id.isdigit():
-                order_id = int(order_id)
-            else:
-                raise ValueError("Некорректный формат Order ID.")
-
-            if customer_id.isdigit():
-                customer_id = int(customer_id)
-            else:
-                raise ValueError("Некорректный формат Customer ID.")
+            documents = self._get_documents(doc_ids)
+            self._scanned(documents)
+            return documents
 
-            if amount.replace('.', '', 1).isdigit():  # Проверка на float
-                amount = float(amount)
-            else:
-                raise ValueError("Некорректный формат Amount.")
-
-            # Проверка формата даты
-            if date:
-                if re.match(r'\d{4}-\d{2}-\d{2}', date):
-                    try:
-                        date = datetime.strptime(date, '%Y-%m-%d').strftime('%Y-%m-%d')
-                    except ValueError:
-                        raise ValueError("Некорректный формат даты. Используйте YYYY-MM-DD.")
-                else:
-                    raise ValueError("Некорректный формат даты. Используйте YYYY-MM-DD.")
-
-            # Добавьте здесь другие проверки для остальных полей при необходимости
-
-            if self.db_manager:
-                self.db_manager.add_record(order_id, customer_id, amount, date, status, delivery_address)
-                messagebox.showinfo("Добавление записи", "Запись успешно добавлена.")
-            else:
-                messagebox.showwarning("Добавление записи", "База данных не открыта.")
-
-        except ValueError as e:
-            messagebox.showerror("Ошибка ввода", str(e))
-
-
-    def delete_record(self):
-        field = self.delete_field_combo.get()
-        value = self.delete_value_entry.get()
+        def in_range(value):
+            if not sortable_value(field_name, value):
+                return False
+            if low is not None and (value < low or not include_low and value == low):
+                return False
+            if high is not None and (value > high or not include_high and value == high):
+                return False
+            return True
 
-        if self.db_manager:
-            self.db_manager.delete_record_by_field(field, value)
-            messagebox.showinfo("Удаление записей", "Записи успешно удалены.")
+        rows = 0
+        results = []
+        for doc in self.db:
+            rows += 1
+            if in_range(doc.get(field_name)):
+                results.append(doc)
+        self._scanned(rows, full_scan=True)
+        results.sort(key=lambda doc: (doc[field_name], doc.doc_id), reverse=descending)
+        if limit is not None:
+            return results[offset:offset + limit]
+        return results[offset:]
+
+    def _ordered_ids(self, sort_by, descending, field_name, value):
+        # Порядок doc_id для постраничного просмотра; кэшируется до следующего изменения данных,
+        # чтобы прокрутка и переход по страницам не пересчитывали сортировку
+        self._refresh()
+        key = (self._version, sort_by, descending, field_name, value)
+        if self._page_order is not None and self._page_order[0] == key:
+            return self._page_order[1]
+
+        table = self._read_table()
+        if field_name is not None:
+            doc_ids = [doc.doc_id for doc in self._iter_documents(field_name, value)]
         else:
-            messagebox.showwarning("Удаление записей", "Записи не найдены.")
-        pass
-
-    def search_record(self):
-        field = self.search_field_combo.get()
-        value = self.search_value_entry.get()
-
-        if self.db_manager:
-            results = self.db_manager.search_by_field(field, value)
-            if results:
-                self.display_search_results(results)
+            doc_ids = [int(doc_id) for doc_id in table]
+            self._scanned(doc_ids, full_scan=True)
+
+        if sort_by is not None:
+            self._ensure_indexes()
+            index = self.sorted_indexes.get(sort_by)
+            if index is not None and field_name is None:
+                ordered = index.range(descending=descending)
+                unsortable = [doc_id for doc_id in doc_ids if doc_id not in index]
             else:
-                messagebox.showinfo("Результаты поиска", "Записей с указанным значением не найдено.")
-        else:
-            messagebox.showwarning("Поиск записей", "База данных не открыта.")
-
-    def display_search_results(self, results):
-        if self.tree:
-            self.tree.delete(*self.tree.get_children()) 
-        if self.tree:
-            self.tree.destroy() 
-
-        columns = list(results[0].keys())
-
-        self.tree = ttk.Treeview(
-            self.tree_frame, columns=columns, show='headings',
-            yscrollcommand=self.tree_scroll_y.set, xscrollcommand=self.tree_scroll_x.set
-        )
-
-        self.tree_scroll_y.config(command=self.tree.yview)
-        self.tree_scroll_x.config(command=self.tree.xview)
-        for col in columns:
-            self.tree.heading(col, text=col)
-            self.tree.column(col, width=100)
+                ordered = []
+                unsortable = []
+                for doc_id in doc_ids:
+                    if sortable_value(sort_by, table[str(doc_id)].get(sort_by)):
+                        ordered.append(doc_id)
+                    else:
+                        unsortable.append(doc_id)
+                ordered.sort(key=lambda doc_id: (table[str(doc_id)][sort_by], doc_id), reverse=descending)
+            # Записи без значения поля сортировки всегда идут в конце
+            doc_ids = ordered + unsortable
+
+        self._page_order = (key, doc_ids)
+        return doc_ids
+
+    @instrumented
+    def get_page(self, offset=0, limit=100, sort_by=None, descending=False, field_name=None, value=None):
+        # Одна страница записей и общее число записей в выборке. Выборка - вся таблица или записи
+        # с заданным значением поля, порядок - по doc_id или по полю sort_by
+        if self.db is None:
+            print("База данных не открыта.")
+            return [], 0
+        if (field_name is not None and field_name not in FIELD_TYPES
+                or sort_by is not None and sort_by not in FIELD_TYPES):
+            print("Указано некорректное имя поля.")
+            return [], 0
+
+        if sort_by is None and field_name is None:
+            self._refresh()
+            # Без сортировки и фильтра страница берется прямо из таблицы без построения списка всех id;
+            # разбираются только документы страницы, что важно для ленивых режимов
+            table = self._read_table()
+            page = list(islice(table, offset, offset + limit))
+            self._scanned(page)
+            return [result_document(table[doc_id], int(doc_id)) for doc_id in page], len(table)
+
+        doc_ids = self._ordered_ids(sort_by, descending, field_name, value)
+        documents = self._get_documents(doc_ids[offset:offset + limit])
+        self._scanned(documents)
+        return documents, len(doc_ids)
+
+    @instrumented
+    def latest(self, n=10):
+        # Последние n заказов по дате
+        return self.search_range('date', descending=True, limit=n)
+
+    def _columns(self):
+        # Колоночное представление таблицы (pandas.DataFrame), строится один раз на версию данных.
+        # Служебная строка без order_id, созданная вместе с новой базой, в него не попадает
+        self._refresh()
+        if self._frame is not None and self._frame_version == self._version:
+            return self._frame
+        import pandas as pd
+
+        columns = {field: [] for field in ('order_id', 'customer_id', 'amount', 'date', 'status')}
+        rows = 0
+        for doc in self.db:
+            rows += 1
+            if doc.get('order_id') is None:
+                continue
+            for field, values in columns.items():
+                values.append(doc.get(field))
+
+        frame = pd.DataFrame({
+            'order_id': pd.array(columns['order_id'], dtype='Int64'),
+            'customer_id': pd.array(columns['customer_id'], dtype='Int64'),
+            'amount': pd.to_numeric(pd.Series(columns['amount'], dtype=object), errors='coerce'),
+            'date': pd.to_datetime(pd.Series(columns['date'], dtype=object), format='%Y-%m-%d', errors='coerce'),
+            'status': pd.Series(columns['status'], dtype='category')
+        })
+        self._scanned(rows, full_scan=True)
+        self._frame = frame
+        self._frame_version = self._version
+        return frame
+
+    @staticmethod
+    def _plain(value):
+        # Приведение значений numpy/pandas к обычным типам Python
+        if hasattr(value, 'item'):
+            value = value.item()
+        if isinstance(value, float) and value != value:
+            return None
+        return value
 
-        for row in results:
-            self.tree.insert("", "end", values=list(row.values()))
+    @instrumented
+    def aggregate(self, by, func='sum', bucket='month'):
+        # Агрегат суммы заказа (sum, avg, count, min, max) по customer_id, status или дате.
+        # Для даты bucket задает интервал: day, month или year. Возвращает список словарей
+        if self.db is None:
+            print("База данных не открыта.")
+            return []
+        if by not in ('customer_id', 'status', 'date') or func not in AGGREGATES:
+            print("Указано некорректное поле или функция агрегирования.")
+            return []
 
-        self.tree.pack(fill='both', expand=True)
-    
-    def show_all_records(self):
-        if self.db_manager:
-            all_records = self.db_manager.get_all_records()
-            self.display_search_results(all_records)
+        frame = self._columns()
+        if by == 'date':
+            keys = frame['date'].dt.to_period(DATE_BUCKETS[bucket])
         else:
-            messagebox.showwarning("Показать все записи", "База данных не открыта.")
-
-        
-    def edit_record(self):
-        field_name = self.edit_field_combo.get()
-        old_value = self.old_value_entry.get()
-
-        new_order_id = self.new_order_id_entry.get().strip()
-        new_customer_id = self.new_customer_id_entry.get().strip()
-        new_amount = self.new_amount_entry.get().strip()
-        new_date = self.new_date_entry.get().strip()
-        new_status = self.new_status_entry.get().strip()
-        new_delivery_address = self.new_delivery_address_entry.get().strip()
-
-        # Проверка и преобразование типов
+            keys = frame[by]
+        grouped = frame['amount'].groupby(keys, observed=True).agg(AGGREGATES[func])
+        return [{by: str(key) if by == 'date' else self._plain(key), func: self._plain(value)}
+                for key, value in grouped.items()]
+
+    @instrumented
+    def top_customers(self, n=10, func='sum'):
+        # Клиенты с наибольшей суммой (или числом, средним) заказов
+        if self.db is None:
+            print("База данных не открыта.")
+            return []
+        if func not in AGGREGATES:
+            print("Указана некорректная функция агрегирования.")
+            return []
+        frame = self._columns()
+        grouped = frame['amount'].groupby(frame['customer_id']).agg(AGGREGATES[func])
+        return [{'customer_id': self._plain(key), func: self._plain(value)}
+                for key, value in grouped.nlargest(n).items()]
+
+    @instrumented
+    def total_between(self, start_date, end_date):
+        # Число, сумма и средняя сумма заказов с датой в интервале [start_date, end_date] (YYYY-MM-DD)
+        if self.db is None:
+            print("База данных не открыта.")
+            return None
+        # Границы проверяются так же, как дата в parse_record: неполная дата ('2023-01') иначе
+        # была бы молча дополнена до первого числа
         try:
-            new_order_id = int(new_order_id) if new_order_id else ''
-            new_customer_id = int(new_customer_id) if new_customer_id else ''
-            new_amount = float(new_amount) if new_amount else ''
+            start, end = [datetime.strptime(str(value).strip(), '%Y-%m-%d') for value in (start_date, end_date)]
         except ValueError:
-            messagebox.showerror("Ошибка", "Некорректный формат ввода.")
-            return False
-
-        # Обработка формата даты
-        if new_date:
-            if re.match(r'\d{4}-\d{2}-\d{2}', new_date):
-                try:
-                    new_date = datetime.strptime(new_date, '%Y-%m-%d').strftime('%Y-%m-%d')
-                except ValueError:
-                    messagebox.showerror("Ошибка", "Некорректный формат даты. Используйте YYYY-MM-DD.")
-                    return False
-            else:
-                messagebox.showerror("Ошибка", "Некорректный формат даты. Используйте YYYY-MM-DD.")
-                return False
+            print("Некорректный формат даты. Используйте YYYY-MM-DD.")
+            return None
 
-        new_values = {
-            'order_id': new_order_id,
-            'customer_id': new_customer_id,
-            'amount': new_amount,
-            'date': new_date,
-            'status': new_status,
-            'delivery_address': new_delivery_address
+        frame = self._columns()
+        mask = frame['date'].between(start, end)
+        amounts = frame['amount'][mask]
+        return {
+            'count': int(mask.sum()),
+            'sum': self._plain(amounts.sum()),
+            'avg': self._plain(amounts.mean()) if len(amounts) else None
         }
 
-        if self.db_manager:
-            success = self.db_manager.edit_record(field_name, old_value, new_values)
-            if success:
-                messagebox.showinfo("Редактирование записей", "Записи успешно отредактированы.")
-            else:
-                messagebox.showerror("Редактирование записей", "Ошибка при редактировании записей.")
-        else:
-            messagebox.showwarning("Редактирование записей", "База данных не открыта.")
-
-    def create_backup(self):
-        if self.db_manager:
-            file_path = filedialog.asksaveasfilename(
-                defaultextension=".json", filetypes=[("JSON files", "*.json")], initialdir=os.getcwd()
-            )
-            if file_path:
-                success = self.db_manager.create_backup(file_path)
-                if success:
-                    messagebox.showinfo("Резервная копия", "Резервная копия успешно создана.")
-                else:
-                    messagebox.showerror("Резервная копия", "Ошибка при создании резервной копии.")
-        else:
-            messagebox.showwarning("Резервная копия", "База данных не открыта.")
-
-    def restore_backup(self):
-        if self.db_manager:
-            file_path = filedialog.askopenfilename(
-                filetypes=[("JSON files", "*.json")], initialdir=os.getcwd()
-            )
-            if file_path:
-                success = self.db_manager.restore_from_backup(file_path)
-                if success:
-                    messagebox.showinfo("Восстановление из копии", "База данных успешно восстановлена из копии.")
-                else:
-                    messagebox.showerror("Восстановление из копии", "Ошибка при восстановлении из копии.")
-        else:
-            messagebox.showwarning("Восстановление из копии", "База данных не открыта.")
-    
-    def export_to_csv(self):
-        if self.db_manager:
-            file_path = filedialog.asksaveasfilename(
-                defaultextension=".csv", filetypes=[("CSV files", "*.csv")], initialdir=os.getcwd()
-            )
-            if file_path:
-                success = self.db_manager.export_to_csv(file_path)
-                if success:
-                    messagebox.showinfo("Экспорт в CSV", "Данные успешно экспортированы в CSV.")
-                else:
-                    messagebox.showerror("Экспорт в CSV", "Ошибка при экспорте данных в CSV.")
-        else:
-            messagebox.showwarning("Экспорт в CSV", "База данных не открыта.")
-
-    def clear_database(self):
-        if self.db_manager:
-            self.db_manager.clear_all_records()
-        else:
-            messagebox.showwarning("Очистить базу данных", "База данных не открыта.")
-
 
 def run_app():
-    root = tk.Tk()
-    app = App(root)
-    root.mainloop()
+    # Графическое приложение в app.py; Tk импортируется только при его запуске
+    try:
+        from app import run_app as run
+    except ImportError as e:
+        print(f"Для запуска приложения требуется модуль tkinter: {e}")
+        return
+    run()
 
 if __name__ == "__main__":
     run_app()
@@ -0,0 +1,285 @@
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+# Границы корзин гистограммы времени операций, в секундах
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SLOW_THRESHOLD = 0.5
+SLOW_LOG_SIZE = 200
+
+
+_proc_io = None
+
+
+def _read_proc_io():
+    # /proc/self/io открывается один раз на процесс и перечитывается через pread
+    global _proc_io
+    if _proc_io is None or _proc_io[0] != os.getpid():
+        _proc_io = (os.getpid(), os.open('/proc/self/io', os.O_RDONLY))
+    data = os.pread(_proc_io[1], 512, 0)
+    start = data.index(b'rchar: ') + 7
+    middle = data.index(b'\nwchar: ', start)
+    end = data.index(b'\n', middle + 8)
+    return int(data[start:middle]), int(data[middle + 8:end])
+
+
+def io_counters():
+    # Байты, прочитанные и записанные процессом через read()/write(): /proc/self/io на Linux,
+    # psutil на остальных системах; None, если счетчики недоступны
+    if sys.platform.startswith('linux'):
+        try:
+            return _read_proc_io()
+        except (OSError, ValueError):
+            pass
+    if psutil is not None:
+        try:
+            counters = psutil.Process().io_counters()
+        except (psutil.Error, AttributeError):
+            return None
+        return getattr(counters, 'read_chars', counters.read_bytes), getattr(counters, 'write_chars', counters.write_bytes)
+    return None
+
+
+class OperationStats:
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.seconds = 0.0
+        self.errors = 0
+        self.rows_scanned = 0
+        self.rows_returned = 0
+        self.full_scans = 0
+        self.index_lookups = 0
+        self.bytes_read = 0
+        self.bytes_written = 0
+
+    def observe(self, seconds):
+        self.count += 1
+        self.seconds += seconds
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+                return
+        self.buckets[-1] += 1
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'seconds': round(self.seconds, 6),
+            'errors': self.errors,
+            'buckets': {str(bound): count for bound, count in zip(LATENCY_BUCKETS + ('+Inf',), self.buckets)},
+            'rows_scanned': self.rows_scanned,
+            'rows_returned': self.rows_returned,
+            'full_scans': self.full_scans,
+            'index_lookups': self.index_lookups,
+            'bytes_read': self.bytes_read,
+            'bytes_written': self.bytes_written
+        }
+
+
+class Metrics:
+    # Метрики операций DatabaseManager: гистограммы времени, просмотренные и возвращенные строки,
+    # полные просмотры и обращения к индексам, байты ввода-вывода и журнал медленных операций.
+    # Вложенная операция (например, update_where внутри edit_record) учитывается отдельно,
+    # а ее просмотренные строки добавляются и к внешней операции. Потоки, выполняющие часть
+    # операции (шарды ShardedDatabaseManager), присоединяются к ней через joined()
+    def __init__(self, slow_threshold=SLOW_THRESHOLD, slow_log_size=SLOW_LOG_SIZE, slow_log_file=None):
+        self.slow_threshold = slow_threshold
+        self.slow_log_file = slow_log_file
+        self.slow_operations = deque(maxlen=slow_log_size)
+        self.operations = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def start(self, operation):
+        frame = {
+            'operation': operation,
+            'rows_scanned': 0,
+            'full_scans': 0,
+            'index_lookups': 0,
+            'io': io_counters(),
+            'started': time.perf_counter()
+        }
+        self._stack().append(frame)
+        return frame
+
+    def current(self):
+        # Операция, выполняющаяся в текущем потоке, или None
+        stack = self._stack()
+        return stack[-1] if stack else None
+
+    @contextmanager
+    def joined(self, frame):
+        # Строки, прочитанные в этом потоке, учитываются в операции frame из другого потока
+        stack = self._stack()
+        stack.append(frame)
+        try:
+            yield
+        finally:
+            stack.pop()
+
+    def scanned(self, rows, full_scan=False):
+        # Отметка о чтении строк текущей операцией: полный просмотр таблицы или выборка по индексу
+        stack = self._stack()
+        if not stack:
+            return
+        frame = stack[-1]
+        with self._lock:
+            frame['rows_scanned'] += rows
+            if full_scan:
+                frame['full_scans'] += 1
+            else:
+                frame['index_lookups'] += 1
+
+    def finish(self, frame, result, error, args=(), kwargs=None):
+        seconds = time.perf_counter() - frame['started']
+        stack = self._stack()
+        stack.pop()
+        returned = _rows_returned(result)
+        io = io_counters() if frame['io'] is not None else None
+        with self._lock:
+            if stack:
+                parent = stack[-1]
+                for key in ('rows_scanned', 'full_scans', 'index_lookups'):
+                    parent[key] += frame[key]
+            stats = self.operations.get(frame['operation'])
+            if stats is None:
+                stats = self.operations[frame['operation']] = OperationStats()
+            stats.observe(seconds)
+            stats.errors += error
+            stats.rows_scanned += frame['rows_scanned']
+            stats.rows_returned += returned
+            stats.full_scans += frame['full_scans']
+            stats.index_lookups += frame['index_lookups']
+            if io is not None:
+                stats.bytes_read += io[0] - frame['io'][0]
+                stats.bytes_written += io[1] - frame['io'][1]
+
+        if seconds >= self.slow_threshold:
+            entry = {
+                'time': datetime.now().isoformat(timespec='milliseconds'),
+                'operation': frame['operation'],
+                'arguments': _describe(args, kwargs or {}),
+                'seconds': round(seconds, 6),
+                'rows_scanned': frame['rows_scanned'],
+                'rows_returned': returned,
+                'full_scan': frame['full_scans'] > 0,
+                'error': bool(error)
+            }
+            self.slow_operations.append(entry)
+            if self.slow_log_file:
+                with open(self.slow_log_file, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(entry, ensure_ascii=False, default=str) + '\n')
+
+    def reset(self):
+        with self._lock:
+            self.operations.clear()
+            self.slow_operations.clear()
+
+    def snapshot(self, cache=None):
+        # Метрики в виде словаря; cache - статистика кэша результатов (ResultCache.stats())
+        with self._lock:
+            operations = {name: stats.to_dict() for name, stats in sorted(self.operations.items())}
+        full_scans = sum(stats['full_scans'] for stats in operations.values())
+        index_lookups = sum(stats['index_lookups'] for stats in operations.values())
+        lookups = full_scans + index_lookups
+        return {
+            'operations': operations,
+            'index_hit_rate': index_lookups / lookups if lookups else 0.0,
+            'cache': cache,
+            'slow_operations': list(self.slow_operations)
+        }
+
+    def to_json(self, cache=None, **kwargs):
+        return json.dumps(self.snapshot(cache), ensure_ascii=False, default=str, **kwargs)
+
+    def to_prometheus(self, cache=None, prefix='tinydb'):
+        # Снимок в текстовом формате Prometheus
+        snapshot = self.snapshot(cache)
+        lines = [
+            f'# HELP {prefix}_operation_seconds Время выполнения операций DatabaseManager.',
+            f'# TYPE {prefix}_operation_seconds histogram'
+        ]
+        for name, stats in snapshot['operations'].items():
+            cumulative = 0
+            for bound, count in stats['buckets'].items():
+                cumulative += count
+                lines.append(f'{prefix}_operation_seconds_bucket{{operation="{name}",le="{bound}"}} {cumulative}')
+            lines.append(f'{prefix}_operation_seconds_sum{{operation="{name}"}} {stats["seconds"]}')
+            lines.append(f'{prefix}_operation_seconds_count{{operation="{name}"}} {stats["count"]}')
+        for metric, key in (('operation_errors_total', 'errors'), ('rows_scanned_total', 'rows_scanned'),
+                            ('rows_returned_total', 'rows_returned'), ('full_scans_total', 'full_scans'),
+                            ('index_lookups_total', 'index_lookups'), ('storage_read_bytes_total', 'bytes_read'),
+                            ('storage_written_bytes_total', 'bytes_written')):
+            lines.append(f'# TYPE {prefix}_{metric} counter')
+            for name, stats in snapshot['operations'].items():
+                lines.append(f'{prefix}_{metric}{{operation="{name}"}} {stats[key]}')
+        lines.append(f'# TYPE {prefix}_index_hit_ratio gauge')
+        lines.append(f'{prefix}_index_hit_ratio {snapshot["index_hit_rate"]}')
+        if cache is not None:
+            lines.append(f'# TYPE {prefix}_cache_hits_total counter')
+            lines.append(f'{prefix}_cache_hits_total {cache["hits"]}')
+            lines.append(f'# TYPE {prefix}_cache_misses_total counter')
+            lines.append(f'{prefix}_cache_misses_total {cache["misses"]}')
+            lines.append(f'# TYPE {prefix}_cache_hit_ratio gauge')
+            lines.append(f'{prefix}_cache_hit_ratio {cache["hit_rate"]}')
+            lines.append(f'# TYPE {prefix}_cache_bytes gauge')
+            lines.append(f'{prefix}_cache_bytes {cache["bytes"]}')
+        return '\n'.join(lines) + '\n'
+
+
+def _rows_returned(result):
+    # Число строк в результате: список документов или пара (страница, всего) у get_page
+    if isinstance(result, list):
+        return len(result)
+    if isinstance(result, tuple) and result and isinstance(result[0], list):
+        return len(result[0])
+    return 0
+
+
+def _describe(args, kwargs):
+    # Краткое описание аргументов для журнала медленных операций
+    parts = [repr(value) for value in args] + [f'{key}={value!r}' for key, value in kwargs.items()]
+    text = ', '.join(parts)
+    return text if len(text) <= 200 else text[:197] + '...'
+
+
+def instrumented(method):
+    # Замер публичного метода DatabaseManager; при self.metrics = None - только одна проверка атрибута
+    name = method.__name__
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        metrics = self.metrics
+        if metrics is None:
+            return method(self, *args, **kwargs)
+        frame = metrics.start(name)
+        result = None
+        error = 0
+        try:
+            result = method(self, *args, **kwargs)
+            return result
+        except BaseException:
+            error = 1
+            raise
+        finally:
+            metrics.finish(frame, result, error, args, kwargs)
+    return wrapper
@@ -0,0 +1,154 @@
+import sys
+from collections.abc import Mapping, MutableMapping
+
+from tinydb.table import Document
+
+
+# Поля заказа в порядке, в котором их записывает DatabaseManager
+RECORD_FIELDS = ('order_id', 'customer_id', 'amount', 'date', 'status', 'delivery_address')
+# Поля с небольшим числом различных значений: одинаковые строки хранятся в одном экземпляре
+SHARED_FIELDS = frozenset(('date', 'status'))
+
+_FIELD_SET = frozenset(RECORD_FIELDS)
+
+
+class OrderRecord(MutableMapping):
+    # Компактный документ заказа: поля схемы хранятся в слотах, а не в отдельном словаре на каждую
+    # строку, строки date и status интернируются. Поведение - как у словаря; поля вне схемы
+    # (если документ ими дополнен) хранятся в небольшом словаре _extra. Записи используются только внутри
+    # хранилищ, держащих таблицу в памяти; режим json хранит словари, а результаты запросов - копии dict
+    __slots__ = RECORD_FIELDS + ('_extra',)
+
+    def __init__(self, data=(), **kwargs):
+        self._extra = None
+        self.update(data, **kwargs)
+
+    def __getitem__(self, key):
+        if key in _FIELD_SET:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        if self._extra is not None and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        if key in _FIELD_SET:
+            return getattr(self, key, default)
+        if self._extra is not None:
+            return self._extra.get(key, default)
+        return default
+
+    def __contains__(self, key):
+        if key in _FIELD_SET:
+            return hasattr(self, key)
+        return self._extra is not None and key in self._extra
+
+    def __setitem__(self, key, value):
+        if key in _FIELD_SET:
+            if key in SHARED_FIELDS and type(value) is str:
+                value = sys.intern(value)
+            setattr(self, key, value)
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+
+    def __delitem__(self, key):
+        if key in _FIELD_SET:
+            try:
+                delattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        elif self._extra is not None and key in self._extra:
+            del self._extra[key]
+        else:
+            raise KeyError(key)
+
+    def __iter__(self):
+        for field in RECORD_FIELDS:
+            if hasattr(self, field):
+                yield field
+        if self._extra:
+            yield from self._extra
+
+    def __len__(self):
+        return sum(hasattr(self, field) for field in RECORD_FIELDS) + (len(self._extra) if self._extra else 0)
+
+    def to_dict(self):
+        # Обычный словарь с теми же полями (для json и кода, которому нужен именно dict)
+        if self._extra is None:
+            try:
+                return {
+                    'order_id': self.order_id,
+                    'customer_id': self.customer_id,
+                    'amount': self.amount,
+                    'date': self.date,
+                    'status': self.status,
+                    'delivery_address': self.delivery_address
+                }
+            except AttributeError:
+                pass
+        return {key: self[key] for key in self}
+
+    def copy(self):
+        # Как у словаря и документа TinyDB: копия в виде обычного словаря
+        return self.to_dict()
+
+    def __repr__(self):
+        return repr(self.to_dict())
+
+    def __reduce__(self):
+        return OrderRecord, (self.to_dict(),)
+
+
+def _fill(record, values):
+    # Заполнение слотов без проверок: values - значения всех полей RECORD_FIELDS
+    (record.order_id, record.customer_id, record.amount,
+     record.date, record.status, record.delivery_address) = values
+    if type(record.date) is str:
+        record.date = sys.intern(record.date)
+    if type(record.status) is str:
+        record.status = sys.intern(record.status)
+    record._extra = None
+    return record
+
+
+_new_record = OrderRecord.__new__
+
+
+def make_record(order_id, customer_id, amount, date, status, delivery_address):
+    return _fill(_new_record(OrderRecord),
+                 (order_id, customer_id, amount, date, status, delivery_address))
+
+
+def compact_record(doc):
+    # Компактная запись вместо словаря с полями ровно схемы заказа (в ее порядке); остальные документы
+    # (например, с дополнительными полями) остаются как есть, чтобы не менять их при записи в файл.
+    # Используется и как object_hook для json.load, чтобы документы сразу разбирались в записи
+    if len(doc) == len(RECORD_FIELDS) and type(doc) is dict and tuple(doc) == RECORD_FIELDS:
+        record = _new_record(OrderRecord)
+        record.order_id, record.customer_id, record.amount, date, status, record.delivery_address = doc.values()
+        record.date = sys.intern(date) if type(date) is str else date
+        record.status = sys.intern(status) if type(status) is str else status
+        record._extra = None
+        return record
+    return doc
+
+
+def result_document(doc, doc_id):
+    # Документ результата запроса - обычный документ TinyDB (словарь с doc_id), как и без компактных
+    # записей: они остаются внутри хранилища, а вызывающий код получает копию в виде dict
+    if isinstance(doc, OrderRecord):
+        doc = doc.to_dict()
+    return Document(doc, doc_id)
+
+
+def plain(value):
+    # default для json.dump: компактные записи сохраняются как обычные объекты JSON
+    if type(value) is OrderRecord or isinstance(value, OrderRecord):
+        return value.to_dict()
+    if isinstance(value, Mapping):
+        return dict(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
@@ -0,0 +1,590 @@
+import argparse
+import asyncio
+import contextlib
+import functools
+import json
+import os
+import signal
+import stat
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+from cli import default_storage_mode, typed_value
+from db import AGGREGATES, DATE_BUCKETS, DatabaseManager, FIELD_TYPES, STORAGE_MODES
+
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+
+# Документов в одной порции потокового ответа (Transfer-Encoding: chunked)
+STREAM_CHUNK_SIZE = 1000
+
+# Наибольшее число строк в одном групповом вызове add_records
+WRITE_BATCH_SIZE = 10000
+
+# Запросов одного соединения, принятых до отправки ответов на предыдущие (конвейерная отправка)
+PIPELINE_DEPTH = 64
+
+MAX_HEADER_SIZE = 64 * 1024
+MAX_BODY_SIZE = 64 * 1024 * 1024
+
+# Соединение без новых запросов закрывается через столько секунд
+KEEP_ALIVE_TIMEOUT = 60
+
+# Отложенные изменения сбрасываются на диск, если столько секунд не было запросов на запись
+IDLE_FLUSH_DELAY = 1.0
+
+ADD_ROUTE = ('POST', '/records')
+
+STATUS_TEXT = {
+    200: 'OK',
+    400: 'Bad Request',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+    411: 'Length Required',
+    413: 'Payload Too Large',
+    431: 'Request Header Fields Too Large',
+    500: 'Internal Server Error',
+    503: 'Service Unavailable'
+}
+
+JSON_TYPE = 'application/json; charset=utf-8'
+JSON_LINES_TYPE = 'application/x-ndjson; charset=utf-8'
+
+
+class HTTPError(Exception):
+    # Ошибка запроса: клиент получает код status и объект {"error": текст}
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class Request:
+    __slots__ = ('method', 'path', 'params', 'version', 'headers', 'body')
+
+    def __init__(self, method, path, params, version, headers, body):
+        self.method = method
+        self.path = path
+        self.params = params
+        self.version = version
+        self.headers = headers
+        self.body = body
+
+    def keep_alive(self):
+        connection = self.headers.get('connection', '').lower()
+        if self.version == 'HTTP/1.0':
+            return connection == 'keep-alive'
+        return connection != 'close'
+
+    def json(self):
+        try:
+            return json.loads(self.body)
+        except ValueError as e:
+            raise HTTPError(400, f"Некорректный JSON в теле запроса: {e}")
+
+
+class Response:
+    # Ответ целиком (body) или список документов, который отправляется в формате JSON Lines
+    # порциями по STREAM_CHUNK_SIZE по мере кодирования
+    def __init__(self, status=200, body=b'', content_type=JSON_TYPE, headers=None, documents=None):
+        self.status = status
+        self.body = body
+        self.content_type = content_type
+        self.headers = headers or {}
+        self.documents = documents
+
+
+def json_response(value, status=200, headers=None):
+    body = (json.dumps(value, ensure_ascii=False) + '\n').encode('utf-8')
+    return Response(status, body, headers=headers)
+
+
+def error_response(status, message, headers=None):
+    return json_response({'error': message}, status, headers)
+
+
+def encode_documents(documents):
+    # Порция документов в формате JSON Lines, у каждого документа - его doc_id
+    lines = []
+    for doc in documents:
+        record = dict(doc)
+        record['doc_id'] = doc.doc_id
+        lines.append(json.dumps(record, ensure_ascii=False))
+    return ('\n'.join(lines) + '\n').encode('utf-8') if lines else b''
+
+
+def _field(params, name, required=True):
+    field_name = params.get(name)
+    if field_name is None:
+        if required:
+            raise HTTPError(400, f"Не указан параметр {name}.")
+        return None
+    if field_name not in FIELD_TYPES:
+        raise HTTPError(400, f"Некорректное имя поля: {field_name}")
+    return field_name
+
+
+def _integer(params, name, default=None):
+    value = params.get(name)
+    if value is None or value == '':
+        return default
+    if not value.isdigit():
+        raise HTTPError(400, f"Параметр {name} должен быть неотрицательным целым числом.")
+    return int(value)
+
+
+def _flag(params, name):
+    return params.get(name, '').lower() in ('1', 'true', 'yes')
+
+
+def _choice(params, name, choices, default):
+    value = params.get(name, default)
+    if value not in choices:
+        raise HTTPError(400, f"Параметр {name} должен быть одним из: {', '.join(choices)}")
+    return value
+
+
+def _typed_fields(values, name):
+    # Объект {поле: значение} из тела запроса с приведением значений к типам полей
+    if not isinstance(values, dict) or not values:
+        raise HTTPError(400, f"{name} должно быть непустым объектом {{поле: значение}}.")
+    typed = {}
+    for field_name, value in values.items():
+        if field_name not in FIELD_TYPES:
+            raise HTTPError(400, f"Некорректное имя поля: {field_name}")
+        typed[field_name] = typed_value(field_name, value)
+    return typed
+
+
+async def read_request(reader):
+    # Следующий запрос соединения или None, если клиент закрыл соединение между запросами
+    try:
+        head = await reader.readuntil(b'\r\n\r\n')
+    except asyncio.IncompleteReadError as e:
+        if e.partial.strip():
+            raise HTTPError(400, "Неполный заголовок запроса.")
+        return None
+    except asyncio.LimitOverrunError:
+        raise HTTPError(431, "Слишком большой заголовок запроса.")
+
+    lines = head.decode('latin-1').split('\r\n')
+    parts = lines[0].split(' ')
+    if len(parts) != 3 or not parts[2].startswith('HTTP/1.'):
+        raise HTTPError(400, "Некорректная строка запроса.")
+    method, target, version = parts
+    headers = {}
+    for line in lines[1:]:
+        if not line:
+            continue
+        name, separator, value = line.partition(':')
+        if not separator:
+            raise HTTPError(400, "Некорректный заголовок запроса.")
+        headers[name.strip().lower()] = value.strip()
+
+    if 'chunked' in headers.get('transfer-encoding', '').lower():
+        raise HTTPError(411, "Тело запроса должно передаваться с заголовком Content-Length.")
+    length = headers.get('content-length', '0')
+    if not length.isdigit():
+        raise HTTPError(400, "Некорректный заголовок Content-Length.")
+    length = int(length)
+    if length > MAX_BODY_SIZE:
+        raise HTTPError(413, "Слишком большое тело запроса.")
+    try:
+        body = await reader.readexactly(length) if length else b''
+    except asyncio.IncompleteReadError:
+        raise HTTPError(400, "Неполное тело запроса.")
+
+    url = urlsplit(target)
+    params = dict(parse_qsl(url.query, keep_blank_values=True))
+    return Request(method.upper(), unquote(url.path), params, version, headers, body)
+
+
+def _resolve(future, result=None, error=None):
+    # Запрос мог быть отменен (клиент отключился), пока его строки записывались
+    if future.done():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+
+
+class WriteBatcher:
+    # Групповая запись: добавления из всех соединений, пришедшие, пока рабочий поток занят
+    # предыдущей пачкой, проверяются и записываются следующим единым вызовом add_records.
+    # Каждый запрос получает результаты своих строк с нумерацией строк внутри запроса
+    def __init__(self, server, max_rows=WRITE_BATCH_SIZE):
+        self.server = server
+        self.max_rows = max_rows
+        self.queue = asyncio.Queue()
+
+    async def add(self, records):
+        if not records:
+            return []
+        future = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait((records, future))
+        return await future
+
+    async def run(self):
+        while True:
+            batch = [await self.queue.get()]
+            rows = len(batch[0][0])
+            while rows < self.max_rows and not self.queue.empty():
+                item = self.queue.get_nowait()
+                batch.append(item)
+                rows += len(item[0])
+
+            records = [record for items, _ in batch for record in items]
+            try:
+                results = await self._commit(records)
+            except Exception as e:
+                if len(batch) == 1:
+                    _resolve(batch[0][1], error=e)
+                    continue
+                # Строки пачки записываются одной операцией в конце add_records, поэтому пачка не записана:
+                # запросы повторяются по одному, чтобы ошибка в данных одного клиента отклонила только его строки
+                for items, future in batch:
+                    try:
+                        _resolve(future, await self._commit(items))
+                    except Exception as e:
+                        _resolve(future, error=e)
+                continue
+
+            offset = 0
+            for items, future in batch:
+                part = results[offset:offset + len(items)]
+                for result in part:
+                    result['row'] -= offset
+                offset += len(items)
+                _resolve(future, part)
+
+    async def _commit(self, records):
+        results = await self.server.call(self.server.manager.add_records, records, batch_size=len(records))
+        if results is None:
+            raise HTTPError(503, "База данных не открыта.")
+        return results
+
+
+class QueryServer:
+    # HTTP-сервер запросов к одной открытой базе. Все обращения к DatabaseManager выполняются
+    # по очереди в одном рабочем потоке, поэтому таблица, индексы и кэш в памяти общие для всех
+    # клиентов, а событийный цикл только принимает соединения, разбирает запросы и кодирует ответы.
+    # Соединения держатся открытыми (keep-alive), запросы можно отправлять, не дожидаясь ответов
+    def __init__(self, manager):
+        self.manager = manager
+        self.worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix='database')
+        self.batcher = None
+        self.connections = set()
+        self.last_write = 0.0
+        self.routes = {
+            ('GET', '/health'): self.health,
+            ('GET', '/search'): self.search,
+            ('GET', '/range'): self.search_range,
+            ('GET', '/records'): self.list_records,
+            ADD_ROUTE: self.add_records,
+            ('POST', '/update'): self.update,
+            ('POST', '/delete'): self.delete,
+            ('GET', '/aggregate'): self.aggregate,
+            ('GET', '/metrics'): self.metrics
+        }
+
+    async def call(self, func, *args, **kwargs):
+        # Вызов в рабочем потоке базы; задания выполняются строго в порядке поступления
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.worker, functools.partial(func, *args, **kwargs))
+
+    def _written(self):
+        self.last_write = time.monotonic()
+
+    async def health(self, request):
+        return json_response({
+            'status': 'ok',
+            'database': self.manager.file_path,
+            'storage_mode': self.manager.storage_mode
+        })
+
+    async def search(self, request):
+        field_name = _field(request.params, 'field')
+        if 'value' not in request.params:
+            raise HTTPError(400, "Не указан параметр value.")
+        documents = await self.call(self.manager.search_by_field, field_name, request.params['value'])
+        if documents is None:
+            raise HTTPError(503, "База данных не открыта.")
+        return Response(documents=documents)
+
+    async def search_range(self, request):
+        params = request.params
+        documents = await self.call(
+            self.manager.search_range, _field(params, 'field'), params.get('from'), params.get('to'),
+            not _flag(params, 'exclude_from'), not _flag(params, 'exclude_to'), _flag(params, 'descending'),
+            _integer(params, 'offset', 0), _integer(params, 'limit')
+        )
+        if documents is None:
+            raise HTTPError(503, "База данных не открыта.")
+        return Response(documents=documents)
+
+    async def list_records(self, request):
+        # Страница записей (без limit - вся выборка), общее число записей - в заголовке X-Total-Count
+        params = request.params
+        field_name = _field(params, 'field', required=False)
+        if field_name is not None and 'value' not in params:
+            raise HTTPError(400, "Не указан параметр value.")
+        documents, total = await self.call(
+            self.manager.get_page, _integer(params, 'offset', 0), _integer(params, 'limit', sys.maxsize),
+            _field(params, 'sort_by', required=False), _flag(params, 'descending'),
+            field_name, params.get('value')
+        )
+        return Response(documents=documents, headers={'X-Total-Count': str(total)})
+
+    async def add_records(self, request):
+        # Запись или список записей (объекты с полями FIELDS или списки значений в том же порядке)
+        records = request.json()
+        if isinstance(records, dict):
+            records = [records]
+        if not isinstance(records, list):
+            raise HTTPError(400, "Ожидается запись или список записей.")
+        # Форма строк проверяется до групповой записи, чтобы некорректный запрос не попадал в общую пачку
+        if not all(isinstance(record, (dict, list)) for record in records):
+            raise HTTPError(400, "Каждая запись должна быть объектом или списком значений.")
+        self._written()
+        results = await self.batcher.add(records)
+        accepted = sum(result['accepted'] for result in results)
+        return json_response({'accepted': accepted, 'rejected': len(results) - accepted, 'results': results})
+
+    async def update(self, request):
+        # {"where": {поле: значение, ...}, "set": {поле: новое значение, ...}}
+        body = request.json()
+        if not isinstance(body, dict):
+            raise HTTPError(400, "Ожидается объект с полями where и set.")
+        criteria = _typed_fields(body.get('where'), 'where')
+        new_values = _typed_fields(body.get('set'), 'set')
+        self._written()
+        updated = await self.call(self.manager.update_where, criteria, new_values)
+        return json_response({'updated': updated})
+
+    async def delete(self, request):
+        # {"field": поле, "value": значение}
+        body = request.json()
+        if not isinstance(body, dict) or 'value' not in body:
+            raise HTTPError(400, "Ожидается объект с полями field и value.")
+        field_name = _field(body, 'field')
+        self._written()
+        deleted = await self.call(self.manager.delete_record_by_field, field_name, body['value'])
+        if deleted is None:
+            raise HTTPError(503, "База данных не открыта.")
+        return json_response({'deleted': deleted})
+
+    async def aggregate(self, request):
+        params = request.params
+        rows = await self.call(
+            self.manager.aggregate, _choice(params, 'by', ('customer_id', 'status', 'date'), None),
+            _choice(params, 'func', tuple(AGGREGATES), 'sum'), _choice(params, 'bucket', tuple(DATE_BUCKETS), 'month')
+        )
+        return json_response(rows)
+
+    async def metrics(self, request):
+        format = _choice(request.params, 'format', ('prometheus', 'json'), 'prometheus')
+        report = await self.call(self.manager.metrics_report, format)
+        if report is None:
+            raise HTTPError(404, "Сбор метрик не включен: запустите сервер с параметром --metrics.")
+        content_type = JSON_TYPE if format == 'json' else 'text/plain; version=0.0.4; charset=utf-8'
+        return Response(body=report.encode('utf-8'), content_type=content_type)
+
+    async def dispatch(self, request):
+        try:
+            handler = self.routes.get((request.method, request.path))
+            if handler is None:
+                allowed = [method for method, path in self.routes if path == request.path]
+                if allowed:
+                    return error_response(405, "Метод не поддерживается.", {'Allow': ', '.join(allowed)})
+                raise HTTPError(404, f"Неизвестный путь: {request.path}")
+            return await handler(request)
+        except HTTPError as e:
+            return error_response(e.status, str(e))
+        except ValueError as e:
+            return error_response(400, str(e))
+        except Exception as e:
+            print(f"Ошибка при обработке {request.method} {request.path}: {type(e).__name__}: {e}", file=sys.stderr)
+            return error_response(500, f"{type(e).__name__}: {e}")
+
+    async def handle_connection(self, reader, writer):
+        # Запросы соединения читаются, не дожидаясь ответов на предыдущие, и выполняются сразу,
+        # а ответы отправляются строго в порядке запросов. Чтобы клиент видел свои изменения,
+        # добавления записей (они ждут групповой записи) и остальные запросы не перемешиваются:
+        # запрос другого вида ждет завершения уже выполняющихся
+        self.connections.add(writer)
+        responses = asyncio.Queue(PIPELINE_DEPTH)
+        sender = asyncio.ensure_future(self._send_responses(responses, writer))
+        in_flight = set()
+        adding = False
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(read_request(reader), KEEP_ALIVE_TIMEOUT)
+                except HTTPError as e:
+                    # После ошибки разбора граница следующего запроса неизвестна: соединение закрывается
+                    failed = asyncio.get_running_loop().create_future()
+                    failed.set_result(error_response(e.status, str(e)))
+                    await responses.put((None, failed))
+                    break
+                except (asyncio.TimeoutError, ConnectionError):
+                    break
+                if request is None:
+                    break
+
+                is_add = (request.method, request.path) == ADD_ROUTE
+                if is_add != adding and in_flight:
+                    await asyncio.wait(in_flight)
+                adding = is_add
+                task = asyncio.ensure_future(self.dispatch(request))
+                in_flight.add(task)
+                task.add_done_callback(in_flight.discard)
+                await responses.put((request, task))
+                if not request.keep_alive():
+                    break
+        finally:
+            await responses.put(None)
+            await sender
+            self.connections.discard(writer)
+            writer.close()
+            with contextlib.suppress(ConnectionError):
+                await writer.wait_closed()
+
+    async def _send_responses(self, responses, writer):
+        # Если клиент отключился, оставшиеся ответы только извлекаются из очереди,
+        # чтобы чтение запросов не блокировалось на заполненной очереди
+        failed = False
+        while True:
+            item = await responses.get()
+            if item is None:
+                return
+            request, task = item
+            response = await task
+            if failed:
+                continue
+            try:
+                await self._write_response(writer, request, response)
+            except ConnectionError:
+                failed = True
+
+    async def _write_response(self, writer, request, response):
+        keep_alive = request is not None and request.keep_alive()
+        head = [
+            f'HTTP/1.1 {response.status} {STATUS_TEXT.get(response.status, "")}',
+            f'Content-Type: {JSON_LINES_TYPE if response.documents is not None else response.content_type}',
+            f'Connection: {"keep-alive" if keep_alive else "close"}'
+        ]
+        head.extend(f'{name}: {value}' for name, value in response.headers.items())
+
+        documents = response.documents
+        if documents is not None and len(documents) > STREAM_CHUNK_SIZE and request.version != 'HTTP/1.0':
+            # Большая выборка кодируется и отправляется порциями: клиент начинает получать данные сразу,
+            # а другие соединения обслуживаются между порциями
+            head.append('Transfer-Encoding: chunked')
+            writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1'))
+            for start in range(0, len(documents), STREAM_CHUNK_SIZE):
+                data = encode_documents(documents[start:start + STREAM_CHUNK_SIZE])
+                writer.write(b'%x\r\n%s\r\n' % (len(data), data))
+                await writer.drain()
+            writer.write(b'0\r\n\r\n')
+            await writer.drain()
+            return
+
+        body = encode_documents(documents) if documents is not None else response.body
+        head.append(f'Content-Length: {len(body)}')
+        writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + body)
+        await writer.drain()
+
+    def _flush_if_idle(self, delay):
+        storage = self.manager.db.storage if self.manager.db is not None else None
+        if getattr(storage, 'dirty', False) and time.monotonic() - self.last_write >= delay:
+            self.manager.flush()
+
+    async def _flush_when_idle(self, delay):
+        # Во время записи данные сбрасываются на диск по правилам хранилища (flush_every, flush_interval),
+        # а после последнего изменения - через delay секунд простоя
+        while True:
+            await asyncio.sleep(delay)
+            await self.call(self._flush_if_idle, delay)
+
+    async def run(self, host=DEFAULT_HOST, port=DEFAULT_PORT, unix_path=None, idle_flush_delay=IDLE_FLUSH_DELAY):
+        # Работа до SIGINT или SIGTERM; затем соединения закрываются, а база закрывается со сбросом изменений
+        loop = asyncio.get_running_loop()
+        stopped = asyncio.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            with contextlib.suppress(NotImplementedError):
+                loop.add_signal_handler(signum, stopped.set)
+
+        if unix_path:
+            if os.path.exists(unix_path) and stat.S_ISSOCK(os.stat(unix_path).st_mode):
+                os.unlink(unix_path)
+            listener = await asyncio.start_unix_server(self.handle_connection, unix_path, limit=MAX_HEADER_SIZE)
+            address = unix_path
+        else:
+            listener = await asyncio.start_server(self.handle_connection, host, port, limit=MAX_HEADER_SIZE)
+            address = 'http://%s:%d' % listener.sockets[0].getsockname()[:2]
+
+        self.batcher = WriteBatcher(self)
+        tasks = [asyncio.ensure_future(self.batcher.run()), asyncio.ensure_future(self._flush_when_idle(idle_flush_delay))]
+        print(f"Сервер запущен: {address}", file=sys.stderr)
+        try:
+            await stopped.wait()
+        finally:
+            listener.close()
+            for writer in list(self.connections):
+                writer.close()
+            await listener.wait_closed()
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            # Задания, уже переданные рабочему потоку, выполняются до закрытия базы
+            await self.call(self.manager.close_database)
+            self.worker.shutdown()
+            if unix_path:
+                with contextlib.suppress(FileNotFoundError):
+                    os.unlink(unix_path)
+            print("Сервер остановлен.", file=sys.stderr)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="Локальный HTTP-сервер запросов к базе заказов: база открывается один раз и остается в памяти"
+    )
+    parser.add_argument('database', help="файл базы данных (JSON или колоночный *.tdbc)")
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--unix', metavar='PATH', help="слушать Unix-сокет вместо TCP")
+    parser.add_argument('--storage-mode', choices=list(STORAGE_MODES),
+                        help="режим хранения; по умолчанию columnar для *.tdbc и lazy для JSON")
+    parser.add_argument('--create', action='store_true', help="создать базу, если файла нет")
+    parser.add_argument('--metrics', action='store_true', help="собирать метрики операций (GET /metrics)")
+    parser.add_argument('--idle-flush-delay', type=float, default=IDLE_FLUSH_DELAY,
+                        help="через сколько секунд без записи отложенные изменения сбрасываются на диск")
+    parser.add_argument('--verbose', action='store_true', help="выводить сообщения базы данных в stderr")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    # Сообщения DatabaseManager (в том числе печать результатов поиска) по умолчанию не выводятся
+    messages = sys.stderr if args.verbose else open(os.devnull, 'w')
+    try:
+        with contextlib.redirect_stdout(messages):
+            storage_mode = args.storage_mode or default_storage_mode(args.database)
+            manager = DatabaseManager(args.database, storage_mode=storage_mode, metrics=args.metrics or None)
+            if manager.db is None and args.create:
+                manager.create_new_database()
+            if manager.db is None:
+                print(f"Не удалось открыть базу данных: {args.database}", file=sys.stderr)
+                return 1
+            asyncio.run(QueryServer(manager).run(args.host, args.port, args.unix, args.idle_flush_delay))
+    finally:
+        if not args.verbose:
+            messages.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
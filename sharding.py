@@ -0,0 +1,370 @@
+import heapq
+import json
+import os
+import queue
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from db import (DatabaseManager, FIELDS, FIELD_TYPES, EXPORT_CHUNK_SIZE, OperationCancelled, row_order_id,
+                validate_rows, sortable_value, write_export)
+from metrics import Metrics, instrumented
+from storages import atomic_write_json
+
+
+# Ключ шарда: хеш customer_id или месяца даты заказа ('YYYY-MM')
+SHARD_KEYS = {
+    'customer_id': lambda value: str(value),
+    'month': lambda value: str(value)[:7]
+}
+SHARD_FIELDS = {'customer_id': 'customer_id', 'month': 'date'}
+
+# Порций экспорта, заранее прочитанных из каждого шарда
+EXPORT_PREFETCH = 2
+
+
+def shard_paths(file_path, shards):
+    root, extension = os.path.splitext(file_path)
+    return [f"{root}.shard{i}{extension or '.json'}" for i in range(shards)]
+
+
+class ShardedDatabaseManager:
+    # Таблица заказов, разделенная на shards файлов TinyDB по хешу customer_id или месяца даты.
+    # file_path - файл описания (число шардов и ключ), данные лежат рядом в <имя>.shardN.json.
+    # Операции по ключу шарда идут в один шард, по order_id - в шард из каталога order_id,
+    # остальные выполняются во всех шардах параллельно с объединением результатов.
+    # Уникальность order_id проверяется по общему каталогу; доступ из одного процесса
+    def __init__(self, file_path, shards=8, shard_by='customer_id', workers=None, metrics=None, **options):
+        self.file_path = file_path
+        # Общие метрики для всех шардов: операции шардов учитываются вместе с операциями набора
+        self.metrics = Metrics() if metrics is True else metrics or None
+        if os.path.exists(file_path):
+            with open(file_path, 'r', encoding='utf-8') as f:
+                layout = json.load(f)
+            shards, shard_by = layout['shards'], layout['shard_by']
+        else:
+            if shard_by not in SHARD_KEYS:
+                raise ValueError(f"Неизвестный ключ шардирования: {shard_by}")
+            atomic_write_json(file_path, {'shards': shards, 'shard_by': shard_by}, indent=2)
+        self.shard_by = shard_by
+        self.shard_field = SHARD_FIELDS[shard_by]
+        self.paths = shard_paths(file_path, shards)
+        for path in self.paths:
+            if not os.path.exists(path):
+                open(path, 'a').close()
+        self.shards = [DatabaseManager(path, metrics=self.metrics, **options) for path in self.paths]
+        self._executor = ThreadPoolExecutor(max_workers=workers or len(self.shards))
+        # Каталог order_id -> номер шарда
+        self._order_shards = {}
+        for number, order_ids in enumerate(self._map(self._shard_order_ids)):
+            for order_id in order_ids:
+                self._order_shards[order_id] = number
+
+    @staticmethod
+    def _shard_order_ids(shard):
+        return [str(doc['order_id']) for doc in shard._iter_documents() if doc.get('order_id') is not None]
+
+    def _map(self, func, shards=None):
+        # Выполнение func(шард) во всех (или указанных) шардах параллельно; результаты в порядке шардов
+        frame = self.metrics.current() if self.metrics is not None else None
+        if frame is not None:
+            # Строки, прочитанные в шардах, относятся к операции, запустившей их
+            run = func
+
+            def func(shard):
+                with self.metrics.joined(frame):
+                    return run(shard)
+        return list(self._executor.map(func, self.shards if shards is None else shards))
+
+    def _shard_number(self, value):
+        return zlib.crc32(SHARD_KEYS[self.shard_by](value).encode('utf-8')) % len(self.shards)
+
+    def _route(self, field_name, value):
+        # Шарды, в которых могут быть записи с заданным значением поля
+        if field_name == self.shard_field and (self.shard_by == 'customer_id' or len(str(value)) >= 7):
+            return [self.shards[self._shard_number(FIELD_TYPES[field_name](value))]]
+        if field_name == 'order_id':
+            number = self._order_shards.get(str(FIELD_TYPES['order_id'](value)))
+            return [] if number is None else [self.shards[number]]
+        return self.shards
+
+    def _forget(self, documents):
+        for doc in documents:
+            self._order_shards.pop(str(doc.get('order_id')), None)
+
+    def metrics_report(self, format='prometheus'):
+        # Метрики набора и всех шардов; статистика кэшей шардов суммируется
+        if self.metrics is None:
+            return None
+        caches = [stats for stats in (shard.cache_stats() for shard in self.shards) if stats is not None]
+        cache = None
+        if caches:
+            cache = {key: sum(stats[key] for stats in caches) for key in caches[0] if key != 'hit_rate'}
+            lookups = cache['hits'] + cache['misses']
+            cache['hit_rate'] = cache['hits'] / lookups if lookups else 0.0
+        if format == 'json':
+            return self.metrics.to_json(cache, indent=2)
+        return self.metrics.to_prometheus(cache)
+
+    @instrumented
+    def flush(self):
+        self._map(lambda shard: shard.flush())
+
+    @instrumented
+    def close_database(self):
+        self._map(lambda shard: shard.close_database())
+        self._executor.shutdown()
+
+    @instrumented
+    def add_record(self, order_id, customer_id, amount, date, status, delivery_address):
+        if str(order_id) in self._order_shards:
+            print("Запись с такими ключевыми полями уже существует.")
+            return
+        number = self._shard_number(date if self.shard_by == 'month' else customer_id)
+        self.shards[number].add_record(order_id, customer_id, amount, date, status, delivery_address)
+        self._order_shards[str(order_id)] = number
+
+    @instrumented
+    def add_records(self, records, batch_size=1000):
+        # Пакетное добавление с теми же правилами и результатами, что у DatabaseManager.add_records;
+        # пачки разных шардов записываются параллельно
+        results = []
+        groups = [[] for _ in self.shards]
+        seen_ids = set()
+        for row_number, values, error in validate_rows(enumerate(records, start=1)):
+            if error is None:
+                order_id = str(values['order_id'])
+                if order_id in seen_ids:
+                    error = "Повторяющийся Order ID в загружаемых данных."
+                elif order_id in self._order_shards:
+                    error = "Запись с таким Order ID уже существует."
+            if error is not None:
+                results.append({'row': row_number, 'order_id': row_order_id(values), 'accepted': False, 'error': error})
+                continue
+            seen_ids.add(order_id)
+            groups[self._shard_number(values[self.shard_field])].append(values)
+            results.append({'row': row_number, 'order_id': values['order_id'], 'accepted': True, 'error': None})
+
+        def insert(number):
+            documents = groups[number]
+            for start in range(0, len(documents), batch_size):
+                self.shards[number]._insert_documents(documents[start:start + batch_size])
+
+        self._map(insert, range(len(self.shards)))
+        for number, documents in enumerate(groups):
+            for doc in documents:
+                self._order_shards[str(doc['order_id'])] = number
+        accepted = sum(len(documents) for documents in groups)
+        print(f"Добавлено записей: {accepted}, отклонено: {len(results) - accepted}.")
+        return results
+
+    @instrumented
+    def search_by_field(self, field_name, value):
+        if field_name not in FIELD_TYPES:
+            print("Указано некорректное имя поля.")
+            return None
+        results = [doc for documents in self._map(lambda shard: shard._search_cached(field_name, value),
+                                                  self._route(field_name, value))
+                   for doc in documents]
+        if results:
+            print("Результаты поиска:")
+            for result in results:
+                print(result)
+            return results
+        print("Записей с указанным значением не найдено.")
+        return []
+
+    @instrumented
+    def delete_record_by_field(self, field_name, value):
+        if field_name not in FIELD_TYPES:
+            print("Указано некорректное имя поля.")
+            return
+
+        def delete(shard):
+            documents = shard._find_documents(field_name, value)
+            shard._remove_documents(doc.doc_id for doc in documents)
+            return documents
+
+        removed = 0
+        for documents in self._map(delete, self._route(field_name, value)):
+            self._forget(documents)
+            removed += len(documents)
+        print("Записи успешно удалены.")
+        return removed
+
+    @instrumented
+    def clear_all_records(self):
+        self._map(lambda shard: shard._truncate())
+        self._order_shards.clear()
+        print("База данных очищена.")
+
+    @instrumented
+    def edit_record(self, field_name, old_value, new_values):
+        # Как DatabaseManager.edit_record; записи, у которых меняется ключ шарда, переносятся в новый шард
+        if field_name not in FIELD_TYPES:
+            print("Указано некорректное имя поля.")
+            return False
+        update_values = {key: value for key, value in new_values.items() if value != ''}
+        shards = self._route(field_name, value=old_value)
+        found = [(shard, shard._find_documents(field_name, old_value)) for shard in shards]
+        if not any(documents for _, documents in found):
+            print("Записей с указанным значением не найдено.")
+            return False
+        if not update_values:
+            return True
+
+        moved = [[] for _ in self.shards]
+        for shard, documents in found:
+            if not documents:
+                continue
+            self._forget(documents)
+            number = self.shards.index(shard)
+            stay = set()
+            for doc in documents:
+                updated = dict(doc)
+                updated.update(update_values)
+                target = self._shard_number(updated.get(self.shard_field))
+                if target == number:
+                    stay.add(doc.doc_id)
+                else:
+                    moved[target].append(updated)
+                self._order_shards[str(updated.get('order_id'))] = target
+            if stay:
+                shard._update_documents(update_values, stay)
+            if len(stay) < len(documents):
+                shard._remove_documents(doc.doc_id for doc in documents if doc.doc_id not in stay)
+        for number, documents in enumerate(moved):
+            if documents:
+                self.shards[number]._insert_documents(documents)
+        return True
+
+    @instrumented
+    def get_all_records(self):
+        return [doc for documents in self._map(lambda shard: shard.get_all_records()) for doc in documents]
+
+    @staticmethod
+    def _merge(lists, field_name, descending):
+        # Слияние списков, отсортированных по полю; записи без значения поля идут в конце
+        def key(doc):
+            value = doc.get(field_name)
+            if sortable_value(field_name, value):
+                return (1, value) if descending else (0, value)
+            return (0,) if descending else (1,)
+        return heapq.merge(*lists, key=key, reverse=descending)
+
+    @instrumented
+    def get_page(self, offset=0, limit=100, sort_by=None, descending=False, field_name=None, value=None):
+        # Страница записей и общее число записей в выборке по всем шардам
+        if (field_name is not None and field_name not in FIELD_TYPES
+                or sort_by is not None and sort_by not in FIELD_TYPES):
+            print("Указано некорректное имя поля.")
+            return [], 0
+        shards = self.shards if field_name is None else self._route(field_name, value)
+
+        if sort_by is None:
+            # Шарды идут друг за другом: по размерам выборок определяется, какие из них попадают в страницу
+            totals = self._map(lambda shard: shard.get_page(0, 0, None, False, field_name, value)[1], shards)
+            rows = []
+            start = offset
+            for shard, total in zip(shards, totals):
+                if len(rows) < limit and start < total:
+                    rows.extend(shard.get_page(start, limit - len(rows), None, False, field_name, value)[0])
+                start = max(0, start - total)
+            return rows, sum(totals)
+
+        # Из каждого шарда берутся первые offset + limit записей в нужном порядке и сливаются
+        pages = self._map(lambda shard: shard.get_page(0, offset + limit, sort_by, descending, field_name, value),
+                          shards)
+        merged = self._merge([rows for rows, _ in pages], sort_by, descending)
+        rows = list(islice(merged, offset, offset + limit))
+        return rows, sum(total for _, total in pages)
+
+    @instrumented
+    def search_range(self, field_name, low=None, high=None, include_low=True, include_high=True,
+                     descending=False, offset=0, limit=None):
+        if field_name not in FIELD_TYPES:
+            print("Указано некорректное имя поля.")
+            return None
+        stop = offset + limit if limit is not None else None
+        lists = self._map(lambda shard: shard.search_range(
+            field_name, low, high, include_low, include_high, descending, 0, stop
+        ))
+        merged = list(self._merge(lists, field_name, descending))
+        return merged[offset:stop]
+
+    def iter_record_chunks(self, field_name=None, value=None, columns=None, chunk_size=EXPORT_CHUNK_SIZE):
+        # Порции строк всех шардов по очереди; каждый шард читается в своем потоке на EXPORT_PREFETCH
+        # порций вперед, поэтому чтение шардов идет параллельно с записью файла
+        shards = self.shards if field_name is None else self._route(field_name, value)
+        stop = threading.Event()
+        buffers = [queue.Queue(maxsize=EXPORT_PREFETCH) for _ in shards]
+        done = object()
+
+        def send(buffer, item):
+            # Ожидание места в очереди с проверкой остановки: потребитель мог прекратить чтение
+            # (отмена экспорта или ошибка записи), и тогда очередь уже не освободится
+            while not stop.is_set():
+                try:
+                    buffer.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def produce(shard, buffer):
+            try:
+                for chunk in shard.iter_record_chunks(field_name, value, columns, chunk_size):
+                    if not send(buffer, chunk):
+                        return
+                send(buffer, done)
+            except Exception as e:
+                send(buffer, e)
+
+        threads = [threading.Thread(target=produce, args=(shard, buffer), daemon=True)
+                   for shard, buffer in zip(shards, buffers)]
+        for thread in threads:
+            thread.start()
+        try:
+            for buffer in buffers:
+                while True:
+                    chunk = buffer.get()
+                    if chunk is done:
+                        break
+                    if isinstance(chunk, Exception):
+                        raise chunk
+                    yield chunk
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+
+    @instrumented
+    def export_stream(self, file_path, file_format='csv', field_name=None, value=None, columns=None,
+                      chunk_size=EXPORT_CHUNK_SIZE, progress=None):
+        if field_name is not None and field_name not in FIELD_TYPES:
+            print("Указано некорректное имя поля.")
+            return None
+        columns = list(columns or FIELDS)
+        self.flush()
+        try:
+            chunks = self.iter_record_chunks(field_name, value, columns, chunk_size)
+            return write_export(chunks, file_path, file_format, columns, progress)
+        except OperationCancelled:
+            if os.path.exists(file_path):
+                os.remove(file_path)
+            raise
+
+    @instrumented
+    def export_to_csv(self, csv_file, **options):
+        try:
+            if self.export_stream(csv_file, 'csv', **options) is None:
+                return False
+            print(f"Данные экспортированы в CSV: {csv_file}")
+            return True
+        except OperationCancelled:
+            print("Экспорт отменен.")
+            raise
+        except Exception as e:
+            print(f"Ошибка при экспорте данных в CSV: {e}")
+            return False
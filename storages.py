@@ -0,0 +1,1033 @@
+import atexit
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+import tempfile
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections.abc import Mapping
+from datetime import date
+from contextlib import contextmanager
+from itertools import islice
+
+from tinydb.storages import JSONStorage, Storage
+
+from records import compact_record, make_record, plain
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+# numpy нужен только колоночному формату и импортируется при первом обращении к нему
+np = None
+
+
+def _require_numpy():
+    global np
+    if np is None:
+        try:
+            import numpy
+        except ImportError:
+            raise RuntimeError("Для колоночного формата требуется модуль numpy.") from None
+        np = numpy
+
+
+def read_json_file(path):
+    # Чтение файла в формате TinyDB; пустой или отсутствующий файл означает пустую базу.
+    # Документы заказов разбираются в компактные записи OrderRecord
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f, object_hook=compact_record)
+
+
+def fsync_directory(directory):
+    # На Windows каталог нельзя открыть для fsync, там переименование и так атомарно
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def copy_file_mode(path, tmp_path):
+    # mkstemp создает временный файл с правами 0600, и замена ими базы закрыла бы ее для группы
+    # (в режиме shared файл как раз используют несколько пользователей). Временный файл получает права
+    # заменяемого файла, а для новой базы - права по umask, как у файла, созданного через open()
+    try:
+        mode = os.stat(path).st_mode & 0o7777
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        mode = 0o666 & ~umask
+    os.chmod(tmp_path, mode)
+
+
+def atomic_write_json(path, data, **kwargs):
+    # Запись во временный файл в том же каталоге и атомарная замена исходного файла:
+    # при сбое на диске остается либо старая, либо новая версия целиком
+    kwargs.setdefault('default', plain)
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix='.' + os.path.basename(path) + '.', suffix='.tmp', dir=directory)
+    try:
+        copy_file_mode(path, tmp_path)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            # Как в JSONStorage: строка целиком и одна запись быстрее потоковой записи json.dump
+            f.write(json.dumps(data, **kwargs))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    fsync_directory(directory)
+
+
+class CachedJSONStorage(JSONStorage):
+    # Режим json: файл и запись как у JSONStorage, но разобранные данные запоминаются до изменения файла.
+    # Без этого каждая операция, в том числе выборка по индексу, заново читала и разбирала весь файл.
+    # Изменение файла другой программой определяется по размеру и времени изменения, как в режиме shared:
+    # refresh() перечитывает файл и увеличивает generation, по которому DatabaseManager сбрасывает индексы
+    def __init__(self, path, **kwargs):
+        super().__init__(path, **kwargs)
+        self.generation = 0
+        self._data = None
+        self._token = None
+
+    def refresh(self):
+        token = _stat_token(os.fstat(self._handle.fileno()))
+        if token == self._token:
+            return False
+        self._data = super().read()
+        self.generation += 1
+        self._token = token
+        return True
+
+    def read(self):
+        self.refresh()
+        return self._data
+
+    def write(self, data):
+        # TinyDB меняет прочитанные данные на месте, поэтому при ошибке записи они перечитываются с диска
+        self._token = None
+        super().write(data)
+        self._data = data
+        self._token = _stat_token(os.fstat(self._handle.fileno()))
+
+
+class WriteBehindStorage(Storage):
+    # Хранилище с отложенной записью: данные держатся в памяти, изменения помечаются как несохраненные
+    # и сбрасываются на диск каждые flush_every записей, не реже раза в flush_interval секунд, а также
+    # при flush() и close(). Интервал проверяется только при записи: своего таймера у хранилища нет
+    # (таблицу меняет поток, выполняющий операции), поэтому после последнего изменения данные остаются
+    # в памяти до следующей записи, flush() или close(). Приложение и сервер вызывают flush() по таймеру
+    def __init__(self, path, flush_every=1000, flush_interval=5.0, **kwargs):
+        self.path = path
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self._kwargs = kwargs
+
+        if not os.path.exists(path):
+            open(path, 'a').close()
+        self._data = read_json_file(path)
+        self._dirty = False
+        self._pending_writes = 0
+        self._last_flush = time.monotonic()
+        atexit.register(self.flush)
+
+    @property
+    def dirty(self):
+        return self._dirty
+
+    def read(self):
+        return self._data
+
+    def write(self, data):
+        self._data = data
+        self._dirty = True
+        self._pending_writes += 1
+        if (self._pending_writes >= self.flush_every
+                or time.monotonic() - self._last_flush >= self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        if self._dirty:
+            atomic_write_json(self.path, self._data, **self._kwargs)
+            self._dirty = False
+            self._pending_writes = 0
+        self._last_flush = time.monotonic()
+
+    def close(self):
+        self.flush()
+        atexit.unregister(self.flush)
+
+
+# Лексемы JSON для поиска границ документов без разбора: объект без вложенных объектов целиком,
+# строка целиком (вместе с экранированными символами) или отдельная фигурная скобка. Повторы не должны
+# возвращаться назад, иначе объект с длинным списком перед вложенным объектом разбирается экспоненциально:
+# с Python 3.11 это притяжательные квантификаторы, а в более ранних версиях - их эквивалент (?=(X+))\1
+_JSON_TOKEN_PORTABLE = re.compile(rb'\{(?:(?=([^{}"]+))\1|"(?:(?=([^"\\]+))\2|\\.)*")*\}|"(?:(?=([^"\\]+))\3|\\.)*"|[{}]')
+_JSON_TOKEN = (re.compile(rb'\{(?:[^{}"]++|"(?:[^"\\]++|\\.)*+")*+\}|"(?:[^"\\]++|\\.)*+"|[{}]')
+               if sys.version_info >= (3, 11) else _JSON_TOKEN_PORTABLE)
+
+
+def scan_document_offsets(buffer):
+    # Границы документов в файле TinyDB: {таблица: (doc_ids, начала, концы)} в байтах
+    tables = {}
+    depth = 0
+    key = None
+    current = None
+    doc_start = None
+    for match in _JSON_TOKEN.finditer(buffer):
+        first = buffer[match.start()]
+        if first == 0x22:
+            if depth <= 2:
+                key = json.loads(match.group())
+        elif first == 0x7b and match.end() - match.start() > 1:
+            # Объект без вложенных объектов: на уровне таблицы это документ целиком,
+            # на уровне файла - пустая таблица
+            if depth == 2:
+                current[0].append(key)
+                current[1].append(match.start())
+                current[2].append(match.end())
+            elif depth == 1:
+                tables[key] = ([], array('q'), array('q'))
+        elif first == 0x7b:
+            depth += 1
+            if depth == 2:
+                current = tables[key] = ([], array('q'), array('q'))
+            elif depth == 3:
+                doc_start = match.start()
+        else:
+            if depth == 3:
+                current[0].append(key)
+                current[1].append(doc_start)
+                current[2].append(match.end())
+            depth -= 1
+    return tables
+
+
+def _file_token(path):
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns, sys.byteorder]
+
+
+def _is_numeric_ids(ids):
+    return all(doc_id.isdigit() and str(int(doc_id)) == doc_id and int(doc_id) <= _INT64_MAX for doc_id in ids)
+
+
+def offset_index_path(path):
+    # Файл индекса смещений режима lazy рядом с файлом базы
+    return path + '.idx'
+
+
+def write_offset_index(path, tables):
+    # Индекс смещений рядом с файлом базы: строка заголовка JSON и массивы int64 (doc_id, начала, концы).
+    # Действителен, пока не изменились размер и время изменения файла базы
+    header = {'file': _file_token(path), 'tables': []}
+    blocks = []
+    for name, (ids, starts, ends) in tables.items():
+        numeric = isinstance(ids, array) or _is_numeric_ids(ids)
+        header['tables'].append([name, len(ids), None if numeric else ids])
+        if numeric:
+            blocks.append(ids if isinstance(ids, array) else array('q', map(int, ids)))
+        blocks.extend((starts, ends))
+
+    index_path = offset_index_path(path)
+    tmp_path = index_path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(json.dumps(header, separators=(',', ':')).encode('utf-8') + b'\n')
+        for block in blocks:
+            block.tofile(f)
+    os.replace(tmp_path, index_path)
+
+
+def read_offset_index(path):
+    index_path = offset_index_path(path)
+    if not os.path.exists(index_path):
+        return None
+    try:
+        with open(index_path, 'rb') as f:
+            header = json.loads(f.readline())
+            if header.get('file') != _file_token(path):
+                return None
+            tables = {}
+            for name, count, ids in header['tables']:
+                if ids is None:
+                    ids = array('q')
+                    ids.fromfile(f, count)
+                starts = array('q')
+                starts.fromfile(f, count)
+                ends = array('q')
+                ends.fromfile(f, count)
+                tables[name] = (ids, starts, ends)
+            return tables
+    except (ValueError, EOFError):
+        # Поврежденный или недописанный индекс строится заново
+        return None
+
+
+class LazyJSONTable(Mapping):
+    # Таблица JSON-файла, отображенного в память: известны только doc_id и границы документов,
+    # а сами документы разбираются при обращении к ним. doc_id - список строк или array('q')
+    # числовых id; по возрастающим числовым id документ ищется двоичным поиском без построения словаря
+    def __init__(self, buffer, ids, starts, ends):
+        self._buffer = buffer
+        self._ids = ids
+        self._starts = starts
+        self._ends = ends
+        self._numeric = isinstance(ids, array)
+        self._ascending = None
+        self._positions = None
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __iter__(self):
+        return map(str, self._ids) if self._numeric else iter(self._ids)
+
+    def _position(self, doc_id):
+        if self._numeric:
+            if not (isinstance(doc_id, str) and doc_id.isdigit() and str(int(doc_id)) == doc_id):
+                raise KeyError(doc_id)
+            key = int(doc_id)
+            if self._ascending is None:
+                self._ascending = all(a < b for a, b in zip(self._ids, islice(self._ids, 1, None)))
+            if self._ascending:
+                i = bisect_left(self._ids, key)
+                if i < len(self._ids) and self._ids[i] == key:
+                    return i
+                raise KeyError(doc_id)
+        else:
+            key = doc_id
+        if self._positions is None:
+            self._positions = {value: i for i, value in enumerate(self._ids)}
+        return self._positions[key]
+
+    def __getitem__(self, doc_id):
+        i = self._position(doc_id)
+        return json.loads(self._buffer[self._starts[i]:self._ends[i]], object_hook=compact_record)
+
+    def items(self):
+        buffer = self._buffer
+        for doc_id, start, end in zip(self, self._starts, self._ends):
+            yield doc_id, json.loads(buffer[start:end], object_hook=compact_record)
+
+    def release(self):
+        # Отказ от ссылки на отображение файла перед его закрытием; таблица больше не читается
+        self._buffer = None
+
+
+def map_json_database(path):
+    # Ленивое открытие файла TinyDB: отображение файла в память и таблицы LazyJSONTable по сохраненному
+    # или новому индексу смещений; None для пустого файла
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return None
+    with open(path, 'rb') as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    offsets = read_offset_index(path)
+    if offsets is None:
+        offsets = scan_document_offsets(buffer)
+        try:
+            write_offset_index(path, offsets)
+        except OSError:
+            # Каталог только для чтения: индекс будет построен заново при следующем открытии
+            pass
+    return buffer, {name: LazyJSONTable(buffer, *table) for name, table in offsets.items()}
+
+
+def write_json_with_offsets(path, data, before_replace=None):
+    # Атомарная запись в формате json.dump (как у JSONStorage) с одновременным построением индекса смещений.
+    # before_replace() вызывается после записи временного файла, перед заменой исходного
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix='.' + os.path.basename(path) + '.', suffix='.tmp', dir=directory)
+    tables = {}
+    try:
+        copy_file_mode(path, tmp_path)
+        with os.fdopen(fd, 'wb') as f:
+            position = 0
+            parts = ['{']
+            for i, (name, table) in enumerate((data or {}).items()):
+                parts.append((', ' if i else '') + json.dumps(name) + ': {')
+                ids, starts, ends = current = ([], array('q'), array('q'))
+                tables[name] = current
+                for j, (doc_id, doc) in enumerate(table.items()):
+                    parts.append((', ' if j else '') + json.dumps(doc_id) + ': ')
+                    chunk = ''.join(parts).encode('ascii')
+                    f.write(chunk)
+                    position += len(chunk)
+                    encoded = json.dumps(doc, default=plain).encode('ascii')
+                    f.write(encoded)
+                    ids.append(doc_id)
+                    starts.append(position)
+                    position += len(encoded)
+                    ends.append(position)
+                    parts = []
+                parts.append('}')
+            parts.append('}')
+            f.write(''.join(parts).encode('ascii'))
+            f.flush()
+            os.fsync(f.fileno())
+        if before_replace is not None:
+            before_replace()
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    fsync_directory(directory)
+    return tables
+
+
+class LazyJSONStorage(WriteBehindStorage):
+    # Ленивое хранилище для больших JSON-файлов: файл отображается в память, при первом открытии
+    # строится индекс смещений документов (сохраняется в <файл>.idx), документы разбираются при
+    # обращении. Изменения, как у WriteBehindStorage, держатся в памяти и сбрасываются на диск
+    # отложенно; после сброса таблицы снова читаются из файла лениво
+    def __init__(self, path, flush_every=1000, flush_interval=5.0, **kwargs):
+        self.path = path
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+
+        if not os.path.exists(path):
+            open(path, 'a').close()
+        self._data = None
+        self._mapping = None
+        self._tables = None
+        self._map()
+        self._dirty = False
+        self._pending_writes = 0
+        self._last_flush = time.monotonic()
+        atexit.register(self.flush)
+
+    def read(self):
+        if self._dirty:
+            return self._data
+        if self._tables is None:
+            return None
+        # Копия словаря таблиц: TinyDB подменяет в ней таблицу перед записью
+        return dict(self._tables)
+
+    def _map(self):
+        mapped = map_json_database(self.path)
+        if mapped is not None:
+            self._mapping, self._tables = mapped
+
+    def _release(self):
+        # На Windows файл, отображенный в память, нельзя заменить: отображение закрывается перед заменой.
+        # Неизмененные таблицы читаются из него при записи, поэтому закрытие - после записи временного файла
+        if self._tables is not None:
+            for table in self._tables.values():
+                table.release()
+            self._tables = None
+        if self._mapping is not None:
+            self._mapping.close()
+            self._mapping = None
+
+    def flush(self):
+        if self._dirty:
+            offsets = write_json_with_offsets(self.path, self._data, before_replace=self._release)
+            write_offset_index(self.path, offsets)
+            self._dirty = False
+            self._pending_writes = 0
+            self._data = None
+            self._map()
+        self._last_flush = time.monotonic()
+
+    def close(self):
+        super().close()
+        self._release()
+
+
+def log_paths(path):
+    # Журнал текущих изменений и журнал, переданный на незавершенное сжатие
+    return path + '.wal', path + '.wal.old'
+
+
+def replay_log(data, log_path):
+    # Применение записей журнала к данным. Недописанная последняя строка (сбой во время записи)
+    # отбрасывается; возвращается длина корректной части журнала в байтах
+    if data is None:
+        data = {}
+    valid_size = 0
+    if not os.path.exists(log_path):
+        return data, valid_size
+    with open(log_path, 'rb') as f:
+        for line in f:
+            if not line.endswith(b'\n'):
+                break
+            try:
+                record = json.loads(line, object_hook=compact_record)
+            except ValueError:
+                break
+            table = data.setdefault(record['t'], {})
+            if record['op'] == 'put':
+                table[record['id']] = record['doc']
+            elif record['op'] == 'del':
+                table.pop(record['id'], None)
+            elif record['op'] == 'truncate':
+                table.clear()
+            valid_size += len(line)
+    return data, valid_size
+
+
+def read_log_database(path):
+    # Состояние базы из снимка и журналов без изменения файлов
+    log_path, old_log_path = log_paths(path)
+    data = read_json_file(path)
+    if not os.path.exists(log_path) and not os.path.exists(old_log_path):
+        return data
+    data, _ = replay_log(data, old_log_path)
+    data, _ = replay_log(data, log_path)
+    return data
+
+
+class LogStorage(Storage):
+    # Хранилище с журналом упреждающей записи: файл базы является снимком, а каждое изменение
+    # дописывается в журнал <файл>.wal одной строкой. При открытии снимок и журнал воспроизводятся,
+    # а когда журнал превышает compact_threshold байт, он в фоне сворачивается в новый снимок.
+    # DatabaseManager вносит изменения через apply() - прямо в таблицу в памяти, без перестроения ее
+    # средствами TinyDB; запись через TinyDB описывается отметками mark(), а запись без отметок
+    # (например, прямое использование TinyDB) сохраняется целым снимком
+    def __init__(self, path, compact_threshold=16 * 1024 * 1024, sync=True, **kwargs):
+        self.path = path
+        self.log_path, self.old_log_path = log_paths(path)
+        self.compact_threshold = compact_threshold
+        self.sync = sync
+        self._kwargs = kwargs
+        self._pending = []
+        self._compaction = None
+        self._lock = threading.Lock()
+
+        if not os.path.exists(path):
+            open(path, 'a').close()
+        self._data = read_json_file(path)
+        self._data, _ = replay_log(self._data, self.old_log_path)
+        self._data, valid_size = replay_log(self._data, self.log_path)
+
+        if os.path.exists(self.old_log_path):
+            # Предыдущее сжатие не завершилось - доводим его до конца синхронно
+            self._write_snapshot(self._data)
+            for stale in (self.old_log_path, self.log_path):
+                if os.path.exists(stale):
+                    os.remove(stale)
+            valid_size = 0
+        self._log = open(self.log_path, 'ab')
+        # Отбрасываем недописанный хвост журнала, чтобы новые записи шли после корректной части
+        self._log.truncate(valid_size)
+        self._log.seek(valid_size)
+
+    @property
+    def log_size(self):
+        return self._log.tell()
+
+    def mark(self, table, doc_ids=(), appended=0, truncate=False):
+        # Отметка изменения перед операцией TinyDB: doc_ids - измененные или удаленные документы,
+        # appended - число документов, добавленных в конец таблицы, truncate - очистка таблицы
+        self._pending.append((table, [str(doc_id) for doc_id in doc_ids], appended, truncate))
+
+    def read(self):
+        return self._data
+
+    def write(self, data):
+        self._data = data
+        pending, self._pending = self._pending, []
+        if not pending:
+            self.compact()
+            return
+
+        lines = []
+        for table_name, doc_ids, appended, truncate in pending:
+            table = data.get(table_name, {})
+            if truncate:
+                lines.append({'op': 'truncate', 't': table_name})
+            for doc_id in doc_ids:
+                doc = table.get(doc_id)
+                if doc is None:
+                    lines.append({'op': 'del', 't': table_name, 'id': doc_id})
+                else:
+                    lines.append({'op': 'put', 't': table_name, 'id': doc_id, 'doc': doc})
+            if appended:
+                items = reversed(table.items())
+                added = [next(items) for _ in range(min(appended, len(table)))]
+                for doc_id, doc in reversed(added):
+                    lines.append({'op': 'put', 't': table_name, 'id': doc_id, 'doc': doc})
+
+        self._append(lines)
+
+    def apply(self, table_name, changes):
+        # Изменение документов на месте: changes - пары (doc_id, документ), документ None означает удаление.
+        # Стоимость пропорциональна числу измененных документов, а не размеру таблицы
+        if self._data is None:
+            self._data = {}
+        table = self._data.setdefault(table_name, {})
+        lines = []
+        for doc_id, doc in changes:
+            if doc is None:
+                table.pop(doc_id, None)
+                lines.append({'op': 'del', 't': table_name, 'id': doc_id})
+            else:
+                table[doc_id] = doc
+                lines.append({'op': 'put', 't': table_name, 'id': doc_id, 'doc': doc})
+        self._append(lines)
+
+    def _append(self, lines):
+        payload = ''.join(json.dumps(line, separators=(',', ':'), default=plain) + '\n' for line in lines)
+        self._log.write(payload.encode('utf-8'))
+        self.flush()
+        if self._log.tell() >= self.compact_threshold:
+            self.compact(background=True)
+
+    def flush(self):
+        self._log.flush()
+        if self.sync:
+            os.fsync(self._log.fileno())
+
+    def _write_snapshot(self, data):
+        atomic_write_json(self.path, data, **self._kwargs)
+
+    def _finish_compaction(self, snapshot):
+        self._write_snapshot(snapshot)
+        os.remove(self.old_log_path)
+
+    def wait_for_compaction(self):
+        with self._lock:
+            if self._compaction is not None:
+                self._compaction.join()
+                self._compaction = None
+
+    def compact(self, background=False):
+        # Журнал переименовывается в .wal.old и заменяется пустым, снимок таблиц копируется в памяти,
+        # а запись нового снимка выполняется в фоновом потоке (или сразу при background=False).
+        # При сбое до удаления .wal.old журналы воспроизводятся поверх любого из снимков с тем же результатом
+        self.wait_for_compaction()
+        with self._lock:
+            self.flush()
+            self._log.close()
+            os.replace(self.log_path, self.old_log_path)
+            self._log = open(self.log_path, 'ab')
+            data = self._data or {}
+            snapshot = {name: {doc_id: plain(doc) for doc_id, doc in table.items()}
+                        for name, table in data.items()}
+            if background:
+                self._compaction = threading.Thread(target=self._finish_compaction, args=(snapshot,), daemon=True)
+                self._compaction.start()
+            else:
+                self._finish_compaction(snapshot)
+
+    def close(self):
+        self.wait_for_compaction()
+        self.flush()
+        self._log.close()
+
+
+# Колоночный формат: сигнатура, длина заголовка, заголовок JSON и выровненные по 8 байт колонки
+COLUMNAR_MAGIC = b'TDBCOL01'
+# Поля заказа в порядке, в котором их записывает DatabaseManager; документы другой структуры
+# (например, служебная строка новой базы) хранятся в заголовке как есть
+COLUMNAR_FIELDS = ('order_id', 'customer_id', 'amount', 'date', 'status', 'delivery_address')
+COLUMNAR_DECODE_CHUNK = 10000
+_INT64_MIN = -2 ** 63
+_INT64_MAX = 2 ** 63 - 1
+
+
+def is_columnar_file(path):
+    if not os.path.exists(path):
+        return False
+    with open(path, 'rb') as f:
+        return f.read(len(COLUMNAR_MAGIC)) == COLUMNAR_MAGIC
+
+
+def _is_int64(value):
+    return type(value) is int and _INT64_MIN <= value <= _INT64_MAX
+
+
+def _date_ordinal(value):
+    # Дата 'YYYY-MM-DD' хранится номером дня; строки, которые не восстанавливаются точно, не упаковываются
+    if type(value) is not str or len(value) != 10:
+        return None
+    try:
+        day = date.fromisoformat(value)
+    except ValueError:
+        return None
+    return day.toordinal() if day.isoformat() == value else None
+
+
+def _encode_table(table):
+    # Разбор таблицы на колонки; возвращает описание таблицы для заголовка и список блоков данных
+    ids, order_ids, customer_ids, amounts, dates, codes, addresses = [], [], [], [], [], [], []
+    statuses = {}
+    extra = []
+    for position, (doc_id, doc) in enumerate(table.items()):
+        ordinal = None
+        if (doc_id.isdigit() and str(int(doc_id)) == doc_id and _is_int64(int(doc_id))
+                and tuple(doc) == COLUMNAR_FIELDS
+                and _is_int64(doc['order_id']) and _is_int64(doc['customer_id'])
+                and type(doc['amount']) is float
+                and type(doc['status']) is str and type(doc['delivery_address']) is str):
+            ordinal = _date_ordinal(doc['date'])
+        if ordinal is None:
+            extra.append([position, doc_id, doc])
+            continue
+        ids.append(int(doc_id))
+        order_ids.append(doc['order_id'])
+        customer_ids.append(doc['customer_id'])
+        amounts.append(doc['amount'])
+        dates.append(ordinal)
+        codes.append(statuses.setdefault(doc['status'], len(statuses)))
+        addresses.append(doc['delivery_address'].encode('utf-8', 'surrogatepass'))
+
+    offsets = np.zeros(len(addresses) + 1, dtype='<i8')
+    np.cumsum([len(address) for address in addresses], out=offsets[1:])
+    columns = [
+        ('doc_id', np.array(ids, dtype='<i8')),
+        ('order_id', np.array(order_ids, dtype='<i8')),
+        ('customer_id', np.array(customer_ids, dtype='<i8')),
+        ('amount', np.array(amounts, dtype='<f8')),
+        ('date', np.array(dates, dtype='<i4')),
+        ('status', np.array(codes, dtype='<u4')),
+        ('address_offsets', offsets),
+        ('address', np.frombuffer(b''.join(addresses), dtype='u1'))
+    ]
+    meta = {'rows': len(ids), 'statuses': list(statuses), 'extra': extra}
+    return meta, columns
+
+
+def write_columnar(path, data, before_replace=None):
+    # Атомарная запись таблиц {имя: {doc_id: документ}} в колоночном формате. before_replace()
+    # вызывается, когда данные уже закодированы и записаны во временный файл, перед заменой файла
+    _require_numpy()
+    header = {'tables': {}}
+    blocks = []
+    position = 0
+    for name, table in (data or {}).items():
+        meta, columns = _encode_table(table)
+        meta['columns'] = {}
+        for column, values in columns:
+            meta['columns'][column] = [position, values.dtype.str, len(values)]
+            blocks.append(values)
+            position += -(-values.nbytes // 8) * 8
+        header['tables'][name] = meta
+
+    header_bytes = json.dumps(header, separators=(',', ':'), default=plain).encode('utf-8')
+    header_bytes += b' ' * (-(len(COLUMNAR_MAGIC) + 8 + len(header_bytes)) % 8)
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix='.' + os.path.basename(path) + '.', suffix='.tmp', dir=directory)
+    try:
+        copy_file_mode(path, tmp_path)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(COLUMNAR_MAGIC)
+            f.write(struct.pack('<Q', len(header_bytes)))
+            f.write(header_bytes)
+            for values in blocks:
+                f.write(values.tobytes())
+                f.write(b'\0' * (-values.nbytes % 8))
+            f.flush()
+            os.fsync(f.fileno())
+        if before_replace is not None:
+            before_replace()
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    fsync_directory(directory)
+
+
+class ColumnarTable(Mapping):
+    # Таблица колоночного файла в виде {str(doc_id): документ} только для чтения. Колонки
+    # отображаются в память, документы собираются при обращении, поэтому открытие не зависит
+    # от размера файла, а в памяти держатся лишь страницы, которые действительно читались
+    def __init__(self, buffer, data_start, meta):
+        self._buffer = buffer
+        self._statuses = meta['statuses']
+        self._extra = sorted(meta['extra'], key=lambda item: item[0])
+        self._extra_by_id = {doc_id: doc for _, doc_id, doc in self._extra}
+        self._rows = meta['rows']
+        self._columns = {}
+        for column, (offset, dtype, length) in meta['columns'].items():
+            self._columns[column] = np.frombuffer(buffer, dtype=dtype, count=length, offset=data_start + offset)
+        self._address_start = data_start + meta['columns']['address'][0]
+        self._sorted_ids = None
+        self._dates = {}
+
+    def __len__(self):
+        return self._rows + len(self._extra)
+
+    def release(self):
+        # Отказ от ссылок на отображение файла, чтобы его можно было закрыть; таблица больше не читается
+        self._columns = {}
+        self._sorted_ids = None
+        self._sorted_rows = None
+        self._buffer = None
+
+    def column(self, name):
+        # Колонка в виде массива numpy (без служебных документов, которые хранятся отдельно)
+        return self._columns[name]
+
+    def _decode(self, start, stop):
+        # Документы строк [start, stop) колонок; значения переводятся в типы Python порциями
+        columns = self._columns
+        ids = columns['doc_id'][start:stop].tolist()
+        order_ids = columns['order_id'][start:stop].tolist()
+        customer_ids = columns['customer_id'][start:stop].tolist()
+        amounts = columns['amount'][start:stop].tolist()
+        dates = columns['date'][start:stop].tolist()
+        codes = columns['status'][start:stop].tolist()
+        offsets = columns['address_offsets'][start:stop + 1].tolist()
+        buffer = self._buffer
+        base = self._address_start
+        for i, doc_id in enumerate(ids):
+            day = self._dates.get(dates[i])
+            if day is None:
+                day = self._dates[dates[i]] = date.fromordinal(dates[i]).isoformat()
+            address = bytes(buffer[base + offsets[i]:base + offsets[i + 1]]).decode('utf-8', 'surrogatepass')
+            yield str(doc_id), make_record(order_ids[i], customer_ids[i], amounts[i], day,
+                                           self._statuses[codes[i]], address)
+
+    def _rows_between(self, start, stop):
+        for chunk_start in range(start, stop, COLUMNAR_DECODE_CHUNK):
+            yield from self._decode(chunk_start, min(chunk_start + COLUMNAR_DECODE_CHUNK, stop))
+
+    def items(self):
+        # Документы в исходном порядке: служебные документы стоят на своих позициях среди строк колонок
+        row = 0
+        for emitted, (position, doc_id, doc) in enumerate(self._extra):
+            stop = position - emitted
+            yield from self._rows_between(row, stop)
+            row = stop
+            yield doc_id, dict(doc)
+        yield from self._rows_between(row, self._rows)
+
+    def __iter__(self):
+        ids = self._columns['doc_id']
+        row = 0
+        for emitted, (position, doc_id, _) in enumerate(self._extra):
+            stop = position - emitted
+            for value in ids[row:stop].tolist():
+                yield str(value)
+            row = stop
+            yield doc_id
+        for value in ids[row:].tolist():
+            yield str(value)
+
+    def __getitem__(self, doc_id):
+        if doc_id in self._extra_by_id:
+            return dict(self._extra_by_id[doc_id])
+        if not (isinstance(doc_id, str) and doc_id.isdigit() and _is_int64(int(doc_id))):
+            raise KeyError(doc_id)
+        if self._sorted_ids is None:
+            # Поиск по doc_id через отсортированную копию колонки, строится при первом обращении
+            ids = self._columns['doc_id']
+            self._sorted_rows = np.argsort(ids, kind='stable')
+            self._sorted_ids = ids[self._sorted_rows]
+        i = int(np.searchsorted(self._sorted_ids, int(doc_id)))
+        if i == len(self._sorted_ids) or self._sorted_ids[i] != int(doc_id) or str(int(doc_id)) != doc_id:
+            raise KeyError(doc_id)
+        row = int(self._sorted_rows[i])
+        return next(self._decode(row, row + 1))[1]
+
+
+class ColumnarFile:
+    # Колоночный файл, отображенный в память, и его таблицы ColumnarTable
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mapping)
+        buffer = self._view
+        try:
+            if bytes(buffer[:len(COLUMNAR_MAGIC)]) != COLUMNAR_MAGIC:
+                raise ValueError(f"Файл {path} не является колоночной базой данных.")
+            header_size, = struct.unpack_from('<Q', buffer, len(COLUMNAR_MAGIC))
+            data_start = len(COLUMNAR_MAGIC) + 8 + header_size
+            header = json.loads(bytes(buffer[len(COLUMNAR_MAGIC) + 8:data_start]))
+        except BaseException:
+            self.close()
+            raise
+        self.tables = {name: ColumnarTable(buffer, data_start, meta) for name, meta in header['tables'].items()}
+
+    def close(self):
+        # Закрытие отображения. На Windows отображенный файл нельзя заменить, поэтому перед записью
+        # нового файла таблицы отпускают память отображения; если ссылки на нее еще остались
+        # (BufferError), отображение освободит сборщик мусора
+        for table in getattr(self, 'tables', {}).values():
+            table.release()
+        try:
+            self._view.release()
+            self._mapping.close()
+        except BufferError:
+            pass
+
+
+def read_columnar(path, materialize=True):
+    # Таблицы колоночного файла; при materialize=False возвращаются ColumnarTable поверх отображения в память
+    _require_numpy()
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return None
+    columnar_file = ColumnarFile(path)
+    if not materialize:
+        return columnar_file.tables
+    try:
+        return {name: dict(table.items()) for name, table in columnar_file.tables.items()}
+    finally:
+        columnar_file.close()
+
+
+def read_database_file(path):
+    # Полное состояние базы из файла любого формата: колоночного или JSON со снимком и журналом
+    if is_columnar_file(path):
+        return read_columnar(path)
+    return read_log_database(path)
+
+
+def convert_to_columnar(json_path, columnar_path):
+    write_columnar(columnar_path, read_log_database(json_path) or {})
+
+
+def convert_to_json(columnar_path, json_path, **kwargs):
+    atomic_write_json(json_path, read_columnar(columnar_path) or {}, **kwargs)
+
+
+class ColumnarStorage(Storage):
+    # Хранилище в колоночном формате: order_id, customer_id и doc_id - int64, amount - float64,
+    # дата - номер дня, status - код в словаре значений, адрес - байты UTF-8 со смещениями.
+    # Файл отображается в память и читается лениво; каждая запись атомарно перезаписывает файл
+    # целиком, как и стандартное хранилище TinyDB
+    def __init__(self, path, **kwargs):
+        _require_numpy()
+        self.path = path
+        if not os.path.exists(path):
+            open(path, 'a').close()
+        self._file = None
+
+    def read(self):
+        if self._file is None:
+            if os.path.getsize(self.path) == 0:
+                return None
+            self._file = ColumnarFile(self.path)
+        # Копия словаря таблиц: TinyDB подменяет в ней таблицу перед записью
+        return dict(self._file.tables)
+
+    def _release(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def write(self, data):
+        # Старое отображение закрывается после кодирования данных (они могут читаться из него)
+        # и до замены файла
+        write_columnar(self.path, data, before_replace=self._release)
+        self._release()
+
+    def close(self):
+        self._release()
+
+
+class ConcurrentModificationError(Exception):
+    # Файл базы изменил другой процесс между чтением и записью
+    pass
+
+
+class FileLock:
+    # Межпроцессная блокировка записи на файле <база>.lock: fcntl.flock, на Windows - msvcrt.locking.
+    # Повторный вход из того же потока не блокирует, другие потоки процесса ждут освобождения
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+        self._depth = 0
+        self._thread_lock = threading.RLock()
+
+    def _acquire(self):
+        self._file = open(self.path, 'a+b')
+        if fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+        else:
+            self._file.seek(0)
+            msvcrt.locking(self._file.fileno(), msvcrt.LK_LOCK, 1)
+
+    def _release(self):
+        if fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        else:
+            self._file.seek(0)
+            msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+        self._file.close()
+        self._file = None
+
+    @contextmanager
+    def exclusive(self):
+        with self._thread_lock:
+            if self._depth == 0:
+                self._acquire()
+            self._depth += 1
+            try:
+                yield
+            finally:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._release()
+
+
+def _stat_token(stat):
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+class SharedJSONStorage(Storage):
+    # Хранилище для нескольких процессов, работающих с одним файлом. Запись выполняется под
+    # блокировкой FileLock атомарной заменой файла, поэтому читатели не блокируются: они работают
+    # со снимком в памяти и подхватывают новую версию файла при refresh(). Запись проверяет, что
+    # файл не изменился с момента чтения снимка, иначе выбрасывает ConcurrentModificationError
+    def __init__(self, path, lock=None, **kwargs):
+        self.path = path
+        self.lock = lock or FileLock(path + '.lock')
+        self._kwargs = kwargs
+        # Счетчик загрузок файла с диска: растет, когда файл изменил другой процесс
+        self.generation = 0
+        self._data = None
+        self._token = None
+
+        with self.lock.exclusive():
+            if not os.path.exists(path):
+                open(path, 'a').close()
+        self.refresh()
+
+    def refresh(self):
+        # Загрузка файла, если его заменили после последнего чтения; True - снимок обновлен
+        if self._token is not None and _stat_token(os.stat(self.path)) == self._token:
+            return False
+        # Размер и время берутся у того же открытого файла, из которого читаются данные
+        with open(self.path, 'rb') as f:
+            token = _stat_token(os.fstat(f.fileno()))
+            if token == self._token:
+                return False
+            raw = f.read()
+        self._data = json.loads(raw, object_hook=compact_record) if raw else None
+        self.generation += 1
+        self._token = token
+        return True
+
+    def read(self):
+        return self._data
+
+    def write(self, data):
+        with self.lock.exclusive():
+            if _stat_token(os.stat(self.path)) != self._token:
+                # Снимок устарел, а TinyDB мог изменить его документы на месте - перечитываем при следующем refresh()
+                self._token = None
+                raise ConcurrentModificationError("Файл базы данных был изменен другим процессом.")
+            atomic_write_json(self.path, data, **self._kwargs)
+            self._data = data
+            self._token = _stat_token(os.stat(self.path))
@@ -0,0 +1,45 @@
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+STATUSES = ['pending', 'shipped', 'delivered', 'cancelled']
+
+
+def make_orders(count, seed=0, start=1):
+    # Заказы в виде списков значений в порядке FIELDS
+    rng = random.Random(seed)
+    return [
+        [order_id, rng.randint(1, 20), round(rng.uniform(1, 500), 2),
+         f'2023-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}', rng.choice(STATUSES),
+         f'Street {rng.randint(1, 50)}']
+        for order_id in range(start, start + count)
+    ]
+
+
+def contents(documents):
+    # Результат запроса в виде, не зависящем от порядка и типа документов
+    from db import FIELDS
+    return sorted((doc.doc_id, tuple(doc.get(field) for field in FIELDS)) for doc in documents)
+
+
+@pytest.fixture
+def open_manager(tmp_path, capsys):
+    from db import DatabaseManager
+
+    managers = []
+
+    def open_manager(storage_mode='json', name='orders.json', **options):
+        path = str(tmp_path / name)
+        manager = DatabaseManager(path, storage_mode=storage_mode, **options)
+        if manager.db is None:
+            manager.create_new_database()
+        managers.append(manager)
+        return manager
+
+    yield open_manager
+    for manager in managers:
+        manager.close_database()
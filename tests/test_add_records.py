@@ -0,0 +1,34 @@
+import pytest
+
+from conftest import make_orders
+from db import STORAGE_MODES
+
+
+def _open(open_manager, storage_mode):
+    return open_manager(storage_mode, 'orders.tdbc' if storage_mode == 'columnar' else 'orders.json')
+
+
+@pytest.mark.parametrize('storage_mode', list(STORAGE_MODES))
+def test_rows_of_wrong_shape_are_rejected(open_manager, storage_mode):
+    manager = _open(open_manager, storage_mode)
+    valid = make_orders(1)[0]
+    results = manager.add_records([5, None, 'abc', [], valid])
+
+    assert [result['accepted'] for result in results] == [False, False, False, False, True]
+    assert [result['order_id'] for result in results] == [None, None, None, None, valid[0]]
+    assert all(result['error'] for result in results[:4])
+    assert len(manager.search_by_field('order_id', valid[0])) == 1
+
+
+@pytest.mark.parametrize('storage_mode', list(STORAGE_MODES))
+def test_batch_rejects_duplicates_and_invalid_values(open_manager, storage_mode):
+    manager = _open(open_manager, storage_mode)
+    rows = make_orders(3)
+    manager.add_records(rows[:1])
+    bad_amount = list(rows[2])
+    bad_amount[2] = 'abc'
+    results = manager.add_records([rows[0], rows[1], rows[1], bad_amount])
+
+    assert [(result['row'], result['accepted']) for result in results] == [(1, False), (2, True), (3, False), (4, False)]
+    assert len(manager.search_by_field('customer_id', rows[1][1])) >= 1
+    assert manager.search_by_field('order_id', rows[2][0]) == []
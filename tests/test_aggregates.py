@@ -0,0 +1,85 @@
+from collections import defaultdict
+
+import pytest
+
+from conftest import make_orders
+
+pytest.importorskip('pandas')
+
+
+def brute_force(rows, key):
+    groups = defaultdict(list)
+    for row in rows:
+        groups[key(row)].append(row[2])
+    return groups
+
+
+def reduce(groups, func):
+    functions = {'sum': sum, 'count': len, 'min': min, 'max': max, 'avg': lambda values: sum(values) / len(values)}
+    return {key: functions[func](values) for key, values in groups.items()}
+
+
+@pytest.fixture
+def orders(open_manager):
+    rows = make_orders(300, seed=11)
+    manager = open_manager()
+    manager.add_records(rows)
+    # Изменения после первого запроса: колоночное представление строится заново
+    manager.aggregate('status')
+    manager.edit_record('order_id', 5, {'amount': 999.5})
+    manager.delete_record_by_field('order_id', 6)
+    rows[4][2] = 999.5
+    del rows[5]
+    return manager, rows
+
+
+@pytest.mark.parametrize('func', ['sum', 'avg', 'count', 'min', 'max'])
+@pytest.mark.parametrize('by, key', [
+    ('customer_id', lambda row: row[1]),
+    ('status', lambda row: row[4]),
+])
+def test_aggregate_matches_brute_force(orders, func, by, key):
+    manager, rows = orders
+    expected = reduce(brute_force(rows, key), func)
+    result = {item[by]: item[func] for item in manager.aggregate(by, func)}
+    assert result == pytest.approx(expected)
+
+
+@pytest.mark.parametrize('bucket, length', [('day', 10), ('month', 7), ('year', 4)])
+def test_aggregate_by_date_bucket(orders, bucket, length):
+    manager, rows = orders
+    expected = reduce(brute_force(rows, lambda row: row[3][:length]), 'sum')
+    result = {item['date']: item['sum'] for item in manager.aggregate('date', 'sum', bucket=bucket)}
+    assert result == pytest.approx(expected)
+
+
+def test_top_customers_matches_brute_force(orders):
+    manager, rows = orders
+    totals = reduce(brute_force(rows, lambda row: row[1]), 'sum')
+    expected = sorted(totals.values(), reverse=True)[:5]
+    result = manager.top_customers(5)
+    assert [item['sum'] for item in result] == pytest.approx(expected)
+    assert all(item['sum'] == pytest.approx(totals[item['customer_id']]) for item in result)
+
+
+def test_total_between_matches_brute_force(orders):
+    manager, rows = orders
+    selected = [row[2] for row in rows if '2023-03-10' <= row[3] <= '2023-08-20']
+    result = manager.total_between('2023-03-10', '2023-08-20')
+    assert result['count'] == len(selected)
+    assert result['sum'] == pytest.approx(sum(selected))
+    assert result['avg'] == pytest.approx(sum(selected) / len(selected))
+    assert manager.total_between('2030-01-01', '2030-12-31') == {'count': 0, 'sum': 0, 'avg': None}
+
+
+@pytest.mark.parametrize('start, end', [('2023-01', '2023-12-31'), ('2023-01-01', '31.12.2023'), ('', '2023-12-31')])
+def test_total_between_rejects_malformed_dates(orders, capsys, start, end):
+    manager, _ = orders
+    capsys.readouterr()
+    assert manager.total_between(start, end) is None
+    assert "Некорректный формат даты" in capsys.readouterr().out
+
+
+def test_total_between_accepts_dates_like_parse_record(orders):
+    manager, _ = orders
+    assert manager.total_between('2023-1-5', '2023-6-30') == manager.total_between('2023-01-05', '2023-06-30')
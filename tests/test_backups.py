@@ -0,0 +1,30 @@
+from backups import BackupChain
+from conftest import make_orders
+
+
+def test_background_backups_to_one_directory_keep_every_entry(open_manager, tmp_path):
+    manager = open_manager('write_behind')
+    backup_dir = str(tmp_path / 'backups')
+    futures = []
+    for rows in (make_orders(50, start=1), make_orders(50, start=100), make_orders(50, start=200)):
+        manager.add_records(rows)
+        futures.extend(manager.create_incremental_backup(backup_dir, background=True) for _ in range(3))
+    entries = [future.result(timeout=30) for future in futures]
+
+    assert all(entries)
+    chain = BackupChain(backup_dir)
+    assert [entry['file'] for entry in chain.entries()] == sorted(entry['file'] for entry in entries)
+    restored = chain.restore()['_default']
+    assert sum(1 for doc in restored.values() if doc.get('order_id') is not None) == 150
+
+
+def test_restore_until_returns_earlier_state(open_manager, tmp_path):
+    manager = open_manager()
+    backup_dir = str(tmp_path / 'backups')
+    manager.add_records(make_orders(10))
+    first = manager.create_incremental_backup(backup_dir)
+    manager.delete_record_by_field('customer_id', make_orders(10)[0][1])
+    manager.create_incremental_backup(backup_dir)
+
+    earlier = BackupChain(backup_dir).restore(first['created'])['_default']
+    assert sum(1 for doc in earlier.values() if doc.get('order_id') is not None) == 10
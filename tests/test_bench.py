@@ -0,0 +1,27 @@
+import multiprocessing
+import os
+
+import bench
+
+
+def test_dead_child_is_reported_as_error(monkeypatch):
+    monkeypatch.setattr(bench, 'POLL_INTERVAL', 0.05)
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    process = context.Process(target=os._exit, args=(3,))
+    process.start()
+    status, message = bench._wait_result(results, process)
+    process.join()
+    assert status == 'error'
+    assert 'код 3' in message
+
+
+def test_result_sent_before_exit_is_returned(monkeypatch):
+    monkeypatch.setattr(bench, 'POLL_INTERVAL', 0.05)
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    results.put(('ok', {'rows': 1}))
+    process = context.Process(target=os._exit, args=(0,))
+    process.start()
+    process.join()
+    assert bench._wait_result(results, process) == ('ok', {'rows': 1})
@@ -0,0 +1,126 @@
+import multiprocessing
+import random
+
+import pytest
+
+from conftest import STATUSES, make_orders, contents
+from test_import import write_csv
+from test_shared import _write_orders
+
+SEARCHES = [('customer_id', value) for value in range(1, 21)] + [('status', value) for value in STATUSES]
+
+
+def expected(manager, field, value):
+    return [doc for doc in manager.get_all_records() if doc.get(field) == value]
+
+
+def assert_searches_match(manager):
+    # Каждый поиск дважды: первый может заполнить кэш, второй отвечает из него
+    for field, value in SEARCHES:
+        truth = contents(expected(manager, field, value))
+        assert contents(manager.search_by_field(field, value)) == truth, (field, value)
+        assert contents(manager.search_by_field(field, value)) == truth, (field, value)
+
+
+def add_record(manager, tmp_path):
+    manager.add_record(500, 3, 10.0, '2023-05-05', 'pending', 'Street 5')
+
+
+def add_records(manager, tmp_path):
+    manager.add_records(make_orders(10, seed=41, start=500))
+
+
+def edit_record(manager, tmp_path):
+    manager.edit_record('order_id', 5, {'customer_id': 19, 'status': 'delivered'})
+
+
+def update_where(manager, tmp_path):
+    manager.update_where({'status': 'pending'}, {'customer_id': 4})
+
+
+def delete_record(manager, tmp_path):
+    manager.delete_record_by_field('customer_id', 7)
+
+
+def clear_all(manager, tmp_path):
+    manager.clear_all_records()
+
+
+def import_rows(manager, tmp_path):
+    path = str(tmp_path / 'more.csv')
+    write_csv(path, make_orders(15, seed=42, start=600))
+    manager.import_from(path, workers=0)
+
+
+def restore_backup(manager, tmp_path):
+    backup = str(tmp_path / 'backup.json')
+    manager.create_backup(backup)
+    manager.add_records(make_orders(5, seed=43, start=700))
+    assert_searches_match(manager)
+    manager.restore_from_backup(backup)
+
+
+def restore_incremental(manager, tmp_path):
+    backup_dir = str(tmp_path / 'backups')
+    manager.create_incremental_backup(backup_dir)
+    manager.delete_record_by_field('status', 'shipped')
+    assert_searches_match(manager)
+    manager.restore_incremental_backup(backup_dir)
+
+
+WRITES = [add_record, add_records, edit_record, update_where, delete_record, clear_all, import_rows,
+          restore_backup, restore_incremental]
+
+
+@pytest.mark.parametrize('storage_mode', ['json', 'lazy', 'shared'])
+@pytest.mark.parametrize('write', WRITES, ids=lambda write: write.__name__)
+def test_write_invalidates_cached_results(open_manager, tmp_path, storage_mode, write):
+    manager = open_manager(storage_mode)
+    manager.add_records(make_orders(120, seed=40))
+    assert_searches_match(manager)
+    write(manager, tmp_path)
+    assert_searches_match(manager)
+    assert manager.cache_stats()['hits'] > 0
+
+
+def test_other_process_writes_invalidate_cache(open_manager):
+    manager = open_manager('shared')
+    manager.add_records(make_orders(40, seed=44))
+    assert_searches_match(manager)
+    process = multiprocessing.Process(target=_write_orders,
+                                      args=(manager.file_path, make_orders(30, seed=45, start=100)))
+    process.start()
+    process.join(60)
+    assert process.exitcode == 0
+    assert_searches_match(manager)
+    assert len(manager.search_range('order_id', 100)) == 30
+
+
+@pytest.mark.parametrize('storage_mode', ['json', 'lazy'])
+def test_cached_searches_match_uncached_manager(open_manager, storage_mode):
+    # Одни и те же случайные операции над кэширующим и простым менеджером
+    cached = open_manager(storage_mode, 'cached.json')
+    plain = open_manager(storage_mode, 'plain.json', use_index=False, cache_size=0)
+    rng = random.Random(46)
+    next_id = 1
+    for _ in range(400):
+        action = rng.random()
+        if action < 0.5:
+            field, value = rng.choice(SEARCHES)
+            assert contents(cached.search_by_field(field, value)) == contents(plain.search_by_field(field, value))
+            continue
+        if action < 0.7:
+            rows = make_orders(rng.randint(1, 5), seed=rng.random(), start=next_id)
+            next_id += len(rows)
+            changes = [(manager.add_records, (rows,)) for manager in (cached, plain)]
+        elif action < 0.85:
+            criteria = {'customer_id': rng.randint(1, 20)}
+            values = rng.choice([{'customer_id': rng.randint(1, 20)}, {'status': rng.choice(STATUSES)}])
+            changes = [(manager.update_where, (criteria, values)) for manager in (cached, plain)]
+        else:
+            field, value = rng.choice(SEARCHES)
+            changes = [(manager.delete_record_by_field, (field, value)) for manager in (cached, plain)]
+        for change, args in changes:
+            change(*args)
+    assert contents(cached.get_all_records()) == contents(plain.get_all_records())
+    assert cached.cache_stats()['hits'] > 0
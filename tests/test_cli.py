@@ -0,0 +1,143 @@
+import io
+import json
+
+import pytest
+
+import cli
+from conftest import make_orders
+from test_import import write_csv
+
+
+def run(capsys, *argv):
+    capsys.readouterr()
+    code = cli.main([str(arg) for arg in argv])
+    return code, [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+
+
+@pytest.fixture
+def database(tmp_path, capsys):
+    path = str(tmp_path / 'orders.json')
+    source = str(tmp_path / 'orders.csv')
+    write_csv(source, make_orders(40, seed=51))
+    code, _ = run(capsys, path, '--create', '--quiet', 'import', source, '--workers', '0')
+    assert code == 0
+    return path
+
+
+def test_create_import_and_search(database, capsys):
+    code, records = run(capsys, database, 'search', 'order_id', 7)
+    assert code == 0
+    assert [record['order_id'] for record in records] == [7]
+    assert records[0]['doc_id']
+
+    code, records = run(capsys, database, 'search', 'amount', 'много')
+    assert code == 1
+    assert records == []
+
+
+def test_range_and_list(database, capsys):
+    code, records = run(capsys, database, 'range', 'amount', '--from', 100, '--to', 300, '--exclude-to')
+    assert code == 0
+    amounts = [record['amount'] for record in records]
+    assert amounts == sorted(amounts)
+    assert all(100 <= amount < 300 for amount in amounts)
+
+    _, descending = run(capsys, database, 'range', 'date', '--descending', '--offset', 2, '--limit', 5)
+    _, everything = run(capsys, database, 'range', 'date', '--descending')
+    assert descending == everything[2:7]
+
+    code, page = run(capsys, database, 'list', '--sort-by', 'amount', '--offset', 10, '--limit', 5)
+    assert code == 0
+    _, ordered = run(capsys, database, 'range', 'amount')
+    assert page == ordered[10:15]
+
+    _, filtered = run(capsys, database, 'list', '--where', 'status=pending')
+    assert filtered and all(record['status'] == 'pending' for record in filtered)
+
+
+def test_add_update_delete_clear(database, capsys):
+    code, records = run(capsys, database, 'add', 100, 3, 12.5, '2023-04-01', 'pending', 'Street 3')
+    assert code == 0 and records[0]['accepted']
+    code, records = run(capsys, database, 'add', 100, 3, 12.5, '2023-04-01', 'pending', 'Street 3')
+    assert code == 1 and not records[0]['accepted']
+
+    code, records = run(capsys, database, 'update', '--where', 'order_id=100', '--set', 'status=shipped')
+    assert (code, records) == (0, [{'updated': 1}])
+    _, records = run(capsys, database, 'search', 'order_id', 100)
+    assert records[0]['status'] == 'shipped'
+
+    code, records = run(capsys, database, 'delete', 'order_id', 100)
+    assert (code, records) == (0, [{'deleted': 1}])
+    assert run(capsys, database, 'search', 'order_id', 100)[1] == []
+
+    with pytest.raises(SystemExit):
+        cli.main([database, 'clear'])
+    assert run(capsys, database, 'clear', '--yes') == (0, [{'cleared': True}])
+    assert run(capsys, database, 'list')[1] == []
+
+
+def test_export_backup_and_restore(database, tmp_path, capsys):
+    export_path = str(tmp_path / 'pending.csv')
+    code, records = run(capsys, database, 'export', export_path, '--where', 'status=pending', '--columns',
+                        'order_id', 'amount')
+    assert code == 0
+    with open(export_path, encoding='utf-8') as f:
+        lines = f.read().splitlines()
+    assert lines[0] == 'order_id,amount'
+    assert len(lines) - 1 == records[0]['rows'] == len(run(capsys, database, 'search', 'status', 'pending')[1])
+
+    backup_path = str(tmp_path / 'backup.json')
+    assert run(capsys, database, 'backup', backup_path)[0] == 0
+    backup_dir = str(tmp_path / 'backups')
+    code, records = run(capsys, database, 'backup', backup_dir, '--incremental')
+    assert code == 0 and records[0]['type'] == 'base'
+
+    run(capsys, database, 'delete', 'order_id', 1)
+    assert run(capsys, database, 'restore', backup_path)[0] == 0
+    assert len(run(capsys, database, 'search', 'order_id', 1)[1]) == 1
+
+    run(capsys, database, 'delete', 'order_id', 2)
+    assert run(capsys, database, 'restore', backup_dir + '/manifest.json')[0] == 0
+    assert len(run(capsys, database, 'search', 'order_id', 2)[1]) == 1
+
+
+def test_aggregate_and_metrics(database, capsys):
+    code, rows = run(capsys, database, 'aggregate', 'status', '--func', 'count')
+    assert code == 0
+    assert sum(row['count'] for row in rows) == 40
+
+    assert run(capsys, database, 'metrics')[0] == 1
+    code = cli.main([database, '--metrics', 'metrics', '--format', 'json'])
+    assert code == 0
+    assert json.loads(capsys.readouterr().out)
+
+
+def test_session_continues_after_errors(database, capsys, monkeypatch):
+    commands = '\n'.join([
+        '# комментарий',
+        'search order_id 3',
+        'search nofield 1',
+        'add 200 1 5 2023-01-01 pending "Street 1"',
+        'search order_id 200',
+    ])
+    monkeypatch.setattr('sys.stdin', io.StringIO(commands))
+    code, records = run(capsys, database, 'session')
+    assert code == 1
+    assert [record.get('order_id') for record in records] == [3, 200, 200]
+
+    monkeypatch.setattr('sys.stdin', io.StringIO(commands))
+    code, records = run(capsys, database, 'session', '--stop-on-error')
+    assert code == 1
+    assert [record.get('order_id') for record in records] == [3]
+
+
+def test_missing_database(tmp_path, capsys):
+    assert cli.main([str(tmp_path / 'missing.json'), 'list']) == 1
+    assert capsys.readouterr().out == ''
+
+
+def test_columnar_database_by_extension(tmp_path, capsys):
+    path = str(tmp_path / 'orders.tdbc')
+    assert run(capsys, path, '--create', 'add', 1, 2, 3.5, '2023-01-01', 'pending', 'Street 1')[0] == 0
+    _, records = run(capsys, path, 'search', 'order_id', 1)
+    assert records[0]['amount'] == 3.5
@@ -0,0 +1,72 @@
+import json
+
+import pytest
+
+from conftest import contents, make_orders
+
+pytest.importorskip('numpy')
+
+import storages
+from storages import convert_to_columnar, convert_to_json, is_columnar_file, read_columnar
+
+
+def test_conversion_round_trip_is_lossless(tmp_path):
+    source = tmp_path / 'orders.json'
+    tables = {
+        '_default': {
+            '1': {'order_id': None, 'customer_id': None, 'amount': None, 'date': None, 'status': None,
+                  'delivery_address': None},
+            '2': {'order_id': 10, 'customer_id': 3, 'amount': 12.5, 'date': '2023-01-31', 'status': 'shipped',
+                  'delivery_address': 'Улица Ленина, 1'},
+            '5': {'order_id': 11, 'customer_id': 3, 'amount': 7, 'date': '2023-02-01', 'status': 'new',
+                  'delivery_address': 'x'},
+            '7': {'order_id': 12, 'customer_id': 4, 'amount': 1.25, 'date': 'not a date', 'status': 'new',
+                  'delivery_address': ''},
+            '8': {'order_id': 13, 'customer_id': 4, 'amount': 2.0, 'date': '2024-02-29', 'status': 'new',
+                  'delivery_address': 'y', 'note': 'extra field'}
+        },
+        'other': {'1': {'key': 'value'}}
+    }
+    source.write_text(json.dumps(tables), encoding='utf-8')
+
+    columnar = str(tmp_path / 'orders.tdbc')
+    convert_to_columnar(str(source), columnar)
+    assert is_columnar_file(columnar)
+    assert read_columnar(columnar) == tables
+
+    restored = tmp_path / 'restored.json'
+    convert_to_json(columnar, str(restored))
+    assert json.loads(restored.read_text(encoding='utf-8')) == tables
+
+
+def test_columnar_manager_matches_json_manager(open_manager):
+    columnar = open_manager('columnar', 'orders.tdbc')
+    plain = open_manager('json', 'orders.json')
+    rows = make_orders(300, seed=5)
+    for manager in (columnar, plain):
+        manager.add_records(rows)
+        manager.edit_record('customer_id', 4, {'status': 'delivered'})
+        manager.delete_record_by_field('status', 'cancelled')
+
+    assert contents(columnar.get_all_records()) == contents(plain.get_all_records())
+    assert contents(columnar.search_range('amount', 100, 200)) == contents(plain.search_range('amount', 100, 200))
+    columnar.close_database()
+
+    reopened = open_manager('columnar', 'orders.tdbc')
+    assert contents(reopened.get_all_records()) == contents(plain.get_all_records())
+
+
+def test_mapping_is_closed_before_file_is_replaced(open_manager, monkeypatch):
+    manager = open_manager('columnar', 'orders.tdbc')
+    manager.add_records(make_orders(10))
+    manager.get_all_records()
+    mapping = manager.db.storage._file._mapping
+    replace = storages.os.replace
+
+    def checked_replace(source, target):
+        assert mapping.closed
+        replace(source, target)
+
+    monkeypatch.setattr(storages.os, 'replace', checked_replace)
+    manager.add_record(*make_orders(1, start=100)[0])
+    assert len(manager.search_by_field('order_id', 100)) == 1
@@ -0,0 +1,67 @@
+import csv
+import os
+import tempfile
+
+import pytest
+
+from conftest import make_orders
+
+from db import FIELDS, OperationCancelled
+
+
+def orders(documents):
+    return sorted(tuple(doc.get(field) for field in FIELDS) for doc in documents if doc.get('order_id') is not None)
+
+
+@pytest.mark.parametrize('file_format', ['csv', 'xlsx'])
+def test_export_round_trip(open_manager, tmp_path, file_format):
+    if file_format == 'xlsx':
+        pytest.importorskip('openpyxl')
+    source = open_manager('json', 'source.json')
+    source.add_records(make_orders(120, seed=12))
+    progress = []
+    path = str(tmp_path / f'orders.{file_format}')
+
+    result = source.export_stream(path, file_format, chunk_size=25,
+                                  progress=lambda rows, size: progress.append(rows))
+    # Служебная строка новой базы тоже выгружается и при загрузке отклоняется
+    assert result['rows'] == 121
+    assert result['bytes'] == os.path.getsize(path)
+    assert progress[:5] == [25, 50, 75, 100, 121]
+
+    target = open_manager('json', 'target.json')
+    target.import_from(path, workers=0)
+    assert orders(target.get_all_records()) == orders(source.get_all_records())
+
+
+def test_export_selected_rows_and_columns(open_manager, tmp_path):
+    manager = open_manager()
+    manager.add_records(make_orders(60, seed=13))
+    path = str(tmp_path / 'customer.csv')
+    manager.export_to_csv(path, field_name='customer_id', value=4, columns=['order_id', 'amount'])
+
+    with open(path, encoding='utf-8', newline='') as f:
+        rows = list(csv.reader(f))
+    expected = sorted(doc['order_id'] for doc in manager.search_by_field('customer_id', 4))
+    assert rows[0] == ['order_id', 'amount']
+    assert sorted(int(row[0]) for row in rows[1:]) == expected
+
+
+@pytest.mark.parametrize('file_format', ['csv', 'xlsx'])
+def test_cancelled_export_removes_partial_file(open_manager, tmp_path, file_format):
+    if file_format == 'xlsx':
+        pytest.importorskip('openpyxl')
+    manager = open_manager()
+    manager.add_records(make_orders(100, seed=14))
+    path = str(tmp_path / f'orders.{file_format}')
+
+    def progress(rows, size):
+        if rows >= 20:
+            raise OperationCancelled()
+
+    temp_files = set(os.listdir(tempfile.gettempdir()))
+    with pytest.raises(OperationCancelled):
+        manager.export_stream(path, file_format, chunk_size=10, progress=progress)
+    assert not os.path.exists(path)
+    # Временный файл листа openpyxl тоже не остается
+    assert not [name for name in set(os.listdir(tempfile.gettempdir())) - temp_files if name.startswith('openpyxl.')]
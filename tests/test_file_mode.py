@@ -0,0 +1,38 @@
+import os
+import stat
+
+import pytest
+
+from conftest import make_orders
+
+from db import STORAGE_MODES
+
+pytestmark = pytest.mark.skipif(os.name == 'nt', reason="права файлов POSIX")
+
+
+@pytest.mark.parametrize('storage_mode', list(STORAGE_MODES))
+def test_file_mode_survives_write(open_manager, tmp_path, storage_mode):
+    name = 'orders.tdbc' if storage_mode == 'columnar' else 'orders.json'
+    manager = open_manager(storage_mode, name)
+    path = str(tmp_path / name)
+    os.chmod(path, 0o664)
+    manager.add_records(make_orders(20))
+    manager.flush()
+    manager.close_database()
+    if storage_mode == 'wal':
+        # Снимок режима wal записывается заменой файла при сворачивании журнала
+        manager = open_manager(storage_mode, name)
+        manager.db.storage.compact()
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o664
+
+
+def test_new_file_gets_umask_mode(tmp_path):
+    from storages import atomic_write_json
+
+    umask = os.umask(0o022)
+    try:
+        path = str(tmp_path / 'new.json')
+        atomic_write_json(path, {'_default': {}})
+    finally:
+        os.umask(umask)
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o644
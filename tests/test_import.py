@@ -0,0 +1,87 @@
+import csv
+import json
+
+import pytest
+
+from conftest import make_orders
+
+from db import FIELDS
+
+
+def write_csv(path, rows):
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(FIELDS)
+        writer.writerows(rows)
+
+
+def write_xlsx(path, rows):
+    openpyxl = pytest.importorskip('openpyxl')
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.append(FIELDS)
+    for row in rows:
+        sheet.append(row)
+    workbook.save(path)
+
+
+def write_jsonl(path, rows):
+    with open(path, 'w', encoding='utf-8') as f:
+        for row in rows:
+            f.write(json.dumps(dict(zip(FIELDS, row))) + '\n')
+        f.write('не json\n')
+
+
+WRITERS = {'csv': write_csv, 'xlsx': write_xlsx, 'jsonl': write_jsonl}
+
+
+def import_rows():
+    rows = make_orders(30, seed=7)
+    existing = rows[0]
+    invalid = [
+        [100, 1, 'много', '2023-01-01', 'pending', 'Street 1'],
+        [101, 1, 10.5, '2023-13-01', 'pending', 'Street 1'],
+        [rows[3][0], 2, 11.0, '2023-02-02', 'shipped', 'Street 2'],
+    ]
+    return existing, rows[1:] + invalid
+
+
+def rejected_rows(path):
+    with open(path, encoding='utf-8', newline='') as f:
+        return list(csv.DictReader(f))
+
+
+@pytest.mark.parametrize('workers', [0, 2])
+@pytest.mark.parametrize('file_format', ['csv', 'xlsx', 'jsonl'])
+def test_import_with_rejects(open_manager, tmp_path, file_format, workers):
+    manager = open_manager()
+    existing, rows = import_rows()
+    manager.add_record(*existing)
+    path = str(tmp_path / f'orders.{file_format}')
+    WRITERS[file_format](path, rows + [existing])
+
+    result = manager.import_from(path, workers=workers, batch_size=7)
+
+    extra = 1 if file_format == 'jsonl' else 0
+    assert result['accepted'] == 29
+    assert result['rejected'] == 4 + extra
+    assert result['reject_file'] == path + '.rejects.csv'
+    rejects = rejected_rows(result['reject_file'])
+    assert [int(row['row']) for row in rejects][:4] == [30, 31, 32, 33]
+    assert all(row['error'] for row in rejects)
+    order_ids = sorted(doc['order_id'] for doc in manager.get_all_records() if doc['order_id'] is not None)
+    assert order_ids == list(range(1, 31))
+
+
+def test_default_reject_files_do_not_collide(open_manager, tmp_path):
+    manager = open_manager()
+    _, rows = import_rows()
+    write_csv(str(tmp_path / 'orders.csv'), rows)
+    write_jsonl(str(tmp_path / 'orders.jsonl'), rows)
+
+    first = manager.import_from(str(tmp_path / 'orders.csv'), workers=0)
+    second = manager.import_from(str(tmp_path / 'orders.jsonl'), workers=0)
+    assert first['reject_file'] != second['reject_file']
+    # Во второй раз все строки уже есть в базе и отклоняются
+    assert len(rejected_rows(first['reject_file'])) == first['rejected'] == 3
+    assert len(rejected_rows(second['reject_file'])) == second['rejected'] == len(rows) + 1
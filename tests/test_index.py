@@ -0,0 +1,93 @@
+import random
+
+import pytest
+
+from conftest import contents, make_orders
+from db import FIELDS, INDEXED_FIELDS
+
+
+@pytest.mark.parametrize('storage_mode', ['json', 'write_behind', 'wal', 'lazy'])
+def test_index_matches_scan_after_random_changes(open_manager, storage_mode):
+    indexed = open_manager(storage_mode, 'indexed.json')
+    scanned = open_manager(storage_mode, 'scanned.json', use_index=False, cache_size=0)
+    rows = make_orders(200, seed=1)
+    for manager in (indexed, scanned):
+        manager.add_records(rows)
+
+    rng = random.Random(2)
+    next_id = 10000
+    for _ in range(150):
+        operation = rng.choice(['add', 'duplicate', 'delete', 'edit'])
+        row = rng.choice(rows)
+        field = rng.choice(INDEXED_FIELDS)
+        value = row[FIELDS.index(field)]
+        new_values = {'status': rng.choice(['new', 'shipped']), 'amount': 1.5}
+        for manager in (indexed, scanned):
+            if operation == 'add':
+                manager.add_record(next_id, *row[1:])
+            elif operation == 'duplicate':
+                manager.add_record(*row)
+            elif operation == 'delete':
+                manager.delete_record_by_field(field, value)
+            else:
+                manager.edit_record(field, value, new_values)
+        next_id += 1
+
+        for field in INDEXED_FIELDS:
+            probe = rng.choice(rows)[FIELDS.index(field)]
+            assert contents(indexed.search_by_field(field, probe)) == contents(scanned.search_by_field(field, probe))
+
+    assert contents(indexed.get_all_records()) == contents(scanned.get_all_records())
+
+
+def test_duplicate_order_id_is_rejected(open_manager):
+    manager = open_manager()
+    row = make_orders(1)[0]
+    manager.add_record(*row)
+    manager.add_record(*row)
+    assert len(manager.search_by_field('order_id', row[0])) == 1
+
+
+def test_index_is_rebuilt_on_reopen(open_manager):
+    manager = open_manager('json')
+    manager.add_records(make_orders(50, seed=3))
+    manager.close_database()
+
+    reopened = open_manager('json')
+    documents = reopened.search_by_field('customer_id', 7)
+    assert documents == [doc for doc in reopened.get_all_records() if doc.get('customer_id') == 7]
+
+
+def test_json_index_lookup_does_not_reparse_file(open_manager, monkeypatch):
+    from storages import JSONStorage
+
+    manager = open_manager('json', cache_size=0)
+    manager.add_records(make_orders(100, seed=4))
+    manager.search_by_field('customer_id', 1)
+    parses = []
+    read = JSONStorage.read
+
+    def counted_read(storage):
+        parses.append(1)
+        return read(storage)
+
+    monkeypatch.setattr(JSONStorage, 'read', counted_read)
+    for customer_id in range(1, 11):
+        manager.search_by_field('customer_id', customer_id)
+    manager.search_by_field('order_id', 5)
+    assert parses == []
+
+
+def test_json_file_changed_elsewhere_is_reread(open_manager, tmp_path):
+    first = open_manager('json', cache_size=0)
+    first.add_records(make_orders(20, seed=5))
+    assert first.search_by_field('order_id', 500) == []
+
+    # Другой экземпляр (как другая программа) меняет тот же файл
+    other = open_manager('json', cache_size=0)
+    other.add_record(*make_orders(1, start=500)[0])
+    other.delete_record_by_field('order_id', 3)
+
+    assert len(first.search_by_field('order_id', 500)) == 1
+    assert first.search_by_field('order_id', 3) == []
+    assert contents(first.get_all_records()) == contents(other.get_all_records())
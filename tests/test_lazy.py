@@ -0,0 +1,90 @@
+import os
+
+from conftest import contents, make_orders
+
+import storages
+
+
+def test_lazy_manager_matches_json_manager(open_manager):
+    lazy = open_manager('lazy', 'lazy.json')
+    plain = open_manager('json', 'orders.json')
+    rows = make_orders(300, seed=9)
+    for manager in (lazy, plain):
+        manager.add_records(rows)
+        manager.edit_record('customer_id', 3, {'status': 'delivered'})
+        manager.delete_record_by_field('status', 'cancelled')
+    lazy.close_database()
+
+    reopened = open_manager('lazy', 'lazy.json')
+    assert contents(reopened.get_all_records()) == contents(plain.get_all_records())
+
+
+def test_mapping_is_closed_before_file_is_replaced(open_manager, monkeypatch):
+    manager = open_manager('lazy', 'lazy.json')
+    manager.add_records(make_orders(10))
+    manager.db.storage.flush()
+    manager.get_all_records()
+    storage = manager.db.storage
+    mapping = storage._mapping
+    replace = storages.os.replace
+
+    def checked_replace(source, target):
+        assert mapping.closed
+        replace(source, target)
+
+    monkeypatch.setattr(storages.os, 'replace', checked_replace)
+    manager.add_record(*make_orders(1, start=100)[0])
+    storage.flush()
+    assert not storage._mapping.closed
+    assert len(manager.search_by_field('order_id', 100)) == 1
+    assert contents(manager.get_all_records())[-1][1][0] == 100
+
+
+def test_portable_token_pattern_finds_same_documents(monkeypatch):
+    import json
+    from array import array
+
+    data = {
+        '_default': {
+            '1': dict(zip(['order_id', 'status'], [1, 'a"{b}\\'])),
+            '2': {'nested': {'x': 1}, 'note': 'строка'},
+            # Длинный список перед вложенным объектом: без отказа от возврата разбор экспоненциальный
+            '3': {'values': list(range(3000)) + [{'z': 1}]}
+        },
+        'other': {'7': {'k': 'v'}}
+    }
+    buffer = json.dumps(data).encode('utf-8')
+    expected = storages.scan_document_offsets(buffer)
+    monkeypatch.setattr(storages, '_JSON_TOKEN', storages._JSON_TOKEN_PORTABLE)
+    offsets = storages.scan_document_offsets(buffer)
+    assert offsets == expected
+    for name, (ids, starts, ends) in offsets.items():
+        assert [json.loads(buffer[a:b]) for a, b in zip(starts, ends)] == list(data[name].values())
+        assert list(ids) == list(data[name])
+    assert isinstance(starts, array)
+
+
+def test_restore_does_not_reuse_offset_index(open_manager, tmp_path):
+    from db import FIELDS
+    from storages import atomic_write_json, offset_index_path
+
+    def database(customer_ids):
+        rows = [[order_id, customer_id, 10.0, '2023-01-01', 'pending', 'Street 1']
+                for order_id, customer_id in enumerate(customer_ids, 1)]
+        return {'_default': {str(i): dict(zip(FIELDS, row)) for i, row in enumerate(rows, 1)}}
+
+    path = str(tmp_path / 'lazy.json')
+    backup = str(tmp_path / 'backup.json')
+    # Файлы одного размера с разными границами документов
+    atomic_write_json(path, database([5, 10]))
+    atomic_write_json(backup, database([10, 5]))
+    manager = open_manager('lazy', 'lazy.json')
+    assert [doc['customer_id'] for doc in manager.get_all_records()] == [5, 10]
+    assert os.path.exists(offset_index_path(path))
+    # Копия с тем же временем изменения: copy2 при восстановлении перенесет его на файл базы
+    stat = os.stat(path)
+    assert os.path.getsize(backup) == stat.st_size
+    os.utime(backup, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+    manager.restore_from_backup(backup)
+    assert [doc['customer_id'] for doc in manager.get_all_records()] == [10, 5]
@@ -0,0 +1,31 @@
+import pytest
+
+from conftest import make_orders
+
+
+@pytest.mark.parametrize('storage_mode', ['json', 'wal'])
+def test_full_scan_reads_table_once(open_manager, storage_mode):
+    manager = open_manager(storage_mode, use_index=False, cache_size=0, metrics=True)
+    manager.add_records(make_orders(40, seed=8))
+    storage = manager.db.storage
+    read = storage.read
+    reads = []
+
+    def counted_read():
+        reads.append(1)
+        return read()
+
+    storage.read = counted_read
+    expected = sum(row[1] == 3 for row in make_orders(40, seed=8))
+    assert len(manager.search_by_field('customer_id', 3)) == expected
+    assert len(manager.search_range('amount', 100, 200)) > 0
+    assert len(reads) == 2
+    # Повторный поиск берется из кэша запросов TinyDB и не читает таблицу
+    assert len(manager.search_by_field('customer_id', 3)) == expected
+    assert len(reads) == 2
+
+    operations = manager.metrics.snapshot()['operations']
+    # 40 заказов и служебная строка новой базы
+    assert operations['search_by_field']['rows_scanned'] == 41
+    assert operations['search_range']['rows_scanned'] == 41
+    assert operations['search_range']['full_scans'] == 1
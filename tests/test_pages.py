@@ -0,0 +1,57 @@
+import pytest
+
+from conftest import make_orders
+from db import STORAGE_MODES
+
+
+def expected_order(documents, sort_by, descending):
+    # Записи без значения поля сортировки идут в конце в порядке doc_id
+    ordered = [doc for doc in documents if doc.get(sort_by) is not None]
+    ordered.sort(key=lambda doc: (doc[sort_by], doc.doc_id), reverse=descending)
+    missing = sorted((doc for doc in documents if doc.get(sort_by) is None), key=lambda doc: doc.doc_id)
+    return [doc.doc_id for doc in ordered + missing]
+
+
+@pytest.mark.parametrize('storage_mode', list(STORAGE_MODES))
+def test_pages_cover_table_in_order(open_manager, storage_mode):
+    name = 'orders.tdbc' if storage_mode == 'columnar' else 'orders.json'
+    manager = open_manager(storage_mode, name)
+    manager.add_records(make_orders(95, seed=31))
+    documents = manager.get_all_records()
+
+    for sort_by, descending in [(None, False), ('amount', False), ('amount', True), ('date', True),
+                                ('customer_id', False), ('status', True)]:
+        pages = []
+        for offset in range(0, 120, 20):
+            page, total = manager.get_page(offset, 20, sort_by, descending)
+            assert total == len(documents)
+            pages.extend(doc.doc_id for doc in page)
+        if sort_by is None:
+            assert pages == [doc.doc_id for doc in documents]
+        else:
+            assert pages == expected_order(documents, sort_by, descending)
+
+
+def test_page_order_follows_changes(open_manager):
+    manager = open_manager()
+    manager.add_records(make_orders(50, seed=32))
+    manager.get_page(0, 10, 'amount', True)
+    manager.edit_record('order_id', 7, {'amount': 10 ** 6})
+    page, _ = manager.get_page(0, 1, 'amount', True)
+    assert page[0]['order_id'] == 7
+    manager.delete_record_by_field('order_id', 7)
+    page, total = manager.get_page(0, 100, 'amount', True)
+    assert total == 50
+    assert 7 not in [doc['order_id'] for doc in page]
+    assert [doc.doc_id for doc in page] == expected_order(manager.get_all_records(), 'amount', True)
+
+
+def test_filtered_pages(open_manager):
+    manager = open_manager()
+    manager.add_records(make_orders(80, seed=33))
+    matching = manager.search_by_field('status', 'shipped')
+    page, total = manager.get_page(2, 5, 'date', False, 'status', 'shipped')
+    assert total == len(matching)
+    assert [doc.doc_id for doc in page] == expected_order(matching, 'date', False)[2:7]
+    assert manager.get_page(0, 10, 'missing') == ([], 0)
+    assert manager.get_page(0, 10, None, False, 'missing', 1) == ([], 0)
@@ -0,0 +1,64 @@
+import random
+
+import pytest
+
+from conftest import make_orders
+
+
+def brute_force(documents, field, low, high, include_low, include_high, descending=False):
+    def in_range(value):
+        if value is None:
+            return False
+        if low is not None and (value < low or not include_low and value == low):
+            return False
+        if high is not None and (value > high or not include_high and value == high):
+            return False
+        return True
+
+    selected = [doc for doc in documents if in_range(doc.get(field))]
+    selected.sort(key=lambda doc: (doc[field], doc.doc_id), reverse=descending)
+    return [doc.doc_id for doc in selected]
+
+
+@pytest.mark.parametrize('use_index', [True, False])
+@pytest.mark.parametrize('storage_mode', ['json', 'wal'])
+def test_range_bounds_after_update_and_delete(open_manager, storage_mode, use_index):
+    manager = open_manager(storage_mode, use_index=use_index)
+    rows = make_orders(200, seed=21)
+    manager.add_records(rows)
+    # Изменения значений полей диапазона и удаления после построения индекса
+    manager.search_range('amount', 0, 1)
+    manager.edit_record('order_id', 10, {'amount': 250.0, 'date': '2023-06-15'})
+    manager.update_where({'customer_id': 3}, {'amount': 250.0})
+    manager.delete_record_by_field('status', 'cancelled')
+    manager.delete_record_by_field('date', rows[20][3])
+
+    documents = manager.get_all_records()
+    rng = random.Random(5)
+    cases = [('amount', 250.0, 250.0), ('amount', 100, 250.0), ('amount', None, 250.0), ('amount', 250.0, None),
+             ('date', '2023-06-15', '2023-09-30'), ('date', None, '2023-06-15'), ('customer_id', 3, 8)]
+    for _ in range(10):
+        doc = rng.choice(documents[1:])
+        other = rng.choice(documents[1:])
+        cases.append(('amount', *sorted((doc['amount'], other['amount']))))
+        cases.append(('date', *sorted((doc['date'], other['date']))))
+
+    for field, low, high in cases:
+        for include_low in (True, False):
+            for include_high in (True, False):
+                for descending in (False, True):
+                    expected = brute_force(documents, field, low, high, include_low, include_high, descending)
+                    result = manager.search_range(field, low, high, include_low, include_high, descending)
+                    assert [doc.doc_id for doc in result] == expected, (field, low, high, include_low, include_high)
+    # Граница по значению, которое есть у нескольких записей
+    assert len(manager.search_range('amount', 250.0, 250.0)) >= 2
+    assert manager.search_range('amount', 250.0, 250.0, include_low=False) == []
+
+
+def test_range_offset_and_limit(open_manager):
+    manager = open_manager()
+    manager.add_records(make_orders(100, seed=22))
+    full = manager.search_range('date', '2023-03-01', '2023-10-31', descending=True)
+    assert manager.search_range('date', '2023-03-01', '2023-10-31', descending=True, offset=5, limit=10) == full[5:15]
+    assert manager.search_range('date', '2023-03-01', '2023-10-31', descending=True, offset=len(full)) == []
+    assert manager.latest(3) == manager.search_range('date', descending=True, limit=3)
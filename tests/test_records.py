@@ -0,0 +1,37 @@
+import json
+
+import pytest
+
+from conftest import make_orders
+
+from db import STORAGE_MODES
+
+
+@pytest.mark.parametrize('storage_mode', list(STORAGE_MODES))
+def test_results_are_plain_documents(open_manager, storage_mode):
+    name = 'orders.tdbc' if storage_mode == 'columnar' else 'orders.json'
+    manager = open_manager(storage_mode, name, cache_size=16)
+    manager.add_records(make_orders(30, seed=2))
+
+    results = [
+        manager.get_all_records(),
+        manager.search_by_field('customer_id', 5),
+        manager.search_by_field('customer_id', 5),
+        manager.search_by_field('order_id', 7),
+        manager.search_range('amount', 100, 300),
+        manager.get_page(0, 10)[0],
+        manager.get_page(0, 10, sort_by='amount')[0],
+        manager.latest(5),
+    ]
+    for documents in results:
+        for doc in documents:
+            assert isinstance(doc, dict)
+            assert isinstance(doc.doc_id, int)
+            assert (doc | {'note': 'x'})['note'] == 'x'
+        json.dumps(documents)
+
+    # Изменение результата не затрагивает хранилище и кэш поиска
+    doc = manager.search_by_field('order_id', 7)[0]
+    doc['status'] = 'changed'
+    assert manager.search_by_field('order_id', 7)[0]['status'] != 'changed'
+    assert all(doc['status'] != 'changed' for doc in manager.get_all_records())
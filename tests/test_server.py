@@ -0,0 +1,67 @@
+import asyncio
+import json
+
+from conftest import make_orders
+from db import FIELDS
+from server import QueryServer, Request, WriteBatcher
+
+
+def _post(path, body):
+    return Request('POST', path, {}, 'HTTP/1.1', {}, json.dumps(body).encode('utf-8'))
+
+
+def _dispatch_together(manager, requests):
+    async def scenario():
+        server = QueryServer(manager)
+        server.batcher = WriteBatcher(server)
+        runner = asyncio.ensure_future(server.batcher.run())
+        try:
+            return await asyncio.gather(*(server.dispatch(request) for request in requests))
+        finally:
+            runner.cancel()
+            server.worker.shutdown()
+
+    return asyncio.run(scenario())
+
+
+def test_bad_request_does_not_reject_other_clients_rows(open_manager):
+    manager = open_manager()
+    rows = make_orders(3)
+    requests = [_post('/records', [rows[0]]), _post('/records', [5]), _post('/records', [rows[1]]),
+                _post('/records', dict(zip(FIELDS, rows[2])))]
+    responses = _dispatch_together(manager, requests)
+
+    assert [response.status for response in responses] == [200, 400, 200, 200]
+    for row in rows:
+        assert len(manager.search_by_field('order_id', row[0])) == 1
+
+
+def test_failed_batch_is_retried_per_request(open_manager, monkeypatch):
+    manager = open_manager()
+    add_records = manager.add_records
+
+    def failing_add_records(records, **options):
+        if any(record[0] == 666 for record in records):
+            raise RuntimeError("сбой записи")
+        return add_records(records, **options)
+
+    monkeypatch.setattr(manager, 'add_records', failing_add_records)
+    rows = make_orders(2)
+    broken = list(rows[1])
+    broken[0] = 666
+    responses = _dispatch_together(manager, [_post('/records', [rows[0]]), _post('/records', [broken])])
+
+    assert [response.status for response in responses] == [200, 500]
+    result = json.loads(responses[0].body)
+    assert result['accepted'] == 1 and result['results'][0]['row'] == 1
+    assert len(manager.search_by_field('order_id', rows[0][0])) == 1
+
+
+def test_batched_results_are_numbered_per_request(open_manager):
+    manager = open_manager()
+    rows = make_orders(4)
+    responses = _dispatch_together(manager, [_post('/records', rows[:2]), _post('/records', [rows[2], rows[0]])])
+
+    first, second = (json.loads(response.body) for response in responses)
+    assert [result['row'] for result in first['results']] == [1, 2]
+    assert [(result['row'], result['accepted']) for result in second['results']] == [(1, True), (2, False)]
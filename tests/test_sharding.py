@@ -0,0 +1,55 @@
+import pytest
+
+from conftest import contents, make_orders
+from sharding import ShardedDatabaseManager
+
+
+def test_sharded_add_records_rejects_rows_of_wrong_shape(tmp_path, capsys):
+    manager = ShardedDatabaseManager(str(tmp_path / 'orders.json'), shards=4)
+    try:
+        valid = make_orders(1)[0]
+        results = manager.add_records([5, None, valid, valid])
+
+        assert [result['accepted'] for result in results] == [False, False, True, False]
+        assert [result['order_id'] for result in results] == [None, None, valid[0], valid[0]]
+        assert len(manager.search_by_field('order_id', valid[0])) == 1
+    finally:
+        manager.close_database()
+
+
+def test_sharded_search_matches_single_database(tmp_path, open_manager):
+    rows = make_orders(200, seed=4)
+    single = open_manager()
+    single.add_records(rows)
+    sharded = ShardedDatabaseManager(str(tmp_path / 'sharded.json'), shards=4)
+    try:
+        sharded.add_records(rows)
+        for field, value in (('customer_id', 3), ('status', 'shipped'), ('order_id', 17)):
+            expected = sorted(key for _, key in contents(single.search_by_field(field, value)))
+            assert sorted(key for _, key in contents(sharded.search_by_field(field, value))) == expected
+    finally:
+        sharded.close_database()
+
+
+def test_stopped_export_does_not_leave_producers_blocked(tmp_path, capsys):
+    import threading
+
+    manager = ShardedDatabaseManager(str(tmp_path / 'sharded.json'), shards=4)
+    try:
+        manager.add_records(make_orders(400, seed=2))
+        before = set(threading.enumerate())
+        chunks = manager.iter_record_chunks(chunk_size=5)
+        next(chunks)
+        # Потребитель прекращает чтение, пока очереди всех шардов заполнены
+        chunks.close()
+        assert set(threading.enumerate()) <= before
+
+        def failing_export():
+            for _ in manager.iter_record_chunks(chunk_size=5):
+                raise RuntimeError("ошибка записи")
+
+        with pytest.raises(RuntimeError):
+            failing_export()
+        assert set(threading.enumerate()) <= before
+    finally:
+        manager.close_database()
@@ -0,0 +1,89 @@
+import multiprocessing
+import os
+
+import pytest
+
+from backups import BackupChain
+from conftest import make_orders
+from db import DatabaseManager
+from storages import ConcurrentModificationError
+
+WRITERS = 4
+ROWS_PER_WRITER = 15
+
+
+def _write_orders(path, rows):
+    with open(os.devnull, 'w') as devnull:
+        os.dup2(devnull.fileno(), 1)
+    manager = DatabaseManager(path, storage_mode='shared')
+    for row in rows:
+        manager.add_record(*row)
+    manager.close_database()
+
+
+def _count(manager):
+    return sum(1 for doc in manager.get_all_records() if doc.get('order_id') is not None)
+
+
+def test_writes_from_other_manager_are_visible_after_refresh(open_manager):
+    first = open_manager('shared')
+    second = open_manager('shared')
+    rows = make_orders(3)
+    first.add_record(*rows[0])
+
+    assert len(second.search_by_field('order_id', rows[0][0])) == 1
+    second.add_record(*rows[1])
+    first.add_record(*rows[2])
+    assert _count(first) == _count(second) == 3
+
+
+def test_duplicate_check_sees_other_managers_writes(open_manager):
+    first = open_manager('shared')
+    second = open_manager('shared')
+    row = make_orders(1)[0]
+    second.get_all_records()
+    first.add_record(*row)
+    second.add_record(*row)
+    assert len(first.search_by_field('order_id', row[0])) == 1
+
+
+def test_stale_write_bypassing_manager_is_refused(open_manager):
+    first = open_manager('shared')
+    second = open_manager('shared')
+    second.get_all_records()
+    first.add_record(*make_orders(1)[0])
+
+    with pytest.raises(ConcurrentModificationError):
+        second.db.storage.write(second.db.storage.read())
+
+
+def test_concurrent_writer_processes_lose_no_records(open_manager):
+    manager = open_manager('shared')
+    rows = make_orders(WRITERS * ROWS_PER_WRITER)
+    processes = [
+        multiprocessing.Process(target=_write_orders,
+                                args=(manager.file_path, rows[i * ROWS_PER_WRITER:(i + 1) * ROWS_PER_WRITER]))
+        for i in range(WRITERS)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(60)
+        assert process.exitcode == 0
+
+    assert _count(manager) == len(rows)
+    assert sorted(doc['order_id'] for doc in manager.search_range('order_id')) == [row[0] for row in rows]
+
+
+def test_incremental_backup_captures_other_processes_writes(open_manager, tmp_path):
+    manager = open_manager('shared')
+    manager.get_all_records()
+    process = multiprocessing.Process(target=_write_orders, args=(manager.file_path, make_orders(20)))
+    process.start()
+    process.join(60)
+    assert process.exitcode == 0
+
+    backup_dir = str(tmp_path / 'backups')
+    assert manager.create_incremental_backup(backup_dir) is not None
+    tables = BackupChain(backup_dir).restore()
+    assert sum(1 for doc in tables['_default'].values() if doc.get('order_id') is not None) == 20
@@ -0,0 +1,116 @@
+import threading
+import time
+from concurrent.futures import Future
+
+import pytest
+
+pytest.importorskip('tkinter')
+
+import app
+from app import TaskRunner
+
+
+class StubMaster:
+    # Заменяет окно Tk: отложенные вызовы after() выполняются тестом вручную
+    def __init__(self):
+        self.pending = []
+
+    def after(self, ms, func):
+        self.pending.append(func)
+
+    def pump(self, timeout=5):
+        deadline = time.monotonic() + timeout
+        while self.pending:
+            assert time.monotonic() < deadline, "задачи не завершились"
+            func = self.pending.pop(0)
+            func()
+            time.sleep(0.005)
+
+
+@pytest.fixture
+def runner():
+    master = StubMaster()
+    states = []
+    runner = TaskRunner(master, on_state=states.append, poll_interval=1)
+    runner.states = states
+    yield runner
+    runner.shutdown()
+
+
+def test_tasks_run_in_order_off_the_tk_thread(runner):
+    results = []
+    threads = []
+
+    def work(value):
+        threads.append(threading.current_thread())
+        return value * 2
+
+    for value in range(5):
+        runner.submit(f"Задача {value}", work, value, on_done=results.append)
+    assert runner.busy
+    runner.master.pump()
+    assert results == [0, 2, 4, 6, 8]
+    assert threading.current_thread() not in threads
+    assert len(set(threads)) == 1
+    assert not runner.busy
+    assert runner.states[0] == "Задача 0"
+    assert runner.states[-1] is None
+
+
+def test_errors_go_to_handler_or_message_box(runner, monkeypatch):
+    shown = []
+    monkeypatch.setattr(app.messagebox, 'showerror', lambda title, text: shown.append((title, text)))
+    errors = []
+
+    def fail():
+        raise ValueError("сбой")
+
+    runner.submit("Первая", fail, on_error=errors.append)
+    runner.submit("Вторая", fail)
+    runner.master.pump()
+    assert [str(error) for error in errors] == ["сбой"]
+    assert shown == [("Вторая", "Ошибка: сбой")]
+
+
+def test_progress_and_cancel(runner):
+    started = threading.Event()
+    release = threading.Event()
+    done = []
+
+    def long_task(progress):
+        progress(1, 10)
+        started.set()
+        release.wait(5)
+        progress(2, 20)
+        done.append(True)
+
+    queued = []
+    runner.submit("Экспорт", long_task, with_progress=True, on_done=done.append)
+    runner.submit("Следующая", queued.append, 1)
+    assert started.wait(5)
+    runner._poll()
+    assert runner.states[-1] == "Экспорт: строк 1, байт 10"
+    runner.cancel()
+    release.set()
+    runner.master.pump()
+    # Текущая задача прервана при сообщении о прогрессе, задача в очереди пропущена
+    assert done == []
+    assert queued == []
+    assert not runner.busy
+
+
+def test_future_result_completes_task_later(runner):
+    future = Future()
+    results = []
+    runner.submit("Копия", lambda: future, on_done=results.append)
+    runner.submit("Следующая", lambda: 'next', on_done=results.append)
+    deadline = time.monotonic() + 5
+    while results != ['next']:
+        assert time.monotonic() < deadline
+        runner._poll()
+        time.sleep(0.005)
+    assert runner.busy
+    future.set_result('backup')
+    runner.master.pump()
+    assert results == ['next', 'backup']
+    assert not runner.busy
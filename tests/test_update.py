@@ -0,0 +1,25 @@
+from conftest import make_orders
+
+
+def test_update_where_counts_only_changed_records(open_manager):
+    manager = open_manager()
+    rows = make_orders(4)
+    for row in rows:
+        row[4] = 'pending'
+    rows[0][4] = 'shipped'
+    manager.add_records(rows)
+
+    assert manager.update_where({'status': 'pending'}, {'status': 'shipped'}) == 3
+    assert manager.update_where({'status': 'shipped'}, {'status': 'shipped'}) == 0
+    assert manager.update_where({'status': 'shipped', 'order_id': rows[1][0]}, {'amount': 9.5, 'status': ''}) == 1
+    assert len(manager.search_by_field('status', 'shipped')) == 4
+    assert manager.search_by_field('order_id', rows[1][0])[0]['amount'] == 9.5
+
+
+def test_edit_record_succeeds_when_values_are_already_set(open_manager):
+    manager = open_manager()
+    row = make_orders(1)[0]
+    manager.add_record(*row)
+
+    assert manager.edit_record('order_id', row[0], {'status': row[4]})
+    assert not manager.edit_record('order_id', row[0] + 1, {'status': 'new'})
@@ -0,0 +1,66 @@
+import os
+
+from conftest import contents, make_orders
+
+from storages import log_paths
+
+
+def change(manager, rows):
+    manager.add_records(rows)
+    manager.edit_record('customer_id', 2, {'status': 'delivered'})
+    manager.update_where({'status': 'pending'}, {'delivery_address': 'Depot'})
+    manager.delete_record_by_field('status', 'cancelled')
+
+
+def test_wal_manager_matches_json_manager(open_manager):
+    wal = open_manager('wal', 'wal.json')
+    plain = open_manager('json', 'orders.json')
+    rows = make_orders(200, seed=3)
+    for manager in (wal, plain):
+        change(manager, rows)
+    assert contents(wal.get_all_records()) == contents(plain.get_all_records())
+    wal.close_database()
+
+    reopened = open_manager('wal', 'wal.json')
+    assert contents(reopened.get_all_records()) == contents(plain.get_all_records())
+    # Счетчик doc_id после воспроизведения журнала продолжается с того же места
+    row = make_orders(1, start=1000)[0]
+    for manager in (reopened, plain):
+        manager.add_record(*row)
+    assert contents(reopened.get_all_records()) == contents(plain.get_all_records())
+
+
+def test_truncated_last_line_is_dropped(open_manager, tmp_path):
+    manager = open_manager('wal', 'wal.json')
+    rows = make_orders(20, seed=4)
+    manager.add_records(rows[:-1])
+    expected = contents(manager.get_all_records())
+    manager.add_record(*rows[-1])
+    manager.close_database()
+
+    log_path, _ = log_paths(str(tmp_path / 'wal.json'))
+    with open(log_path, 'rb+') as f:
+        f.truncate(os.path.getsize(log_path) - 10)
+
+    reopened = open_manager('wal', 'wal.json')
+    assert contents(reopened.get_all_records()) == expected
+    # Недописанный хвост отрезан, поэтому новые строки журнала читаются после повторного открытия
+    reopened.add_record(*rows[-1])
+    expected = contents(reopened.get_all_records())
+    reopened.close_database()
+    assert contents(open_manager('wal', 'wal.json').get_all_records()) == expected
+
+
+def test_interrupted_compaction_is_replayed(open_manager, tmp_path):
+    manager = open_manager('wal', 'wal.json')
+    change(manager, make_orders(50, seed=6))
+    expected = contents(manager.get_all_records())
+    manager.close_database()
+
+    # Сбой после переименования журнала, но до записи нового снимка
+    log_path, old_log_path = log_paths(str(tmp_path / 'wal.json'))
+    os.replace(log_path, old_log_path)
+
+    reopened = open_manager('wal', 'wal.json')
+    assert contents(reopened.get_all_records()) == expected
+    assert not os.path.exists(old_log_path)
@@ -0,0 +1,45 @@
+import time
+
+from conftest import make_orders
+
+from storages import read_json_file
+
+
+def on_disk(tmp_path):
+    data = read_json_file(str(tmp_path / 'orders.json')) or {}
+    return sorted(doc['order_id'] for doc in data.get('_default', {}).values() if doc['order_id'] is not None)
+
+
+def test_flush_every_writes(open_manager, tmp_path):
+    manager = open_manager('write_behind', flush_every=3, flush_interval=float('inf'))
+    rows = make_orders(4)
+    for row in rows[:2]:
+        manager.add_record(*row)
+    assert on_disk(tmp_path) == []
+    assert manager.db.storage.dirty
+    manager.add_record(*rows[2])
+    assert on_disk(tmp_path) == [1, 2, 3]
+    manager.add_record(*rows[3])
+    assert on_disk(tmp_path) == [1, 2, 3]
+
+
+def test_flush_on_close(open_manager, tmp_path):
+    manager = open_manager('write_behind', flush_every=1000, flush_interval=float('inf'))
+    manager.add_records(make_orders(5))
+    manager.edit_record('order_id', 2, {'status': 'returned'})
+    assert on_disk(tmp_path) == []
+    manager.close_database()
+    assert on_disk(tmp_path) == [1, 2, 3, 4, 5]
+    reopened = open_manager('write_behind')
+    assert reopened.search_by_field('order_id', 2)[0]['status'] == 'returned'
+
+
+def test_flush_interval_is_checked_on_write(open_manager, tmp_path):
+    manager = open_manager('write_behind', flush_every=1000, flush_interval=0.05)
+    rows = make_orders(2)
+    manager.add_record(*rows[0])
+    time.sleep(0.1)
+    # Без записи интервал не проверяется: изменения ждут следующей записи или flush()
+    assert on_disk(tmp_path) == []
+    manager.add_record(*rows[1])
+    assert on_disk(tmp_path) == [1, 2]